@@ -0,0 +1 @@
+"""Skrypty benchmarków narzędzi (uruchamiane ręcznie, np. python benchmarks/bench_tmx_memory.py)."""
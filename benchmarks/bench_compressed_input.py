@@ -0,0 +1,93 @@
+"""
+Benchmark wejść skompresowanych: analiza TMX prosto ze strumienia (loc_common.compressed_io)
+kontra dotychczasowy sposób - rozpakowanie na dysk, analiza rozpakowanego pliku, usunięcie kopii.
+
+Dla każdego formatu (.gz, .xz, .zip) mierzy czas całej operacji i liczbę bajtów zapisanych na dysk
+przez rozpakowanie. Na końcu sprawdza, czy oba sposoby dały ten sam wynik analizy.
+
+Uruchomienie: python benchmarks/bench_compressed_input.py [liczba_segmentów]
+"""
+import gzip
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'translator_id_tmx_analysis'))
+
+from benchmarks.tmx_fixtures import write_tmx
+from loc_common.compressed_io import open_input, split_archive_path
+import translator_id_tmx_analysis as analyzer
+
+DEFAULT_SEGMENTS = 200000
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def compress(plain_path, tmp_dir):
+    """Tworzy wersje .gz, .xz i .zip pliku. Zwraca listę (format, ścieżka wejścia)."""
+    name = os.path.basename(plain_path)
+    inputs = []
+
+    gz_path = os.path.join(tmp_dir, name + '.gz')
+    with open(plain_path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+    inputs.append(('gz', gz_path))
+
+    xz_path = os.path.join(tmp_dir, name + '.xz')
+    with open(plain_path, 'rb') as src, lzma.open(xz_path, 'wb', preset=1) as dst:
+        shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+    inputs.append(('xz', xz_path))
+
+    zip_path = os.path.join(tmp_dir, 'eksport.zip')
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.write(plain_path, name)
+    inputs.append(('zip', f"{zip_path}/{name}"))
+    return inputs
+
+
+def extract_then_parse(path, tmp_dir):
+    """Dotychczasowy sposób: rozpakowanie do pliku tymczasowego i analiza. Zwraca (wynik, zapisane bajty)."""
+    extracted = os.path.join(tmp_dir, 'rozpakowany.tmx')
+    with open_input(path) as src, open(extracted, 'wb') as dst:
+        shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+    written = os.path.getsize(extracted)
+    try:
+        return analyzer._analyze_tmx_source(extracted), written
+    finally:
+        os.remove(extracted)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SEGMENTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain_path = os.path.join(tmp_dir, 'bench.tmx')
+        size_mb = write_tmx(plain_path, segments) / 1e6
+        print(f"Plik: {segments} segmentów, {size_mb:.1f} MB (backend: {analyzer.TMX_BACKEND})")
+
+        reference, plain_time = timed(lambda: analyzer._analyze_tmx_source(plain_path))
+        print(f"Bez kompresji: {plain_time:.2f} s")
+
+        print(f"{'format':>6} {'MB':>6} {'rozpakuj+analiza s':>19} {'zapis MB':>9} {'strumień s':>11} {'zapis MB':>9}  wynik")
+        for fmt, path in compress(plain_path, tmp_dir):
+            (extracted_result, written), extract_time = timed(lambda: extract_then_parse(path, tmp_dir))
+            stream_result, stream_time = timed(lambda: analyzer._analyze_tmx_source(path))
+            same = extracted_result == stream_result == reference
+            packed_mb = os.path.getsize(split_archive_path(path)[0]) / 1e6
+            print(f"{fmt:>6} {packed_mb:>6.1f} {extract_time:>19.2f} {written / 1e6:>9.1f} "
+                  f"{stream_time:>11.2f} {0:>9.1f}  {'identyczny' if same else 'RÓŻNY!'}")
+
+
+if __name__ == '__main__':
+    main()
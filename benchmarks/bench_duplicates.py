@@ -0,0 +1,106 @@
+"""
+Benchmark wykrywania duplikatów (translator_id_tmx_analysis/tu_duplicates.py).
+
+1. Analiza TMX z odciskami <tu> i bez nich - narzut zbierania odcisków w tym samym przebiegu.
+2. Raport (count_duplicates) na syntetycznych odciskach: czas i szczytowe zużycie pamięci
+   (ru_maxrss procesu) dla podanej liczby segmentów w kilku plikach.
+
+Uruchomienie: python benchmarks/bench_duplicates.py [segmenty_tmx] [segmenty_raportu]
+"""
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'translator_id_tmx_analysis'))
+
+import numpy as np
+
+from benchmarks.tmx_fixtures import write_tmx
+import translator_id_tmx_analysis as analyzer
+import tu_duplicates
+
+DEFAULT_TMX_SEGMENTS = 200000
+DEFAULT_REPORT_SEGMENTS = 20000000
+FILES = 4
+USERS = 50
+# Udział odcisków wspólnych dla wszystkich plików w danych syntetycznych
+SHARED = 0.3
+
+
+def analyze_files(tmx_dir, tmx_files, duplicates_dir=None):
+    start = time.perf_counter()
+    results = list(analyzer.iter_analysis_results(tmx_dir, tmx_files, 1, duplicates_dir=duplicates_dir))
+    return results, time.perf_counter() - start
+
+
+def write_synthetic_folder(folder, rows, shared, rng):
+    """Folder odcisków jak z TuFingerprintCollector: część odcisków z puli wspólnej, reszta losowa."""
+    os.makedirs(folder)
+    fingerprints = rng.integers(0, 2 ** 63, size=rows, dtype=np.uint64)
+    from_pool = rng.random(rows) < SHARED
+    fingerprints[from_pool] = rng.choice(shared, size=int(from_pool.sum()))
+    np.save(os.path.join(folder, 'fingerprint.npy'), fingerprints)
+    np.save(os.path.join(folder, 'creation_user.npy'), rng.integers(-1, USERS, size=rows, dtype=np.int32))
+    with open(os.path.join(folder, 'users.json'), 'w', encoding='utf-8') as f:
+        json.dump([f'user{i}' for i in range(USERS)], f)
+    with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': tu_duplicates.FINGERPRINTS_VERSION, 'size': 0, 'mtime_ns': 0,
+                   'source': os.path.basename(folder), 'rows': rows}, f)
+
+
+def max_rss_mb():
+    # Linux: kilobajty, macOS: bajty
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != 'darwin' else rss / 1024 / 1024
+
+
+def main():
+    tmx_segments = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TMX_SEGMENTS
+    report_segments = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_REPORT_SEGMENTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmx_files = []
+        for i in range(FILES):
+            name = f'bench{i}.tmx'
+            write_tmx(os.path.join(tmp_dir, name), tmx_segments // FILES, seed=i + 1)
+            tmx_files.append(name)
+
+        duplicates_dir = os.path.join(tmp_dir, 'duplikaty')
+        os.makedirs(duplicates_dir)
+        # Pierwszy przebieg tylko rozgrzewa pamięć podręczną systemu plików
+        analyze_files(tmp_dir, tmx_files)
+        reference, off_time = analyze_files(tmp_dir, tmx_files)
+        measured, on_time = analyze_files(tmp_dir, tmx_files, duplicates_dir)
+        folders = [analyzer.columns_path_for(duplicates_dir, os.path.join(tmp_dir, name)) for name in tmx_files]
+        report = tu_duplicates.count_duplicates(folders)
+        print(f"Analiza {FILES} plików, {tmx_segments} segmentów: bez odcisków {off_time:.2f} s, "
+              f"z odciskami {on_time:.2f} s ({(on_time / off_time - 1) * 100:+.1f}%), "
+              f"wynik {'identyczny' if measured == reference else 'RÓŻNY!'}, "
+              f"powtórzone segmenty: {report.total - report.distinct}")
+
+        rng = np.random.default_rng(1)
+        shared = rng.integers(0, 2 ** 63, size=max(1, report_segments // 10), dtype=np.uint64)
+        folders = []
+        for i in range(FILES):
+            folder = os.path.join(tmp_dir, f'synthetic{i}')
+            write_synthetic_folder(folder, report_segments // FILES, shared, rng)
+            folders.append(folder)
+        del shared
+        rss_before = max_rss_mb()
+        start = time.perf_counter()
+        report = tu_duplicates.count_duplicates(folders)
+        seconds = time.perf_counter() - start
+        intra = sum(row[1] for row in report.files)
+        cross = sum(row[2] for row in report.files)
+        print(f"Raport: {report.total} segmentów w {FILES} plikach - {seconds:.2f} s "
+              f"({report.total / seconds / 1e6:.1f} mln segmentów/s), szczyt pamięci {max_rss_mb():.0f} MB "
+              f"(przed raportem {rss_before:.0f} MB), duplikaty w plikach {intra}, z innych plików {cross}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark narzutu pomiarów (loc_common/metrics.py).
+
+1. Koszt pojedynczego wywołania inc / observe / timer przy wyłączonych i włączonych pomiarach.
+2. Analiza TMX (translator_id_tmx_analysis) z pomiarami i bez - pomiary są na poziomie pliku
+   i zapisu CSV, więc czas analizy nie powinien się zmienić.
+
+Uruchomienie: python benchmarks/bench_metrics_overhead.py [liczba_segmentów]
+"""
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'translator_id_tmx_analysis'))
+
+from benchmarks.tmx_fixtures import write_tmx
+from loc_common import metrics
+import translator_id_tmx_analysis as analyzer
+
+DEFAULT_SEGMENTS = 200000
+CALLS = 200000
+FILES = 4
+
+
+def use_timer():
+    with metrics.timer('bench_seconds', {'kind': 'x'}):
+        pass
+
+
+def per_call_ns():
+    """Średni czas (ns) wywołań inc, observe i timer."""
+    timings = {}
+    for name, call in (('inc', lambda: metrics.inc('bench_total', 1, {'kind': 'x'})),
+                       ('observe', lambda: metrics.observe('bench_seconds', 0.001, {'kind': 'x'})),
+                       ('timer', use_timer)):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            call()
+        timings[name] = (time.perf_counter() - start) / CALLS * 1e9
+    return timings
+
+
+def analyze_files(tmx_dir, tmx_files):
+    start = time.perf_counter()
+    results = list(analyzer.iter_analysis_results(tmx_dir, tmx_files, 1))
+    return results, time.perf_counter() - start
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SEGMENTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        off = per_call_ns()
+        metrics.configure('bench', prom_path=os.path.join(tmp_dir, 'bench.prom'))
+        on = per_call_ns()
+        metrics.finish()
+        print(f"Wywołanie ({CALLS} razy): {'':>10} {'wyłączone ns':>13} {'włączone ns':>12}")
+        for name in off:
+            print(f"{name:>36} {off[name]:>13.0f} {on[name]:>12.0f}")
+
+        tmx_files = []
+        for i in range(FILES):
+            name = f'bench{i}.tmx'
+            write_tmx(os.path.join(tmp_dir, name), segments // FILES, seed=i + 1)
+            tmx_files.append(name)
+
+        # Pierwszy przebieg tylko rozgrzewa pamięć podręczną systemu plików
+        analyze_files(tmp_dir, tmx_files)
+        reference, off_time = analyze_files(tmp_dir, tmx_files)
+        metrics.configure('bench', os.path.join(tmp_dir, 'trace.jsonl'), os.path.join(tmp_dir, 'bench.prom'))
+        measured, on_time = analyze_files(tmp_dir, tmx_files)
+        lines = metrics.summary_lines()
+        metrics.finish()
+
+        print(f"Analiza {FILES} plików, {segments} segmentów: bez pomiarów {off_time:.2f} s, "
+              f"z pomiarami {on_time:.2f} s ({(on_time / off_time - 1) * 100:+.1f}%), "
+              f"wynik {'identyczny' if measured == reference else 'RÓŻNY!'}")
+        for line in lines:
+            print(f"  {line}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark extract_tm_name_mqres: dawny odczyt całego pliku (f.read() + regex na tekście)
+kontra czytanie kawałkami z zakończeniem przy pierwszym <ResourceName>.
+
+Tworzy folder syntetycznych kopii .mqres różnej wielkości (ResourceName w nagłówku,
+a w części plików - brak tagu, co wymusza przeczytanie całości), mierzy przepustowość
+obu metod i sprawdza, czy zwracają te same nazwy.
+
+Uruchomienie: python benchmarks/bench_mqres_names.py [liczba_plików]
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'extract_tm_name_mqres'))
+
+import extract_tm_name_mqres as tool
+
+DEFAULT_FILES = 20
+# Rozmiary plików w folderze (bajty) - powtarzane po kolei
+SIZES = [32 * 1024, 1024 * 1024, 8 * 1024 * 1024, 32 * 1024 * 1024]
+# Co który plik nie ma tagu ResourceName
+NO_TAG_EVERY = 10
+
+OLD_PATTERN = re.compile(r"<ResourceName>(.*?)</ResourceName>")
+
+
+def write_mqres(path, size, index, with_tag=True, seed=1):
+    """Zapisuje syntetyczny plik .mqres o rozmiarze ok. `size` bajtów."""
+    rnd = random.Random(seed + index)
+    line = ''.join(rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdef0123456789+/') for _ in range(76)) + '\r\n'
+    block = (line * 256).encode('ascii')
+    with open(path, 'wb') as f:
+        header = '<?xml version="1.0" encoding="utf-8"?>\r\n<MemoQResourceExport>\r\n<Header>\r\n'
+        if with_tag:
+            header += f'<ResourceName>Pamięć testowa {index}</ResourceName>\r\n'
+        header += '<ResourceType>TM</ResourceType>\r\n</Header>\r\n<Data>\r\n'
+        written = f.write(header.encode('utf-8'))
+        while written < size:
+            written += f.write(block)
+        f.write(b'</Data>\r\n</MemoQResourceExport>\r\n')
+
+
+def old_extract(path):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f_in:
+        match = OLD_PATTERN.search(f_in.read())
+    return match.group(1) if match else None
+
+
+def new_extract(path):
+    with open(path, 'rb') as f_in:
+        return tool.find_resource_name(f_in)
+
+
+def run(func, paths):
+    start = time.perf_counter()
+    results = [func(path) for path in paths]
+    return time.perf_counter() - start, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for i in range(count):
+            path = os.path.join(tmp_dir, f"backup_{i}.mqres")
+            write_mqres(path, SIZES[i % len(SIZES)], i, with_tag=(i + 1) % NO_TAG_EVERY != 0)
+            paths.append(path)
+        total_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+
+        # Pierwszy przebieg rozgrzewa pamięć podręczną systemu plików - oba pomiary czytają z RAM
+        run(old_extract, paths)
+        old_time, old_results = run(old_extract, paths)
+        new_time, new_results = run(new_extract, paths)
+
+    print(f"Folder: {count} plików, {total_mb:.0f} MB (co {NO_TAG_EVERY}. plik bez tagu)")
+    print(f"{'metoda':<22} {'czas s':>8} {'pliki/s':>9} {'MB/s':>9}")
+    for name, elapsed in (("f.read() + regex", old_time), ("kawałki, stop na 1.", new_time)):
+        print(f"{name:<22} {elapsed:>8.3f} {count / elapsed:>9.1f} {total_mb / elapsed:>9.0f}")
+    print(f"Wyniki: {'identyczne' if old_results == new_results else 'RÓŻNE!'}")
+
+
+if __name__ == '__main__':
+    main()
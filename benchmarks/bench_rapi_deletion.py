@@ -0,0 +1,146 @@
+"""
+Benchmark silnika usuwania cleanera (rapi_memoq_server_tm_cleaner/deletion_engine.py)
+na lokalnym serwerze-atrapie (benchmarks/stub_rapi_server.py) z symulowanym opóźnieniem.
+
+Porównuje:
+  stare podejście   - requests.post na każdy wpis, bez sesji (nowe połączenie za każdym razem),
+  silnik, zmienne ID - wspólna sesja, jedno żądanie naraz, malejąco,
+  silnik, stałe ID   - wspólna sesja, żądania równoległe.
+Po każdym przebiegu sprawdza, czy w TM nie został żaden wpis zablokowanego użytkownika
+i czy nie usunięto żadnego innego (losowe 429/503 są ponawiane).
+
+Druga część: pełny przebieg cleanera dla pliku TMX (plan z indeksu numerów <tu> -> usuwanie ->
+update_tu_index) przy zmiennych ID, bez ponowień, z wynikami niepewnymi:
+  500      - serwer usuwa część wpisów, ale odpowiada 500: indeks musi zostać usunięty,
+  timeout  - serwer usuwa wpis i odpowiada po czasie dłuższym niż timeout klienta: indeks musi zostać usunięty,
+  429/503  - serwer odrzuca część żądań bez usuwania: indeks zostaje i odpowiada stanowi serwera.
+
+Uruchomienie: python benchmarks/bench_rapi_deletion.py [liczba_wpisów]  (kod wyjścia 1 przy błędzie)
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'rapi_memoq_server_tm_cleaner'))
+
+import requests
+
+from benchmarks.stub_rapi_server import StubRapiServer
+from benchmarks.tmx_fixtures import write_tmx
+from deletion_engine import DeletionEngine, DELETED, FAILED, UNCERTAIN
+from deletion_journal import DeletionJournal
+from loc_common.tu_index import TuOrdinalIndex, index_path_for
+import rapi_tm_cleaner as cleaner
+
+DEFAULT_ENTRIES = 3000
+BANNED = 'banned_user'
+LATENCY = 0.002
+FAIL_RATE = 0.02
+
+# Część z indeksem numerów <tu>
+INDEX_SEGMENTS = 400
+INDEX_BANNED = ['bartek']
+CLIENT_TIMEOUT = 0.3
+INDEX_SCENARIOS = [
+    # nazwa, parametry serwera, czy indeks ma zostać
+    ('500', {'uncertain_rate': 0.05, 'uncertain_mode': '500'}, False),
+    ('timeout', {'uncertain_rate': 0.02, 'uncertain_mode': 'timeout', 'hang_seconds': 1.0}, False),
+    ('429/503', {'fail_rate': 0.3}, True),
+]
+
+
+def make_entries(count, seed=1):
+    rnd = random.Random(seed)
+    return [BANNED if rnd.random() < 0.3 else f"user{rnd.randint(1, 5)}" for _ in range(count)]
+
+
+def check(server, entries):
+    remaining = server.remaining('TM')
+    expected = [value for value in entries if value != BANNED]
+    return "OK" if remaining == expected else f"BŁĄD ({len(remaining)} zamiast {len(expected)})"
+
+
+def run_plain_requests(entries, ids):
+    with StubRapiServer({'TM': entries}, latency=LATENCY) as server:
+        guid = server.guids['TM']
+        start = time.perf_counter()
+        for entry_id in sorted(ids, reverse=True):
+            requests.post(f"{server.url}/tms/{guid}/entries/{entry_id}/delete?authToken=x", verify=False)
+        return time.perf_counter() - start, check(server, entries)
+
+
+def run_engine(entries, ids, stable_ids, workers):
+    with StubRapiServer({'TM': entries}, stable_ids=stable_ids, latency=LATENCY, fail_rate=FAIL_RATE) as server:
+        engine = DeletionEngine(server.url, 'x', max_workers=workers, stable_ids=stable_ids, backoff=0.001)
+        start = time.perf_counter()
+        deleted = sum(1 for _, status, _ in engine.delete_many(server.guids['TM'], ids) if status == DELETED)
+        elapsed = time.perf_counter() - start
+        engine.close()
+        assert deleted == len(ids), deleted
+        return elapsed, check(server, entries)
+
+
+def run_index_scenario(tmp_dir, name, server_options, index_kept):
+    tmx_path = os.path.join(tmp_dir, f"tm_{name.replace('/', '_')}.tmx")
+    write_tmx(tmx_path, INDEX_SEGMENTS, seed=3)
+    entries = list(cleaner.iter_creation_ids(tmx_path))
+    journal = DeletionJournal(tmx_path + '.journal.jsonl')
+
+    # Komunikaty cleanera (po jednym na każdy błąd) nie trafiają do wyniku benchmarku
+    with StubRapiServer({'TM': entries}, **server_options) as server, contextlib.redirect_stdout(io.StringIO()):
+        cleaner.load_tu_index(tmx_path)
+        engine = DeletionEngine(server.url, 'x', max_retries=0, backoff=0.001, timeout=CLIENT_TIMEOUT)
+        start = time.perf_counter()
+        ids = cleaner.prepare_deletion_plan(journal, tmx_path, INDEX_BANNED)
+        cleaner.delete_entries_on_server('x', server.guids['TM'], ids, engine, journal)
+        cleaner.update_tu_index(tmx_path, journal)
+        elapsed = time.perf_counter() - start
+        engine.close()
+        remaining = server.remaining('TM')
+
+    state = journal.load()
+    index = TuOrdinalIndex.load(index_path_for(tmx_path))
+    problems = []
+    if (index is not None) != index_kept:
+        problems.append("indeks " + ("usunięty" if index_kept else "pozostał mimo niepewnego wyniku"))
+    if index is not None:
+        for user in {value.lower() for value in entries if value}:
+            expected = [i for i, value in enumerate(remaining) if value and value.lower() == user]
+            if index.lookup(user) != expected:
+                problems.append(f"indeks nie odpowiada serwerowi dla {user}")
+    status = "OK" if not problems else "BŁĄD: " + "; ".join(problems)
+    print(f"{'indeks, ' + name:<30} {elapsed:>7.2f} s  niepewne {state.count(UNCERTAIN)}, "
+          f"nieudane {state.count(FAILED)}, indeks {'zachowany' if index is not None else 'usunięty'}  {status}")
+    return not problems
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES
+    entries = make_entries(count)
+    ids = [i for i, value in enumerate(entries) if value == BANNED]
+    print(f"TM: {count} wpisów, do usunięcia: {len(ids)}, opóźnienie serwera {LATENCY * 1000:.0f} ms")
+
+    results = [
+        ("requests.post bez sesji", run_plain_requests(entries, ids)),
+        ("silnik, zmienne ID (1 wątek)", run_engine(entries, ids, stable_ids=False, workers=8)),
+        ("silnik, stałe ID (8 wątków)", run_engine(entries, ids, stable_ids=True, workers=8)),
+    ]
+    for name, (elapsed, status) in results:
+        print(f"{name:<30} {elapsed:>7.2f} s {len(ids) / elapsed:>8.0f} usunięć/s  {status}")
+
+    cleaner.TU_INDEX = True
+    cleaner.ENTRY_IDS_STABLE = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_results = [run_index_scenario(tmp_dir, *scenario) for scenario in INDEX_SCENARIOS]
+    ok = all(status == "OK" for _, (_, status) in results) and all(index_results)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
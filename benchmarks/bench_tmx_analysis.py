@@ -0,0 +1,82 @@
+"""
+Benchmark pętli analizy translator_id_tmx_analysis (segmenty/s) na wygenerowanym pliku TMX.
+
+Dla każdego backendu parsera mierzy:
+  parser  - samo iter_tu_records z tekstami <seg> (dolna granica),
+  analiza - pełne _analyze_tmx_source (parser + zliczanie statystyk).
+Różnica to koszt pętli analizy po stronie Pythona.
+
+Uruchomienie:
+  python benchmarks/bench_tmx_analysis.py [liczba_segmentów]
+  python benchmarks/bench_tmx_analysis.py [liczba_segmentów] --profile   (cProfile pełnej analizy, top 20)
+"""
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'translator_id_tmx_analysis'))
+
+from benchmarks.tmx_fixtures import write_tmx
+from loc_common.tmx_stream import available_backends, iter_tu_records
+import translator_id_tmx_analysis as analyzer
+
+DEFAULT_SEGMENTS = 200000
+REPEATS = 3
+PROFILE_TOP = 20
+
+
+def best_time(func):
+    """Najlepszy czas z REPEATS przebiegów (sekundy)."""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def parse_only(path, backend):
+    for _ in iter_tu_records(path, {}, want_text=True, backend=backend):
+        pass
+
+
+def profile(path, backend):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    analyzer._analyze_tmx_source(path, backend=backend)
+    profiler.disable()
+    pstats.Stats(profiler).sort_stats('tottime').print_stats(PROFILE_TOP)
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    segments = int(args[0]) if args else DEFAULT_SEGMENTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.tmx')
+        size_mb = write_tmx(path, segments) / 1e6
+        print(f"Plik: {segments} segmentów, {size_mb:.1f} MB")
+
+        if '--profile' in sys.argv:
+            profile(path, analyzer.TMX_BACKEND)
+            return
+
+        print(f"{'backend':>8} {'parser seg/s':>13} {'analiza seg/s':>14} {'pętla analizy':>14}")
+        for backend in available_backends():
+            stats, count = analyzer._analyze_tmx_source(path, backend=backend)
+            assert count == segments
+
+            parse_time = best_time(lambda: parse_only(path, backend))
+            analysis_time = best_time(lambda: analyzer._analyze_tmx_source(path, backend=backend))
+            loop_share = (analysis_time - parse_time) / analysis_time * 100
+            print(f"{backend:>8} {segments / parse_time:>13,.0f} {segments / analysis_time:>14,.0f} {loop_share:>13.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark przepustowości backendów parsera TMX (loc_common.tmx_stream) w MB/s.
+
+Dwa scenariusze:
+  atrybuty - same atrybuty <tu> (jak get_ids_to_delete_from_tmx w cleanerze),
+  tekst    - atrybuty + teksty <seg> (jak analiza w translator_id_tmx_analysis).
+Dodatkowo w scenariuszu "atrybuty" mierzony jest skaner bajtowy scan_tu_attribute (mmap + regex).
+
+Uruchomienie: python benchmarks/bench_tmx_backends.py [liczba_segmentów]
+"""
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.tmx_fixtures import write_tmx
+from loc_common.tmx_stream import available_backends, iter_tu_records, scan_tu_attribute
+
+DEFAULT_SEGMENTS = 200000
+REPEATS = 3
+
+
+def best_time(path, backend, want_text):
+    """Najlepszy czas z REPEATS przebiegów (sekundy) i liczba <tu>."""
+    best = None
+    count = 0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        if backend == 'mmap-regex':
+            count = sum(1 for _ in scan_tu_attribute(path, 'creationid'))
+        else:
+            count = sum(1 for _ in iter_tu_records(path, want_text=want_text, backend=backend))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SEGMENTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.tmx')
+        size_mb = write_tmx(path, segments) / 1e6
+        print(f"Plik: {segments} segmentów, {size_mb:.1f} MB")
+        print(f"{'backend':>10} {'atrybuty MB/s':>14} {'tekst MB/s':>11}")
+
+        for backend in available_backends():
+            attrs_time, count = best_time(path, backend, want_text=False)
+            assert count == segments
+            text_time, _ = best_time(path, backend, want_text=True)
+            print(f"{backend:>10} {size_mb / attrs_time:>14.1f} {size_mb / text_time:>11.1f}")
+
+        scan_time, count = best_time(path, 'mmap-regex', want_text=False)
+        assert count == segments
+        print(f"{'mmap-regex':>10} {size_mb / scan_time:>14.1f} {'-':>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark pamięci: szczytowe RSS przy strumieniowym czytaniu TMX różnej wielkości.
+
+Porównuje dawną pętlę (iterparse + samo elem.clear()) z loc_common.tmx_stream.iter_tu_elements
+(czyszczenie i odpinanie <tu> od <body>). Każdy pomiar działa w osobnym procesie, więc szczyt RSS
+nie jest zawyżany przez poprzednie pomiary. Przy stałej pamięci RSS nie rośnie razem z plikiem.
+
+Uruchomienie: python benchmarks/bench_tmx_memory.py [liczba_segmentów ...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.tmx_fixtures import write_tmx
+
+DEFAULT_SIZES = [20000, 100000, 400000]
+
+CHILD_CODE = r'''
+import sys, xml.etree.ElementTree as ET
+sys.path.insert(0, sys.argv[3])
+mode, path = sys.argv[1], sys.argv[2]
+count = 0
+if mode == 'clear-only':
+    for event, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'tu':
+            count += 1
+            elem.clear()
+else:
+    from loc_common.tmx_stream import iter_tu_elements
+    for elem in iter_tu_elements(path):
+        count += 1
+try:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+except ImportError:
+    rss_kb = -1
+print(count, rss_kb)
+'''
+
+
+def measure(mode, path):
+    """Uruchamia pętlę w osobnym procesie i zwraca (liczba <tu>, szczytowe RSS w MB)."""
+    out = subprocess.run([sys.executable, '-c', CHILD_CODE, mode, path, REPO_DIR],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True, check=True).stdout.split()
+    count, rss_kb = int(out[0]), int(out[1])
+    return count, (rss_kb / 1024 if rss_kb >= 0 else float('nan'))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print(f"{'segmenty':>10} {'plik MB':>9} {'clear-only RSS MB':>18} {'tmx_stream RSS MB':>18}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for segments in sizes:
+            path = os.path.join(tmp_dir, f"bench_{segments}.tmx")
+            file_size = write_tmx(path, segments)
+
+            _, old_rss = measure('clear-only', path)
+            count, new_rss = measure('tmx_stream', path)
+            assert count == segments
+
+            print(f"{segments:>10} {file_size / 1e6:>9.1f} {old_rss:>18.1f} {new_rss:>18.1f}")
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
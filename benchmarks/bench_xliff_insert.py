@@ -0,0 +1,94 @@
+"""
+Mikrobenchmark wstawiania <target> w xliff_copy_src_to_trg (add_missing_target)
+na segmentach z dużą liczbą tagów wewnętrznych (<ph>, <pc> z zagnieżdżeniami).
+
+Porównuje dawną wersję (list(elem).index + copy.deepcopy każdego tagu) z obecną
+(pozycja source z jednego przejścia + kopia elementów bez deepcopy) i sprawdza,
+czy obie dają identyczny XML. Na czas pomiaru odśmiecacz (gc) jest wyłączony - przy setkach tysięcy
+elementów w drzewie testowym jego przebiegi zagłuszają mierzony koszt (w trybie strumieniowym
+narzędzia w pamięci jest tylko bieżący segment).
+
+Uruchomienie: python benchmarks/bench_xliff_insert.py [liczba_segmentów] [tagów_na_segment]
+"""
+import copy
+import gc
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'xliff_copy_src_to_trg'))
+
+import xliff_copy_src_to_trg as tool
+
+NS = '{urn:oasis:names:tc:xliff:document:2.0}'
+DEFAULT_SEGMENTS = 2000
+DEFAULT_TAGS = 200
+
+
+def add_missing_target_old(elem):
+    """Dawna pętla z process_xlf_files (do porównania)."""
+    source_node = None
+    target_node = None
+    for child in elem:
+        if child.tag.endswith('source'):
+            source_node = child
+        elif child.tag.endswith('target'):
+            target_node = child
+    if source_node is not None and target_node is None:
+        new_tag_name = source_node.tag.replace('source', 'target')
+        target_node = ET.Element(new_tag_name)
+        target_node.text = source_node.text
+        for internal_tag in source_node:
+            target_node.append(copy.deepcopy(internal_tag))
+        parent_list = list(elem)
+        source_index = parent_list.index(source_node)
+        elem.insert(source_index + 1, target_node)
+        if source_node.tail:
+            target_node.tail = source_node.tail
+        return True
+    return False
+
+
+def build_segments(count, tags):
+    """Segmenty z notatkami przed <source> i `tags` tagami wewnętrznymi w <source>."""
+    parts = []
+    for i in range(count):
+        inline = ''.join(
+            f'<ph id="{j}" equiv="{{{j}}}" />w{j} ' if j % 3 else f'<pc id="{j}" type="fmt"><ph id="n{j}" />b{j}</pc> '
+            for j in range(tags))
+        parts.append(f'<segment id="s{i}"><notes><note>n</note></notes><source>S{i} {inline}</source>\n</segment>')
+    xml = f'<file xmlns="{NS[1:-1]}">' + ''.join(parts) + '</file>'
+    return ET.fromstring(xml)
+
+
+def run(func, root):
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    for segment in root:
+        func(segment)
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SEGMENTS
+    tags = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TAGS
+
+    old_root = build_segments(count, tags)
+    new_root = build_segments(count, tags)
+    old_time = run(add_missing_target_old, old_root)
+    new_time = run(tool.add_missing_target, new_root)
+    same = ET.tostring(old_root) == ET.tostring(new_root)
+
+    print(f"Segmenty: {count}, tagów wewnętrznych na segment: {tags}")
+    print(f"dawna wersja  {old_time:>7.3f} s")
+    print(f"obecna wersja {new_time:>7.3f} s  (x{old_time / new_time:.1f})")
+    print(f"Wynik: {'identyczny' if same else 'RÓŻNY!'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark xliff_copy_src_to_trg: tryb DOM (ET.parse + tree.write) kontra tryb strumieniowy.
+
+Każdy pomiar działa w osobnym procesie (czas i szczytowe RSS). Na końcu sprawdza,
+czy oba tryby dały bajtowo identyczne pliki wynikowe.
+
+Uruchomienie: python benchmarks/bench_xliff_streaming.py [liczba_unitów ...]
+"""
+import filecmp
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.xliff_fixtures import write_xliff
+
+DEFAULT_SIZES = [20000, 100000, 400000]
+
+CHILD_CODE = r'''
+import sys, time
+sys.path.insert(0, sys.argv[4])
+import xliff_copy_src_to_trg as tool
+mode, path, output_path = sys.argv[1:4]
+start = time.perf_counter()
+if mode == 'dom':
+    tool.process_file_dom(path, output_path)
+else:
+    tool.process_file_streaming(path, output_path)
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+except ImportError:
+    rss_kb = -1
+print(elapsed, rss_kb)
+'''
+
+
+def measure(mode, path, output_path):
+    """Przetwarza plik w osobnym procesie i zwraca (czas w s, szczytowe RSS w MB)."""
+    tool_dir = os.path.join(REPO_DIR, 'xliff_copy_src_to_trg')
+    out = subprocess.run([sys.executable, '-c', CHILD_CODE, mode, path, output_path, tool_dir],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True, check=True).stdout.split()
+    elapsed, rss_kb = float(out[0]), int(out[1])
+    return elapsed, (rss_kb / 1024 if rss_kb >= 0 else float('nan'))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print(f"{'unity':>8} {'plik MB':>8} {'DOM s':>7} {'DOM RSS MB':>11} {'stream s':>9} {'stream RSS MB':>14}  wynik")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for units in sizes:
+            path = os.path.join(tmp_dir, f"bench_{units}.xml")
+            dom_out = os.path.join(tmp_dir, "dom.xml")
+            stream_out = os.path.join(tmp_dir, "stream.xml")
+            file_size = write_xliff(path, units)
+
+            dom_time, dom_rss = measure('dom', path, dom_out)
+            stream_time, stream_rss = measure('stream', path, stream_out)
+            same = filecmp.cmp(dom_out, stream_out, shallow=False)
+
+            print(f"{units:>8} {file_size / 1e6:>8.1f} {dom_time:>7.2f} {dom_rss:>11.1f} "
+                  f"{stream_time:>9.2f} {stream_rss:>14.1f}  {'identyczny' if same else 'RÓŻNY!'}")
+            for p in (path, dom_out, stream_out):
+                os.remove(p)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Lokalny serwer-atrapa MemoQ Resource API do testów i benchmarków cleanera (bez prawdziwego serwera).
+
+Obsługuje: POST /auth/login, POST /auth/logout, GET /tms (z ETag / If-None-Match), POST /tms/{guid}/entries/{id}/delete.
+Wpisy TM to zwykła lista (ID = pozycja na liście, przesuwa się po usunięciu) albo - przy stable_ids=True -
+słownik o stałych kluczach. Opcjonalnie symuluje opóźnienie, losowe odpowiedzi 429/503 (bez usuwania)
+i usunięcia bez potwierdzenia (wpis usunięty, ale odpowiedź 500 albo spóźniona ponad timeout klienta)
+oraz wygasanie tokenu (401 po określonej liczbie żądań usunięcia, do ponownego logowania).
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DELETE_PATH = re.compile(r'^/tms/([^/]+)/entries/(\d+)/delete$')
+# Wewnętrzny "kod" odpowiedzi: wpis usunięty, odpowiedź 200 wysyłana dopiero po hang_seconds
+HANG = -1
+
+
+class StubRapiServer:
+    """
+    tms         - słownik {FriendlyName: lista wartości wpisów} (np. creationid każdego <tu>),
+    stable_ids  - czy ID wpisów są stałe (True) czy przesuwają się jak numery <tu> (False),
+    latency     - opóźnienie każdej odpowiedzi (sekundy),
+    fail_rate   - ułamek żądań usunięcia kończonych odpowiedzią 429 lub 503 (bez usuwania),
+    uncertain_rate - ułamek żądań, które usuwają wpis, ale go nie potwierdzają:
+                  uncertain_mode "500" - odpowiedź 500, "timeout" - odpowiedź dopiero po hang_seconds,
+    token_uses  - po tylu żądaniach usunięcia token wygasa (401 bez usuwania); każde logowanie
+                  wydaje nowy token. None = token nie wygasa i nie jest sprawdzany.
+    """
+
+    def __init__(self, tms, stable_ids=False, latency=0.0, fail_rate=0.0, seed=1,
+                 uncertain_rate=0.0, uncertain_mode="500", hang_seconds=2.0, token_uses=None):
+        self.stable_ids = stable_ids
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.uncertain_rate = uncertain_rate
+        self.uncertain_mode = uncertain_mode
+        self.hang_seconds = hang_seconds
+        self.unconfirmed = 0
+        self.token_uses = token_uses
+        self.token = "stub-token"
+        self.logins = 0
+        self.token_requests = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_count = 0
+        self.guids = {}
+        self.entries = {}
+        for number, (name, values) in enumerate(tms.items()):
+            guid = f"00000000-0000-0000-0000-{number:012d}"
+            self.guids[name] = guid
+            self.entries[guid] = dict(enumerate(values)) if stable_ids else list(values)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/memoqserverhttpapi/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def remaining(self, name):
+        """Wartości wpisów pozostałych w TM (w kolejności ID)."""
+        entries = self.entries[self.guids[name]]
+        return [entries[key] for key in sorted(entries)] if self.stable_ids else list(entries)
+
+    def tm_list(self):
+        return [{"FriendlyName": name, "TMGuid": guid, "NumEntries": len(self.entries[guid]),
+                 "SourceLangCode": "eng", "TargetLangCode": "pol"}
+                for name, guid in self.guids.items()]
+
+    # --- obsługa żądań ---
+
+    def login(self):
+        with self.lock:
+            self.logins += 1
+            self.token = f"stub-token-{self.logins}"
+            self.token_requests = 0
+            return self.token
+
+    def handle_delete(self, guid, entry_id, token=None):
+        """Zwraca kod HTTP dla żądania usunięcia."""
+        with self.lock:
+            self.requests_count += 1
+            if self.token_uses is not None:
+                if token != self.token or self.token_requests >= self.token_uses:
+                    return 401
+                self.token_requests += 1
+            if self.fail_rate and self.random.random() < self.fail_rate:
+                return self.random.choice((429, 503))
+            entries = self.entries.get(guid)
+            if entries is None:
+                return 404
+            if self.stable_ids:
+                if entries.pop(entry_id, None) is None:
+                    return 404
+            else:
+                if entry_id >= len(entries):
+                    return 404
+                del entries[entry_id]
+            if self.uncertain_rate and self.random.random() < self.uncertain_rate:
+                self.unconfirmed += 1
+                return 500 if self.uncertain_mode == "500" else HANG
+            return 200
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload=None, headers=None):
+                body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b''
+
+            def do_GET(self):
+                path = urlsplit(self.path).path.split('/memoqserverhttpapi/v1', 1)[-1]
+                if server.latency:
+                    time.sleep(server.latency)
+                if path == '/tms':
+                    tms = server.tm_list()
+                    etag = '"%08x"' % (zlib.crc32(json.dumps(tms).encode('utf-8')))
+                    if self.headers.get("If-None-Match") == etag:
+                        self._reply(304, headers={"ETag": etag})
+                    else:
+                        self._reply(200, tms, headers={"ETag": etag})
+                else:
+                    self._reply(404)
+
+            def do_POST(self):
+                self._read_body()
+                path = urlsplit(self.path).path.split('/memoqserverhttpapi/v1', 1)[-1]
+                if server.latency:
+                    time.sleep(server.latency)
+                if path == '/auth/login':
+                    self._reply(200, {"Name": "stub", "Sid": "1", "AccessToken": server.login()})
+                elif path == '/auth/logout':
+                    self._reply(204)
+                else:
+                    match = DELETE_PATH.match(path)
+                    if not match:
+                        self._reply(404)
+                        return
+                    token = parse_qs(urlsplit(self.path).query).get("authToken", [None])[0]
+                    status = server.handle_delete(match.group(1), int(match.group(2)), token)
+                    if status == HANG:
+                        time.sleep(server.hang_seconds)
+                        try:
+                            self._reply(200)
+                        except (BrokenPipeError, ConnectionResetError):
+                            # Klient już zrezygnował (timeout) - właśnie tę sytuację symulujemy
+                            self.close_connection = True
+                        return
+                    self._reply(status, headers={"Retry-After": "0"} if status in (429, 503) else None)
+
+        return Handler
@@ -0,0 +1,44 @@
+"""
+Generator syntetycznych plików TMX do benchmarków.
+Struktura jak w eksportach memoQ: nagłówek z <prop type="targetlang">, w <body> bloki <tu>
+z creationid/changeid, dwa <tuv> i tagi wewnętrzne w <seg>.
+"""
+import random
+
+USERS = ['anna.k', 'bartek', 'cezary.w', 'tszczepaniak', 'ewa_pm', 'MT_ENGINE']
+
+HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<tmx version="1.4">\n'
+    '<header creationtool="fixtures" creationtoolversion="1" segtype="sentence" '
+    'o-tmf="memoQTM" adminlang="en-us" srclang="en-US" datatype="unknown">\n'
+    '<prop type="targetlang">pl-PL</prop>\n'
+    '<prop type="name">Fixture TM</prop>\n'
+    '</header>\n'
+    '<body>\n'
+)
+FOOTER = '</body>\n</tmx>\n'
+
+
+def write_tmx(path, segments, seed=1, users=USERS):
+    """Zapisuje plik TMX z podaną liczbą segmentów <tu>. Zwraca rozmiar pliku w bajtach."""
+    rnd = random.Random(seed)
+    size = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        size += f.write(HEADER)
+        for i in range(segments):
+            creation_id = rnd.choice(users)
+            change_id = creation_id if rnd.random() < 0.6 else rnd.choice(users)
+            creation_date = f"2024{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}T{rnd.randint(0, 23):02d}0000Z"
+            change_date = creation_date if rnd.random() < 0.4 else f"2025{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}T120000Z"
+            words = ' '.join(f"slowo{rnd.randint(0, 999)}" for _ in range(rnd.randint(3, 20)))
+            size += f.write(
+                f'<tu changedate="{change_date}" creationdate="{creation_date}" '
+                f'creationid="{creation_id}" changeid="{change_id}">\n'
+                f'<prop type="client">Klient &amp; Co</prop>\n'
+                f'<tuv xml:lang="en-US"><seg>Source {i} <bpt i="1">&lt;b&gt;</bpt>{words}<ept i="1">&lt;/b&gt;</ept></seg></tuv>\n'
+                f'<tuv xml:lang="pl-PL"><seg>Cel {i} <ph>&lt;br/&gt;</ph>{words} zażółć</seg></tuv>\n'
+                '</tu>\n'
+            )
+        size += f.write(FOOTER)
+    return size
@@ -0,0 +1,34 @@
+"""
+Generator syntetycznych plików XLIFF 2.0 do benchmarków narzędzia xliff_copy_src_to_trg.
+Część segmentów ma już <target>, część nie; <source> zawiera tagi wewnętrzne (<pc>, <ph>).
+"""
+import random
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<xliff xmlns="urn:oasis:names:tc:xliff:document:2.0" xmlns:mq="http://www.memoq.com/xliff" '
+    'version="2.0" srcLang="en-US" trgLang="pl-PL">\n'
+    '  <file id="f1">\n'
+)
+FOOTER = '  </file>\n</xliff>\n'
+
+
+def write_xliff(path, units, seed=1, with_target=0.3):
+    """Zapisuje plik XLIFF z podaną liczbą <unit>. Zwraca rozmiar pliku w bajtach."""
+    rnd = random.Random(seed)
+    size = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        size += f.write(HEADER)
+        for i in range(units):
+            words = ' '.join(f"word{rnd.randint(0, 999)}" for _ in range(rnd.randint(3, 20)))
+            source = f'Source {i} <pc id="1">{words}</pc> &amp; <ph id="2"/> zażółć'
+            target = f'\n        <target>Cel {i} {words}</target>' if rnd.random() < with_target else ''
+            size += f.write(
+                f'    <unit id="u{i}">\n'
+                f'      <segment mq:status="NotStarted">\n'
+                f'        <source>{source}</source>{target}\n'
+                f'      </segment>\n'
+                f'    </unit>\n'
+            )
+        size += f.write(FOOTER)
+    return size
@@ -1,75 +1,215 @@
 import os
 import csv
+import codecs
 import re  # Biblioteka do wyrażeń regularnych (Regex)
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Pobiera ścieżkę do folderu, w którym jest ten skrypt
-input_path = os.path.dirname(os.path.abspath(__file__))
-
-print("========================================")
-print(f"Pracuje w folderze: {input_path}")
-print("========================================")
-
-# Krok 1: Szukanie plików
-try:
-    all_files = os.listdir(input_path)
-    mqres_files = [f for f in all_files if f.lower().endswith('.mqres')]
-    total_files = len(mqres_files)
-    print(f"Znaleziono pliki .mqres: {total_files}")
-except Exception as e:
-    print(f"Blad krytyczny przy czytaniu folderu: {e}")
+# Wspólny moduł pomiarów (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common import metrics
+
+# Rozmiar kawałka czytanego z pliku (bajty). ResourceName leży zwykle w pierwszych kilku KB,
+# więc zwykle wystarcza jeden odczyt - niezależnie od wielkości pliku .mqres
+CHUNK_SIZE = 64 * 1024
+# Liczba wątków czytających pliki jednocześnie (1 = po kolei). Przy udziale sieciowym (NAS)
+# czas to głównie oczekiwanie na dysk/sieć, więc kilkanaście wątków mocno skraca skanowanie.
+THREADS = 16
+# Szukanie plików .mqres także w podfolderach (bez folderu output)
+RECURSIVE = True
+# Dodatkowe tagi z nagłówka zapisywane jako kolejne kolumny CSV (w tym samym odczycie pliku),
+# np. ["ResourceType", "SourceLanguage", "TargetLanguage", "ResourceGuid"]. Pusta lista = brak.
+EXTRA_TAGS = []
+# Dodatkowych tagów szukamy tylko w pierwszych HEADER_SCAN_LIMIT bajtach pliku
+# (ResourceName - jak dotąd - do skutku)
+HEADER_SCAN_LIMIT = 1024 * 1024
+# Pomiary wydajności (loc_common/metrics.py) w folderze output: ślad JSON Lines i snapshot w formacie
+# textfile Prometheusa (czas odczytu pliku, przeczytane bajty, czas zapisu CSV). None = wyłączone.
+METRICS_TRACE_FILE = None
+METRICS_PROM_FILE = None
+
+# Wzorzec Regex: szukamy wszystkiego pomiędzy tagami
+# ([^\r\n]*?) oznacza: złap dowolny ciąg znaków (jak najmniej), aż trafisz na zamknięcie tagu.
+# Czytamy bez zamiany końców linii, więc zamiast '.' jest [^\r\n] - jak dawniej w trybie tekstowym
+# dopasowanie nie przechodzi przez koniec linii (\n, \r\n ani samo \r)
+OPEN_TAG = "<ResourceName>"
+pattern = re.compile(r"<ResourceName>([^\r\n]*?)</ResourceName>")
+
+# Skompilowane wzorce dla tagów (ten sam kształt co pattern)
+tag_patterns = {"ResourceName": pattern}
+
+def get_tag_pattern(tag):
+    if tag not in tag_patterns:
+        name = re.escape(tag)
+        tag_patterns[tag] = re.compile(f"<{name}>([^\\r\\n]*?)</{name}>")
+    return tag_patterns[tag]
+
+def keep_from(buffer, open_tag=OPEN_TAG):
+    """
+    Od którego miejsca bufora trzeba zachować dane na następny kawałek (zakładka).
+    Dopasowanie mieści się w jednej linii, więc wystarczy ostatnia, niedokończona linia:
+    od pierwszego niedomkniętego tagu w tej linii, a jeśli go nie ma - tylko tyle
+    znaków, ile może mieć początek tagu przecięty granicą kawałka.
+    """
+    line_start = max(buffer.rfind("\n"), buffer.rfind("\r")) + 1
+    open_pos = buffer.find(open_tag, line_start)
+    if open_pos >= 0:
+        return open_pos
+    return max(line_start, len(buffer) - (len(open_tag) - 1))
+
+def find_tags(f_in, tags, optional_tags=(), scan_limit=None, chunk_size=CHUNK_SIZE):
+    """
+    Czyta plik (otwarty binarnie) kawałkami i zwraca słownik {tag: zawartość pierwszego <tag>...</tag>}.
+    Tagów z `tags` szuka do końca pliku, tagów z `optional_tags` - tylko w pierwszych `scan_limit` bajtach.
+    Kończy czytanie, gdy wszystkie tagi są znalezione.
+    """
+    # Dekoder przyrostowy składa znaki UTF-8 przecięte granicą kawałka.
+    # errors='ignore' sprawia, że skrypt nie wyrzuci błędu przy dziwnych znakach.
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    pending = {tag: get_tag_pattern(tag) for tag in list(tags) + list(optional_tags)}
+    found = {}
+    buffer = ""
+    bytes_read = 0
+    while pending:
+        chunk = f_in.read(chunk_size)
+        if not chunk:
+            break
+        bytes_read += len(chunk)
+        buffer += decoder.decode(chunk)
+
+        # Szukamy wzorców w bieżącym kawałku (razem z zakładką z poprzedniego)
+        for tag, tag_pattern in list(pending.items()):
+            match = tag_pattern.search(buffer)
+            if match:
+                # match.group(1) to to, co jest wewnątrz nawiasów
+                found[tag] = match.group(1)
+                del pending[tag]
+
+        if scan_limit is not None and bytes_read >= scan_limit:
+            for tag in optional_tags:
+                pending.pop(tag, None)
+
+        if pending:
+            buffer = buffer[min(keep_from(buffer, f"<{tag}>") for tag in pending):]
+    metrics.inc("mqres_read_bytes_total", bytes_read)
+    return found
+
+def find_resource_name(f_in, chunk_size=CHUNK_SIZE):
+    """
+    Czyta plik (otwarty binarnie) kawałkami i zwraca zawartość pierwszego tagu <ResourceName>
+    albo None. Kończy czytanie przy pierwszym trafieniu.
+    """
+    return find_tags(f_in, ["ResourceName"], chunk_size=chunk_size).get("ResourceName")
+
+def extract_resource_name(full_path, extra_tags=()):
+    """Zwraca wartości kolumn CSV dla jednego pliku .mqres: [ResourceName, Status, dodatkowe tagi...]."""
+    start = time.perf_counter()
+    try:
+        with open(full_path, 'rb') as f_in:
+            found = find_tags(f_in, ["ResourceName"], extra_tags, HEADER_SCAN_LIMIT)
+    except Exception as e:
+        metrics.observe("mqres_file_seconds", time.perf_counter() - start, {"status": "read_error"}, file=full_path)
+        return ["BLAD ODCZYTU PLIKU", str(e)] + ["-"] * len(extra_tags)
+
+    metrics.observe("mqres_file_seconds", time.perf_counter() - start,
+                    {"status": "ok" if "ResourceName" in found else "no_tag"}, file=full_path)
+    extra_values = [found.get(tag, "-") for tag in extra_tags]
+    if "ResourceName" not in found:
+        return ["BRAK TAGU", "Nie znaleziono wzorca"] + extra_values
+    return [found["ResourceName"], "OK"] + extra_values
+
+def find_mqres_files(folder, recursive=True, skip_dir=None):
+    """
+    Ścieżki plików .mqres względem folderu (posortowane), zbierane przez os.scandir - typ wpisu
+    jest znany z listingu, bez osobnego zapytania o każdy plik (ważne na udziale sieciowym).
+    """
     mqres_files = []
+    dirs = [folder]
+    while dirs:
+        current = dirs.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            if current == folder:
+                raise
+            print(f"Blad odczytu folderu {current}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and entry.path != skip_dir:
+                    subdirs.append(entry.path)
+            elif entry.name.lower().endswith('.mqres'):
+                mqres_files.append(os.path.relpath(entry.path, folder))
+        # Odwrotnie na stos - podfoldery przetwarzamy w kolejności alfabetycznej
+        dirs.extend(reversed(subdirs))
+    return sorted(mqres_files)
 
-# Krok 2: Przetwarzanie tekstowe
-if mqres_files:
+def iter_scan_results(input_path, mqres_files, threads):
+    """Wyniki extract_resource_name w kolejności listy plików; przy threads > 1 pliki czyta pula wątków."""
+    paths = [os.path.join(input_path, filename) for filename in mqres_files]
+    if threads <= 1:
+        for path in paths:
+            yield extract_resource_name(path, EXTRA_TAGS)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # map oddaje wyniki w kolejności zleceń, więc wiersze CSV są w kolejności plików
+        yield from executor.map(lambda path: extract_resource_name(path, EXTRA_TAGS), paths)
+
+def main():
+    # Pobiera ścieżkę do folderu, w którym jest ten skrypt
+    input_path = os.path.dirname(os.path.abspath(__file__))
     output_dir = os.path.join(input_path, "output")
+
+    print("========================================")
+    print(f"Pracuje w folderze: {input_path}")
+    print("========================================")
+
+    # Krok 1: Szukanie plików
+    try:
+        mqres_files = find_mqres_files(input_path, RECURSIVE, skip_dir=output_dir)
+        total_files = len(mqres_files)
+        print(f"Znaleziono pliki .mqres: {total_files}")
+    except Exception as e:
+        print(f"Blad krytyczny przy czytaniu folderu: {e}")
+        mqres_files = []
+
+    if not mqres_files:
+        print("Nie mam czego przetwarzac. Brak plikow .mqres w folderze.")
+        return
+
+    # Krok 2: Przetwarzanie tekstowe
     os.makedirs(output_dir, exist_ok=True)
     csv_path = os.path.join(output_dir, "wyniki_regex.csv")
     
     print(f"Tworze plik csv: {csv_path}")
+    if THREADS > 1:
+        print(f"Tryb wielowatkowy: {THREADS} watkow")
+    if metrics.configure("extract_tm_name_mqres",
+                         os.path.join(output_dir, METRICS_TRACE_FILE) if METRICS_TRACE_FILE else None,
+                         os.path.join(output_dir, METRICS_PROM_FILE) if METRICS_PROM_FILE else None):
+        print("Pomiary wydajnosci: wlaczone (loc_common/metrics.py)")
+        metrics.event("start", files=total_files, threads=THREADS)
     
     try:
         with open(csv_path, mode='w', newline='', encoding='utf-8') as f_out: 
             writer = csv.writer(f_out, delimiter=';')
-            writer.writerow(['Nazwa pliku', 'ResourceName', 'Status'])
+            writer.writerow(['Nazwa pliku', 'ResourceName', 'Status'] + EXTRA_TAGS)
             
             count = 0
-            
-            # Wzorzec Regex: szukamy wszystkiego pomiędzy tagami
-            # (.*?) oznacza: złap dowolny ciąg znaków (jak najmniej), aż trafisz na zamknięcie tagu
-            pattern = re.compile(r"<ResourceName>(.*?)</ResourceName>")
-            
 
-            for filename in mqres_files:
+            for filename, values in zip(mqres_files, iter_scan_results(input_path, mqres_files, THREADS)):
                 count += 1
-                full_path = os.path.join(input_path, filename)
-                resource_val = "-"
-                status_msg = "OK"
-
-                try:
-                    # Otwieramy plik jako zwykły tekst.
-                    # errors='ignore' sprawia, że skrypt nie wyrzuci błędu przy dziwnych znakach.
-                    with open(full_path, 'r', encoding='utf-8', errors='ignore') as f_in:
-                        content = f_in.read()
-                        
-                        # Szukamy wzorca w treści pliku
-                        match = pattern.search(content)
-                        
-                        if match:
-                            # match.group(1) to to, co jest wewnątrz nawiasów (.*?)
-                            resource_val = match.group(1)
-                        else:
-                            resource_val = "BRAK TAGU"
-                            status_msg = "Nie znaleziono wzorca"
-                            
-                except Exception as e:
-                    resource_val = "BLAD ODCZYTU PLIKU"
-                    status_msg = str(e)
 
                 # Zapis do CSV
-                writer.writerow([filename, resource_val, status_msg])
+                with metrics.timer("csv_write_seconds", {"report": "mqres"}):
+                    writer.writerow([filename] + values)
                 
                 # Wyświetlanie postępu
-                print(f"[{count}/{total_files}] {filename} -> {resource_val}")
+                print(f"[{count}/{total_files}] {filename} -> {values[0]}")
 
             print("========================================")
             print(f"SUKCES! Przetworzono {count} plikow.")
@@ -77,8 +217,16 @@ if mqres_files:
     except Exception as e:
         print(f"BLAD zapisu pliku CSV (zamknij Excela!): {e}")
 
-else:
-    print("Nie mam czego przetwarzac. Brak plikow .mqres w folderze.")
+    if metrics.enabled():
+        print("Pomiary wydajnosci:")
+        for line in metrics.summary_lines():
+            print(f"  {line}")
+        try:
+            metrics.finish()
+        except OSError as e:
+            print(f"BLAD zapisu pomiarow: {e}")
 
-print("========================================")
-input("Nacisnij ENTER, aby zakonczyc")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
+    print("========================================")
+    input("Nacisnij ENTER, aby zakonczyc")
\ No newline at end of file
@@ -0,0 +1,4 @@
+"""
+Wspólne moduły narzędzi z tego repozytorium (strumieniowe czytanie TMX itp.).
+Skrypty z podfolderów dodają główny folder repozytorium do sys.path i importują stąd.
+"""
@@ -0,0 +1,180 @@
+"""
+Czytanie skompresowanych plików wejściowych (TMX, XLIFF) bez rozpakowywania na dysk.
+
+Format rozpoznajemy po końcówce nazwy:
+  .gz / .xz / .bz2 - pojedynczy skompresowany plik, np. pamiec.tmx.gz
+  .zip             - archiwum; każdy pasujący plik w środku to osobne wejście o ścieżce
+                     {archiwum}.zip/{ścieżka w archiwum}, np. eksporty.zip/pamiec.tmx
+
+open_input zwraca strumień binarny z dekompresją w locie - parsery (iterparse, expat, lxml) czytają go
+porcjami, więc ani pamięć, ani zajęte miejsce na dysku nie rosną z rozmiarem pliku.
+Odcisk wejścia z archiwum (input_stat) to odcisk samego archiwum - zmiana archiwum = zmiana wszystkich jego plików.
+"""
+import bz2
+import gzip
+import lzma
+import os
+import zipfile
+
+COMPRESSION_OPENERS = {'.gz': gzip.open, '.xz': lzma.open, '.bz2': bz2.open}
+ARCHIVE_SUFFIX = '.zip'
+
+
+def compression_suffix(path):
+    """Końcówka kompresji ('.gz', '.xz', '.bz2') albo None."""
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in COMPRESSION_OPENERS else None
+
+
+def strip_compression_suffix(name):
+    """pamiec.tmx.gz -> pamiec.tmx (inne nazwy bez zmian)."""
+    suffix = compression_suffix(name)
+    return name[:-len(suffix)] if suffix else name
+
+
+def is_input_name(name, suffixes):
+    """Czy nazwa pliku (także skompresowanego) ma jedną z końcówek suffixes (bez względu na wielkość liter)."""
+    if isinstance(suffixes, str):
+        suffixes = (suffixes,)
+    return strip_compression_suffix(name).lower().endswith(tuple(s.lower() for s in suffixes))
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIX)
+
+
+def split_archive_path(path):
+    """
+    Dla wejścia z archiwum ({archiwum}.zip/{plik}) zwraca (ścieżka archiwum, nazwa w archiwum),
+    dla zwykłej ścieżki (path, None). Archiwum musi istnieć na dysku.
+    """
+    lower = path.lower()
+    start = 0
+    while True:
+        pos = lower.find(ARCHIVE_SUFFIX, start)
+        if pos == -1:
+            return path, None
+        end = pos + len(ARCHIVE_SUFFIX)
+        if end < len(path) and path[end] in ('/', os.sep) and os.path.isfile(path[:end]):
+            return path[:end], path[end + 1:].replace(os.sep, '/')
+        start = end
+
+
+def is_plain_file(path):
+    """Czy wejście to zwykły plik bez kompresji (można go mapować przez mmap i dzielić na zakresy bajtów)."""
+    return compression_suffix(path) is None and split_archive_path(path)[1] is None
+
+
+def input_exists(path):
+    """Czy wejście istnieje (dla wejścia z archiwum: archiwum i plik w nim)."""
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        return os.path.isfile(path)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.getinfo(member)
+        return True
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+
+
+def input_stat(path):
+    """os.stat pliku na dysku, z którego czytamy wejście (dla wejścia z archiwum - samego archiwum)."""
+    return os.stat(split_archive_path(path)[0])
+
+
+def input_base_name(path):
+    """Nazwa pliku bez folderów, archiwum i końcówki kompresji: eksporty.zip/tm/pamiec.tmx.gz -> pamiec.tmx."""
+    archive_path, member = split_archive_path(path)
+    name = member if member is not None else path
+    return strip_compression_suffix(os.path.basename(name.replace('/', os.sep)))
+
+
+def plain_output_name(path):
+    """Względna nazwa rozpakowanego wyniku: pliki.xml.gz -> pliki.xml, paczka.zip/a/b.xml -> paczka/a/b.xml."""
+    archive_path, member = split_archive_path(path)
+    if member is not None:
+        path = os.path.join(archive_path[:-len(ARCHIVE_SUFFIX)], *member.split('/'))
+    return strip_compression_suffix(path)
+
+
+def sidecar_path(path, suffix):
+    """
+    Ścieżka pliku pomocniczego obok wejścia (np. indeksu): {plik}{suffix},
+    a dla wejścia z archiwum {archiwum}_{plik w archiwum}{suffix} (obok archiwum).
+    """
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        return path + suffix
+    return f"{archive_path}_{member.replace('/', '_')}{suffix}"
+
+
+def archive_members(archive_path, suffixes):
+    """Pliki w archiwum .zip z końcówką z suffixes (także skompresowane w środku), w kolejności z archiwum."""
+    with zipfile.ZipFile(archive_path) as archive:
+        return [info.filename for info in archive.infolist()
+                if not info.is_dir() and is_input_name(info.filename, suffixes)]
+
+
+def expand_inputs(folder, names, suffixes):
+    """
+    Z listy nazw plików w folderze wybiera wejścia: pliki z końcówką z suffixes (także .gz/.xz/.bz2)
+    i pasujące pliki z archiwów .zip ({archiwum}.zip/{plik}). Kolejność jak w names.
+    Uszkodzone archiwum jest zwracane jako jedno wejście - błąd zgłosi jego przetwarzanie.
+    """
+    inputs = []
+    for name in names:
+        if is_archive(name):
+            try:
+                members = archive_members(os.path.join(folder, name), suffixes)
+            except (OSError, zipfile.BadZipFile):
+                inputs.append(name)
+                continue
+            inputs.extend(f"{name}/{member}" for member in members)
+        elif is_input_name(name, suffixes):
+            inputs.append(name)
+    return inputs
+
+
+class InputStream:
+    """Strumień binarny wejścia. close() zamyka też warstwy pod spodem (plik w archiwum, archiwum)."""
+
+    def __init__(self, stream, resources=()):
+        self.stream = stream
+        self.resources = resources
+        self.read = stream.read
+
+    def close(self):
+        self.stream.close()
+        for resource in reversed(self.resources):
+            resource.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_input(path):
+    """
+    Otwiera wejście do czytania (tryb binarny): zwykły plik, plik skompresowany albo plik z archiwum .zip.
+    Dekompresja odbywa się w locie, porcjami.
+    """
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        opener = COMPRESSION_OPENERS.get(compression_suffix(path))
+        return InputStream(opener(path, 'rb') if opener else open(path, 'rb'))
+
+    archive = zipfile.ZipFile(archive_path)
+    try:
+        stream = archive.open(member)
+        resources = (archive,)
+        opener = COMPRESSION_OPENERS.get(compression_suffix(member))
+        if opener:
+            resources = (archive, stream)
+            stream = opener(stream, 'rb')
+    except BaseException:
+        archive.close()
+        raise
+    return InputStream(stream, resources)
@@ -0,0 +1,310 @@
+"""
+Pomiary wydajności wspólne dla narzędzi: liczniki, czasy i histogramy (MB/s, segmenty/s, opóźnienia żądań API).
+
+Domyślnie wyłączone - wtedy inc/observe/timer/event kończą się na sprawdzeniu jednej zmiennej modułu.
+Pętle po <tu> nie są mierzone wpis po wpisie: pomiary są na poziomie pliku, zapisu CSV i żądania HTTP,
+więc także po włączeniu narzut jest pomijalny. Włączenie: configure(tool, trace_path, prom_path)
+(w skryptach - stałe METRICS_TRACE_FILE / METRICS_PROM_FILE).
+
+Wyjście:
+  ślad JSON Lines (trace_path)     - rekord na każdy pomiar czasu i zdarzenie (t = sekundy od startu),
+                                     na końcu rekord "summary" ze wszystkimi licznikami i histogramami
+  snapshot Prometheusa (prom_path) - format textfile (np. node_exporter --collector.textfile.directory),
+                                     zapisywany atomowo przy finish()
+
+Nazwy metryk dostają przedrostek METRIC_PREFIX, a każda seria etykietę tool. Procesy robocze
+(ProcessPoolExecutor) mają własną, wyłączoną kopię modułu - ich czasy wracają w wynikach i są
+zapisywane w procesie głównym (observe).
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+METRIC_PREFIX = "loc_"
+# Granice kubełków histogramów czasu (sekundy) - od pojedynczych żądań HTTP po duże pliki TMX
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+# Percentyle w podsumowaniu (liczone dokładnie, z zapamiętanych pomiarów)
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Bieżący rejestr; None = pomiary wyłączone
+_registry = None
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items())) if labels else ()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Histogram:
+    """
+    Histogram jednej serii: liczniki kubełków (jak w Prometheusie) i wszystkie pomiary
+    w array('d') (8 bajtów na pomiar) - na potrzeby dokładnych percentyli w podsumowaniu.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.total = 0.0
+        self.values = array('d')
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def add(self, value):
+        self.values.append(value)
+        self.total += value
+        # Kubełek "le": pierwsza granica nie mniejsza od wartości (większe wartości - tylko w +Inf)
+        i = bisect_left(self.buckets, value)
+        if i < len(self.bucket_counts):
+            self.bucket_counts[i] += 1
+
+    def quantiles(self, quantiles=QUANTILES):
+        values = sorted(self.values)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in quantiles}
+
+    def cumulative(self):
+        """Pary (granica, liczba pomiarów <= granica) i na końcu ('+Inf', liczba wszystkich)."""
+        running = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            running += count
+            yield _format_number(float(bound)), running
+        yield "+Inf", self.count
+
+
+class MetricsRegistry:
+    """Liczniki i histogramy jednego uruchomienia narzędzia. Bezpieczny dla wielu wątków."""
+
+    def __init__(self, tool, trace_path=None, prom_path=None):
+        self.tool = tool
+        self.prom_path = prom_path
+        self.started_at = time.time()
+        self.clock_start = time.perf_counter()
+        self.counters = {}     # (nazwa, etykiety) -> wartość
+        self.histograms = {}   # (nazwa, etykiety) -> Histogram
+        self.lock = threading.Lock()
+        self.trace = open(trace_path, "a", encoding="utf-8") if trace_path else None
+
+    def elapsed(self):
+        return time.perf_counter() - self.clock_start
+
+    def inc(self, name, value, labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels, fields):
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(value)
+            if self.trace is not None:
+                self._write_trace(name, dict(labels or {}, **fields, seconds=round(value, 6)))
+
+    def event(self, name, fields):
+        if self.trace is not None:
+            with self.lock:
+                self._write_trace(name, fields)
+
+    def _write_trace(self, name, fields):
+        record = {"t": round(self.elapsed(), 6), "tool": self.tool, "event": name}
+        record.update(fields)
+        self.trace.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    # --- podsumowanie ---
+
+    def summary(self):
+        """Słownik do rekordu "summary": czas przebiegu, liczniki (z tempem na sekundę) i histogramy."""
+        seconds = self.elapsed()
+        counters = []
+        for (name, labels), value in sorted(self.counters.items()):
+            counters.append({"name": name, "labels": dict(labels), "value": value,
+                             "per_second": value / seconds if seconds > 0 else None})
+        histograms = []
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            quantiles = histogram.quantiles()
+            histograms.append({"name": name, "labels": dict(labels), "count": histogram.count,
+                               "sum": histogram.total,
+                               "quantiles": {f"p{round(q * 100)}": v for q, v in quantiles.items()}})
+        return {"seconds": seconds, "counters": counters, "histograms": histograms}
+
+    def summary_lines(self):
+        """Czytelne podsumowanie do konsoli (linia na serię)."""
+        summary = self.summary()
+        lines = [f"Czas przebiegu: {summary['seconds']:.2f} s"]
+        for counter in summary["counters"]:
+            labels = _format_labels(sorted(counter["labels"].items()))
+            value, rate = _format_number(counter["value"]), counter["per_second"]
+            unit = ""
+            if counter["name"].endswith("bytes_total"):
+                # Bajty czytelniej jako MB i MB/s
+                value, unit = f"{counter['value'] / 1e6:.1f}", " MB"
+                rate = rate / 1e6 if rate is not None else None
+            rate = f" ({rate:.1f}{unit}/s)" if rate is not None else ""
+            lines.append(f"{counter['name']}{labels}: {value}{unit}{rate}")
+        for histogram in summary["histograms"]:
+            labels = _format_labels(sorted(histogram["labels"].items()))
+            quantiles = " ".join(f"{q}={v * 1000:.1f} ms" for q, v in histogram["quantiles"].items())
+            lines.append(f"{histogram['name']}{labels}: {histogram['count']} pomiarów, "
+                         f"razem {histogram['sum']:.2f} s, {quantiles}")
+        return lines
+
+    def prometheus_text(self):
+        """Snapshot w formacie textfile Prometheusa (liczniki, histogramy, czas przebiegu)."""
+        tool = (("tool", self.tool),)
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, kind, value in (("run_seconds", "gauge", self.elapsed()),
+                                  ("run_start_timestamp_seconds", "gauge", self.started_at)):
+            name = METRIC_PREFIX + name
+            header(name, kind)
+            lines.append(f"{name}{_format_labels(tool)} {_format_number(value)}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            name = METRIC_PREFIX + name
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(tool + labels)} {_format_number(value)}")
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            name = METRIC_PREFIX + name
+            header(name, "histogram")
+            for bound, count in histogram.cumulative():
+                lines.append(f"{name}_bucket{_format_labels(tool + labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(tool + labels)} {_format_number(histogram.total)}")
+            lines.append(f"{name}_count{_format_labels(tool + labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Zapisuje snapshot Prometheusa i rekord "summary" śladu, zamyka ślad."""
+        with self.lock:
+            if self.prom_path:
+                tmp_path = self.prom_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+                    f.write(self.prometheus_text())
+                os.replace(tmp_path, self.prom_path)
+            if self.trace is not None:
+                self._write_trace("summary", self.summary())
+                self.trace.close()
+                self.trace = None
+
+
+class _Timer:
+    """Mierzy czas bloku with i zapisuje go przez observe. set(**fields) dokłada pola do rekordu śladu."""
+
+    def __init__(self, registry, name, labels, fields):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.registry.observe(self.name, time.perf_counter() - self.start, self.labels, self.fields)
+
+
+class _NullTimer:
+    """Timer przy wyłączonych pomiarach - jedna wspólna instancja, nic nie mierzy."""
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def configure(tool, trace_path=None, prom_path=None):
+    """
+    Włącza pomiary dla narzędzia tool, gdy podano przynajmniej jedną ścieżkę wyjścia. Zwraca True, gdy włączone.
+    Wyniki są zapisywane przy finish() (także automatycznie przy wyjściu z programu).
+    """
+    global _registry
+    if not trace_path and not prom_path:
+        return False
+    finish()
+    _registry = MetricsRegistry(tool, trace_path, prom_path)
+    atexit.register(finish)
+    return True
+
+
+def enabled():
+    return _registry is not None
+
+
+def inc(name, value=1, labels=None):
+    """Dodaje value do licznika name (np. bajty, segmenty, pliki)."""
+    if _registry is not None:
+        _registry.inc(name, value, labels)
+
+
+def observe(name, seconds, labels=None, **fields):
+    """Dodaje pomiar czasu do histogramu name; fields trafiają tylko do śladu (np. nazwa pliku)."""
+    if _registry is not None:
+        _registry.observe(name, seconds, labels, fields)
+
+
+def timer(name, labels=None, **fields):
+    """Context manager mierzący czas bloku (observe). Przy wyłączonych pomiarach - wspólny pusty timer."""
+    if _registry is None:
+        return _NULL_TIMER
+    return _Timer(_registry, name, labels, fields)
+
+
+def event(name, **fields):
+    """Rekord w śladzie bez metryki (np. początek przebiegu z konfiguracją)."""
+    if _registry is not None:
+        _registry.event(name, fields)
+
+
+def summary_lines():
+    return _registry.summary_lines() if _registry is not None else []
+
+
+def finish():
+    """Zapisuje wyniki i wyłącza pomiary. Błąd zapisu zgłasza jako OSError."""
+    global _registry
+    registry, _registry = _registry, None
+    if registry is not None:
+        registry.close()
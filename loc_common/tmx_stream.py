@@ -0,0 +1,444 @@
+"""
+Strumieniowe czytanie plików TMX o stałym zużyciu pamięci.
+
+Samo elem.clear() na <tu> nie wystarcza: puste "skorupy" elementów zostają podpięte pod <body>
+i przy milionach segmentów korzeń drzewa zajmuje gigabajty RAM. Tutaj trzymamy rodzica
+(zdarzenia 'start'), a każdy przetworzony <tu> jest czyszczony i odpinany od <body>.
+"""
+import mmap
+import re
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+from loc_common.compressed_io import is_plain_file, open_input
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+def local_name(tag):
+    """Nazwa tagu bez przestrzeni nazw ({url}tu -> tu)."""
+    return tag.rsplit('}', 1)[-1] if '}' in tag else tag
+
+
+def iter_tu_elements(source, header=None):
+    """
+    Generator zwracający kolejne elementy <tu> z pliku TMX (source: ścieżka lub obiekt plikowy).
+
+    Element jest kompletny (ze wszystkimi <tuv>/<seg>) tylko do następnej iteracji -
+    potem zostaje wyczyszczony i usunięty z rodzica, więc nie wolno go zachowywać.
+
+    Jeśli podano słownik header, trafiają do niego wartości <prop> z nagłówka (klucz = atrybut type),
+    np. header['targetlang']. Nagłówek występuje przed <body>, więc jest wypełniony
+    zanim pojawi się pierwszy <tu>.
+    """
+    context = ET.iterparse(source, events=('start', 'end'))
+
+    parents = []    # Stos otwartych elementów (rodzic bieżącego elementu to parents[-2])
+    tu_depth = 0    # > 0, gdy jesteśmy wewnątrz <tu>
+
+    for event, elem in context:
+        if event == 'start':
+            parents.append(elem)
+            if tu_depth or local_name(elem.tag) == 'tu':
+                tu_depth += 1
+            continue
+
+        parents.pop()
+
+        if tu_depth:
+            tu_depth -= 1
+            if tu_depth == 0:
+                yield elem
+                # Czyścimy <tu> i odpinamy go od <body>, żeby nie zostawała pusta skorupa
+                elem.clear()
+                if parents:
+                    parents[-1].remove(elem)
+            continue
+
+        if local_name(elem.tag) == 'prop':
+            # <prop> z nagłówka: zapamiętujemy wartość i od razu zwalniamy węzeł
+            if header is not None:
+                prop_type = elem.get('type')
+                if prop_type:
+                    header[prop_type] = elem.text
+            elem.clear()
+
+
+# ==========================================
+# BACKENDY PARSERA
+# ==========================================
+#
+# Nie każdy odbiorca potrzebuje pełnego drzewa Element dla każdego <tu> - np. cleaner czyta tylko
+# atrybut creationid. Dlatego odbiorcy dostają lekkie rekordy TuRecord, a sposób parsowania wybiera backend:
+#   'lxml'  - lxml.etree.iterparse(tag=...) z huge_tree (jeśli lxml jest zainstalowany),
+#   'expat' - surowy parser xml.parsers.expat na callbackach, w ogóle nie buduje elementów,
+#   'etree' - xml.etree.ElementTree przez iter_tu_elements (dotychczasowe zachowanie),
+#   'auto'  - lxml, a gdy go brak: expat.
+
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Rozmiar porcji danych podawanej parserowi expat
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class TuRecord:
+    """
+    Dane jednego <tu> przekazywane odbiorcom.
+    attrib   - słownik atrybutów <tu> (creationid, creationdate, changeid, changedate...),
+    variants - lista par (język, tekst <seg>) dla kolejnych <tuv> albo None,
+               gdy tekst nie był potrzebny (want_text=False). Tekst to połączony tekst <seg>
+               razem z tagami wewnętrznymi (jak ''.join(seg.itertext())), None gdy <tuv> nie ma <seg>.
+    """
+    __slots__ = ('attrib', 'variants')
+
+    def __init__(self, attrib, variants=None):
+        self.attrib = attrib
+        self.variants = variants
+
+    def get(self, name, default=None):
+        return self.attrib.get(name, default)
+
+
+def available_backends():
+    """Lista backendów możliwych do użycia w tym środowisku."""
+    backends = ['expat', 'etree']
+    if lxml_etree is not None:
+        backends.insert(0, 'lxml')
+    return backends
+
+
+def resolve_backend(backend=None):
+    """Zamienia 'auto'/None na konkretny backend i sprawdza, czy jest dostępny."""
+    if backend in (None, 'auto'):
+        return 'lxml' if lxml_etree is not None else 'expat'
+    if backend not in ('lxml', 'expat', 'etree'):
+        raise ValueError(f"Nieznany backend TMX: {backend}")
+    if backend == 'lxml' and lxml_etree is None:
+        raise ValueError("Backend 'lxml' wymaga zainstalowanego pakietu lxml")
+    return backend
+
+
+def iter_tu_records(source, header=None, want_text=False, backend=None):
+    """
+    Generator rekordów TuRecord dla kolejnych <tu> (w kolejności z pliku).
+    source: ścieżka lub obiekt plikowy (tryb binarny), header: jak w iter_tu_elements.
+    Ścieżka może wskazywać plik skompresowany lub plik w archiwum .zip (patrz compressed_io).
+    """
+    backend = resolve_backend(backend)
+    if isinstance(source, str) and not is_plain_file(source):
+        return _iter_records_compressed(source, header, want_text, backend)
+    if backend == 'expat':
+        return _iter_records_expat(source, header, want_text)
+    if backend == 'lxml':
+        return _iter_records_lxml(source, header, want_text)
+    return (_element_record(elem, want_text) for elem in iter_tu_elements(source, header))
+
+
+def _iter_records_compressed(path, header, want_text, backend):
+    """Rekordy ze strumienia z dekompresją w locie - bez rozpakowywania pliku na dysk."""
+    with open_input(path) as stream:
+        yield from iter_tu_records(stream, header, want_text, backend)
+
+
+def _element_record(elem, want_text, seg_text=None):
+    """
+    Rekord z elementu <tu> (ElementTree lub lxml - oba mają to samo API).
+    seg_text: opcjonalna szybsza funkcja wyciągająca tekst <seg> (domyślnie ''.join(itertext())).
+    """
+    if not want_text:
+        return TuRecord(dict(elem.attrib))
+
+    # Porównanie z nazwą bez przestrzeni nazw najpierw wprost (typowy TMX), local_name tylko w pozostałych przypadkach
+    variants = []
+    for tuv in elem:
+        tag = tuv.tag
+        if tag != 'tuv' and local_name(tag) != 'tuv':
+            continue
+        lang = tuv.get(XML_LANG) or tuv.get('lang')
+        text = None
+        for child in tuv:
+            tag = child.tag
+            if tag == 'seg' or local_name(tag) == 'seg':
+                text = seg_text(child) if seg_text else ''.join(child.itertext())
+                break
+        variants.append((lang, text))
+    return TuRecord(dict(elem.attrib), variants)
+
+
+def _iter_records_lxml(source, header, want_text):
+    """Backend lxml: iterparse filtrowany do <tu> i <prop>, z huge_tree dla wielkich plików."""
+    context = lxml_etree.iterparse(source, events=('end',), tag=('{*}tu', '{*}prop'),
+                                   huge_tree=True, remove_comments=True, remove_pis=True)
+    for event, elem in context:
+        tag = elem.tag
+        if tag != 'tu' and local_name(tag) == 'prop':
+            parent = elem.getparent()
+            # <prop> wewnątrz <tu> obsłuży odbiorca przy całym <tu>, tu bierzemy tylko nagłówek
+            if parent is not None and local_name(parent.tag) == 'header':
+                if header is not None:
+                    prop_type = elem.get('type')
+                    if prop_type:
+                        header[prop_type] = elem.text
+                elem.clear(keep_tail=True)
+            continue
+
+        yield _element_record(elem, want_text, _lxml_seg_text)
+
+        # Czyścimy <tu> i usuwamy z <body> wszystkie wcześniejsze (już przetworzone) elementy
+        elem.clear(keep_tail=True)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def _lxml_seg_text(seg):
+    """Tekst <seg> razem z tagami wewnętrznymi - w C, szybciej niż itertext() w lxml."""
+    return lxml_etree.tostring(seg, method='text', encoding=str, with_tail=False)
+
+
+class _ExpatTuCollector:
+    """
+    Callbacki parsera expat. Zbiera rekordy <tu> bez budowania jakichkolwiek elementów.
+    Tagi porównujemy po nazwie lokalnej (bez prefiksu przestrzeni nazw).
+    """
+
+    def __init__(self, parser, header, want_text):
+        self.parser = parser
+        self.header = header
+        self.want_text = want_text
+        self.records = []       # Rekordy gotowe do oddania przez generator
+        self.path = []          # Stos nazw lokalnych otwartych elementów
+        self.current = None     # Bieżący TuRecord (wewnątrz <tu>)
+        self.tu_level = 0       # Głębokość, na której otwarto <tu>
+        self.text_parts = None  # Zbierany tekst (<seg> albo <prop> z nagłówka)
+        self.text_level = 0     # Głębokość elementu, którego tekst zbieramy
+        self.prop_type = None
+
+    def start(self, name, attrs):
+        tag = name.rsplit(':', 1)[-1]
+        path = self.path
+        path.append(tag)
+        level = len(path)
+
+        if self.current is None:
+            if tag == 'tu':
+                self.current = TuRecord(attrs, [] if self.want_text else None)
+                self.tu_level = level
+                if not self.want_text:
+                    # Nagłówek za nami, a tekst nie jest potrzebny - wyłączamy callback danych znakowych
+                    self.parser.CharacterDataHandler = None
+            elif tag == 'prop' and level >= 2 and path[-2] == 'header' and self.header is not None:
+                self.prop_type = attrs.get('type')
+                self.text_parts = []
+                self.text_level = level
+            return
+
+        if not self.want_text:
+            return
+        if tag == 'tuv' and level == self.tu_level + 1:
+            self.current.variants.append([attrs.get('xml:lang') or attrs.get('lang'), None])
+        elif tag == 'seg' and level == self.tu_level + 2 and self.text_parts is None:
+            variant = self.current.variants[-1] if self.current.variants else None
+            # Tylko pierwszy <seg> w danym <tuv> (jak tuv.find('seg'))
+            if variant is not None and variant[1] is None:
+                self.text_parts = []
+                self.text_level = level
+
+    def end(self, name):
+        path = self.path
+        level = len(path)
+        path.pop()
+
+        if self.text_parts is not None and level == self.text_level:
+            text = ''.join(self.text_parts)
+            self.text_parts = None
+            if self.current is not None:
+                self.current.variants[-1][1] = text
+            else:
+                if self.prop_type:
+                    # Jak elem.text w ElementTree: pusty <prop/> daje None
+                    self.header[self.prop_type] = text or None
+                self.prop_type = None
+            return
+
+        if self.current is not None and level == self.tu_level:
+            record = self.current
+            if record.variants is not None:
+                record.variants = [tuple(variant) for variant in record.variants]
+            self.records.append(record)
+            self.current = None
+
+    def data(self, text):
+        if self.text_parts is not None:
+            self.text_parts.append(text)
+
+
+def _iter_records_expat(source, header, want_text):
+    """Backend expat: plik podawany parserowi porcjami, rekordy oddawane po każdej porcji."""
+    parser = expat.ParserCreate()
+    collector = _ExpatTuCollector(parser, header, want_text)
+    parser.buffer_text = True
+    parser.StartElementHandler = collector.start
+    parser.EndElementHandler = collector.end
+    parser.CharacterDataHandler = collector.data
+
+    own_file = not hasattr(source, 'read')
+    stream = open(source, 'rb') if own_file else source
+    try:
+        while True:
+            data = stream.read(READ_CHUNK_SIZE)
+            parser.Parse(data, not data)
+            if collector.records:
+                records, collector.records = collector.records, []
+                yield from records
+            if not data:
+                break
+    finally:
+        if own_file:
+            stream.close()
+
+
+# ==========================================
+# SKANER BAJTOWY (TYLKO ATRYBUTY <tu>)
+# ==========================================
+#
+# Gdy potrzebny jest wyłącznie atrybut z otwierającego tagu <tu ...> (np. creationid w cleanerze),
+# parser XML jest zbędny: wystarczy przejść plik przez mmap skompilowanym wyrażeniem regularnym.
+# Skaner jest bezpieczny tylko dla plików, w których tekst "<tu" nie może wystąpić poza prawdziwym tagiem,
+# dlatego pliki z CDATA, komentarzami lub DTD (encje) obsługuje zwykły parser.
+
+ENCODING_PATTERN = re.compile(rb'encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+UTF8_ENCODINGS = (b'utf-8', b'utf8', b'us-ascii', b'ascii')
+
+# <tu ...> z atrybutami. Prosty wzorzec jest kilka razy szybszy, ale urywa tag na '>' wewnątrz
+# wartości atrybutu (dozwolone w XML) - wtedy tag dopasowujemy ponownie pełnym wzorcem.
+# Znaku '<' w wartościach atrybutów XML nie dopuszcza, więc fałszywego <tu w środku tagu nie będzie.
+TU_OPEN_TAG_PATTERN = re.compile(rb'<tu\b([^>]*)>')
+TU_OPEN_TAG_FULL_PATTERN = re.compile(rb'<tu\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>')
+
+
+def is_utf8_compatible(head):
+    """
+    Czy plik (head = początkowe bajty) jest w UTF-8/ASCII - tylko wtedy można go ciąć
+    i przeszukiwać na poziomie bajtów. Brak deklaracji kodowania oznacza UTF-8.
+    """
+    if head[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        return False
+    declaration = head[:head.find(b'>') + 1]
+    enc_match = ENCODING_PATTERN.search(declaration) if b'<?xml' in declaration else None
+    return not enc_match or enc_match.group(1).lower() in UTF8_ENCODINGS
+
+
+def xml_declaration_end(head):
+    """Pozycja za deklaracją <?xml ...?> na początku pliku (po ewentualnym BOM); 0, gdy jej nie ma."""
+    start = 3 if head[:3] == b'\xef\xbb\xbf' else 0
+    if head[start:start + 5] != b'<?xml':
+        return 0
+    end = head.find(b'?>', start)
+    return end + 2 if end != -1 else 0
+
+
+def _attribute_pattern(name):
+    # Atrybuty tagu zaczynają się od białego znaku (po "<tu"), więc \s przed nazwą zawsze jest
+    return re.compile(rb'\s' + re.escape(name.encode('ascii')) + rb'\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+# Odwołania, które dekodujemy sami: pięć encji predefiniowanych w XML i odwołania numeryczne
+XML_REFERENCE_PATTERN = re.compile(r'&(?:#x([0-9a-fA-F]+)|#([0-9]+)|(lt|gt|amp|quot|apos));')
+XML_PREDEFINED_ENTITIES = {'lt': '<', 'gt': '>', 'amp': '&', 'quot': '"', 'apos': "'"}
+
+
+def _is_xml_char(code):
+    return (code in (0x9, 0xA, 0xD) or 0x20 <= code <= 0xD7FF or 0xE000 <= code <= 0xFFFD
+            or 0x10000 <= code <= 0x10FFFF)
+
+
+def _replace_reference(match):
+    name = match.group(3)
+    if name is not None:
+        return XML_PREDEFINED_ENTITIES[name]
+    code = int(match.group(1), 16) if match.group(1) is not None else int(match.group(2))
+    if not _is_xml_char(code):
+        raise ValueError(code)
+    return chr(code)
+
+
+def _decode_attribute(raw, quote=b'"'):
+    """
+    Bajty wartości atrybutu -> str, z normalizacją białych znaków i encjami jak w parserze XML.
+    Każde inne odwołanie (encja spoza XML, brak ';', niedozwolony znak) dekoduje parser XML -
+    wtedy wynik (albo błąd) jest taki sam jak przy pełnym parsowaniu pliku.
+    """
+    value = raw.decode('utf-8')
+    if '\t' in value or '\n' in value or '\r' in value:
+        value = value.replace('\r\n', ' ').replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+    if '&' in value:
+        try:
+            if value.count('&') != len(XML_REFERENCE_PATTERN.findall(value)):
+                raise ValueError(value)
+            value = XML_REFERENCE_PATTERN.sub(_replace_reference, value)
+        except ValueError:
+            value = ET.fromstring(b'<a v=' + quote + raw + quote + b'/>').get('v')
+    return value
+
+
+def scan_tu_attribute(file_path, name):
+    """
+    Szybka ścieżka: zwraca generator wartości atrybutu name (str lub None) dla kolejnych <tu>
+    w kolejności z pliku, albo None, jeśli pliku nie da się bezpiecznie przeskanować bajtowo
+    (wtedy należy użyć iter_tu_records - także dla plików skompresowanych).
+    """
+    if not is_plain_file(file_path):
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Np. pusty plik (mmap nie obsługuje długości 0) - niech zwykły parser zgłosi błąd
+        return None
+
+    # Plik musi być w UTF-8, kompletny (jest </body>) i bez konstrukcji, w których
+    # tekst "<tu" mógłby nie być tagiem (CDATA, komentarze, instrukcje przetwarzania <?...?> po deklaracji XML)
+    # albo wartości używałyby encji z DTD
+    if (not is_utf8_compatible(mm[:1024])
+            or mm.rfind(b'</body>') == -1
+            or mm.find(b'<![CDATA[') != -1
+            or mm.find(b'<!--') != -1
+            or mm.find(b'<!DOCTYPE') != -1
+            or mm.find(b'<?', xml_declaration_end(mm[:1024])) != -1):
+        mm.close()
+        return None
+
+    return _iter_tu_attribute(mm, _attribute_pattern(name))
+
+
+def _iter_tu_attribute(mm, attr_pattern):
+    # Te same wartości (ID użytkowników) powtarzają się setki tysięcy razy - dekodujemy je raz
+    decoded = {}
+    try:
+        search = attr_pattern.search
+        for match in TU_OPEN_TAG_PATTERN.finditer(mm):
+            attrs = match.group(1)
+            if attrs.count(b'"') & 1 or attrs.count(b"'") & 1:
+                attrs = TU_OPEN_TAG_FULL_PATTERN.match(mm, match.start()).group(1)
+
+            attr_match = search(attrs)
+            if attr_match is None:
+                yield None
+                continue
+            raw, quote = attr_match.group(1), b'"'
+            if raw is None:
+                raw, quote = attr_match.group(2), b"'"
+
+            value = decoded.get(raw)
+            if value is None:
+                value = _decode_attribute(raw, quote)
+                if len(decoded) < 100000:
+                    decoded[raw] = value
+            yield value
+    finally:
+        mm.close()
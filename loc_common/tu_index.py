@@ -0,0 +1,249 @@
+"""
+Trwały indeks numerów <tu> w pliku TMX: creationid -> posortowana tablica numerów kolejnych <tu> (0, 1, 2...).
+
+Numer <tu> to ID wpisu w MemoQ Resource API, więc z indeksem lista ID do usunięcia dla k użytkowników
+to odczyt k tablic zamiast ponownego parsowania wielogigabajtowego eksportu.
+
+Plik indeksu (obok TMX, np. pamiec.tmx.tuidx):
+  TU_INDEX_MAGIC
+  4 bajty (uint32, little-endian) - długość nagłówka JSON
+  nagłówek JSON: odcisk pliku TMX (size, mtime_ns), liczba <tu>, lista [creationid, przesunięcie, liczba]
+                 oraz znaczniki zastosowanych usunięć ("applied")
+  dane: tablice array('I') (uint32, little-endian) kolejnych creationid, jedna za drugą
+
+Po usunięciu wpisów na serwerze indeks jest aktualizowany w miejscu (apply_deletions): usunięte numery
+znikają, a przy zmiennych ID na serwerze pozostałe są przesuwane o liczbę usuniętych przed nimi -
+indeks odpowiada wtedy stanowi serwera bez nowego eksportu (plik TMX pozostaje bez zmian).
+
+Indeks można zbudować osobnym przebiegiem (TuOrdinalIndex.build) albo przy okazji innej analizy tego samego
+pliku (TuIndexCollector - odbiorca rekordów <tu> we wspólnym przebiegu, np. w translator_id_tmx_analysis).
+"""
+import json
+import os
+import struct
+import sys
+from array import array
+
+from loc_common.compressed_io import input_stat, sidecar_path
+
+TU_INDEX_MAGIC = b'TUIDX1\n'
+TU_INDEX_SUFFIX = '.tuidx'
+ORDINAL_TYPECODE = 'I'
+
+
+def _to_disk(values):
+    if sys.byteorder != 'little':
+        values = array(ORDINAL_TYPECODE, values)
+        values.byteswap()
+    return values
+
+
+def _from_disk(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def shift_ordinals(ordinals, deleted, shift=True):
+    """
+    Usuwa z posortowanej tablicy numery z posortowanej listy deleted. Przy shift=True pozostałe
+    numery są zmniejszane o liczbę usuniętych mniejszych numerów (serwer przesuwa ID po usunięciu).
+    Jeden przebieg po obu listach (scalanie), bez ponownego czytania TMX.
+    """
+    result = array(ORDINAL_TYPECODE)
+    j = 0
+    n = len(deleted)
+    for ordinal in ordinals:
+        while j < n and deleted[j] < ordinal:
+            j += 1
+        if j < n and deleted[j] == ordinal:
+            continue
+        result.append(ordinal - j if shift else ordinal)
+    return result
+
+
+def index_path_for(file_path):
+    # Dla pliku z archiwum .zip indeks leży obok archiwum (patrz compressed_io.sidecar_path)
+    return sidecar_path(file_path, TU_INDEX_SUFFIX)
+
+
+def tu_index_is_current(file_path):
+    """Czy obok pliku TMX jest indeks zbudowany z tego eksportu (także już przesunięty po usunięciach)."""
+    index = TuOrdinalIndex.load(index_path_for(file_path))
+    return index is not None and index.matches(file_path)
+
+
+class TuIndexCollector:
+    """
+    Odbiorca rekordów <tu> we wspólnym przebiegu przez plik: consume(tu, header) dla kolejnych <tu>,
+    na końcu finish() zwraca TuOrdinalIndex (i zapisuje go, jeśli podano save_path).
+    Odcisk pliku (rozmiar, mtime) jest brany przed czytaniem.
+    """
+
+    def __init__(self, file_path, save_path=None):
+        st = input_stat(file_path)
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.save_path = save_path
+        self.ordinals = {}
+        self.total = 0
+
+    def add(self, creation_id):
+        if creation_id:
+            values = self.ordinals.get(creation_id)
+            if values is None:
+                values = self.ordinals[creation_id] = array(ORDINAL_TYPECODE)
+            values.append(self.total)
+        self.total += 1
+
+    def consume(self, tu, header):
+        self.add(tu.get('creationid'))
+
+    def finish(self):
+        index = TuOrdinalIndex(self.size, self.mtime_ns, self.total, self.ordinals)
+        if self.save_path:
+            index.save(self.save_path)
+        return index
+
+
+class TuOrdinalIndex:
+    """
+    Indeks creationid -> array('I') numerów <tu> (rosnąco).
+    Tablice są wczytywane z pliku dopiero przy pierwszym odczycie danego creationid.
+    """
+
+    def __init__(self, size, mtime_ns, total, ordinals=None, applied=None):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.total = total
+        self.ordinals = ordinals if ordinals is not None else {}
+        self.applied = applied if applied is not None else []
+        self.path = None
+        self.layout = {}    # creationid -> (przesunięcie w bajtach, liczba) dla jeszcze niewczytanych tablic
+        self._casefold = None
+
+    @classmethod
+    def build(cls, file_path, creation_ids):
+        """
+        Buduje indeks z ciągu creationid (lub None) kolejnych <tu> pliku file_path
+        (np. loc_common.tmx_stream.scan_tu_attribute albo rekordy z iter_tu_records).
+        """
+        collector = TuIndexCollector(file_path)
+        for creation_id in creation_ids:
+            collector.add(creation_id)
+        return collector.finish()
+
+    def matches(self, file_path):
+        """Czy indeks powstał z tego eksportu (rozmiar i mtime pliku TMX)."""
+        try:
+            st = input_stat(file_path)
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    # --- odczyt ---
+
+    def users(self):
+        return list(self.layout) + [u for u in self.ordinals if u not in self.layout]
+
+    def _load_ordinals(self, creation_id):
+        values = self.ordinals.get(creation_id)
+        if values is None and creation_id in self.layout:
+            offset, count = self.layout.pop(creation_id)
+            values = array(ORDINAL_TYPECODE)
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                values.fromfile(f, count)
+            values = self.ordinals[creation_id] = _from_disk(values)
+        return values
+
+    def lookup(self, creation_id, ignore_case=True):
+        """
+        Posortowana lista numerów <tu> danego creationid (O(k) - odczyt jednej tablicy).
+        Przy ignore_case=True łączy wszystkie warianty wielkości liter (jak porównanie w cleanerze).
+        """
+        if not ignore_case:
+            values = self._load_ordinals(creation_id)
+            return list(values) if values is not None else []
+
+        if self._casefold is None:
+            self._casefold = {}
+            for user in self.users():
+                self._casefold.setdefault(user.lower(), []).append(user)
+        variants = self._casefold.get(creation_id.lower(), [])
+        if len(variants) == 1:
+            return list(self._load_ordinals(variants[0]))
+        merged = set()
+        for variant in variants:
+            merged.update(self._load_ordinals(variant))
+        return sorted(merged)
+
+    # --- aktualizacja po usunięciu ---
+
+    def has_applied(self, tag):
+        return tag in self.applied
+
+    def apply_deletions(self, deleted_ids, shift=True, tag=None):
+        """
+        Uwzględnia usunięte na serwerze wpisy (numery z bieżącego stanu indeksu).
+        shift=True - ID na serwerze przesuwają się po usunięciu (domyślne zachowanie memoQ w tym narzędziu),
+        shift=False - ID są stałe, usunięte numery tylko znikają.
+        tag - znacznik operacji (np. podpis planu z dziennika), żeby nie zastosować jej dwa razy.
+        """
+        deleted = sorted(set(deleted_ids))
+        for user in self.users():
+            self.ordinals[user] = shift_ordinals(self._load_ordinals(user), deleted, shift)
+        self.layout = {}
+        if shift:
+            self.total -= len(deleted)
+        if tag is not None:
+            self.applied.append(tag)
+
+    # --- plik ---
+
+    @classmethod
+    def load(cls, path):
+        """Wczytuje sam nagłówek indeksu (tablice na żądanie). Zwraca None, gdy pliku brak lub jest nieczytelny."""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(TU_INDEX_MAGIC)) != TU_INDEX_MAGIC:
+                    return None
+                header_size, = struct.unpack('<I', f.read(4))
+                header = json.loads(f.read(header_size).decode('utf-8'))
+            data_start = len(TU_INDEX_MAGIC) + 4 + header_size
+            index = cls(header['size'], header['mtime_ns'], header['total'], applied=header.get('applied', []))
+            index.path = path
+            for creation_id, offset, count in header['users']:
+                index.layout[creation_id] = (data_start + offset, count)
+            return index
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return None
+
+    def save(self, path):
+        """Zapis atomowy (plik tymczasowy + os.replace)."""
+        users = self.users()
+        blocks = [self._load_ordinals(user) for user in users]
+        layout = []
+        offset = 0
+        for user, values in zip(users, blocks):
+            layout.append([user, offset, len(values)])
+            offset += len(values) * values.itemsize
+        header = json.dumps({
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'total': self.total,
+            'applied': self.applied,
+            'users': layout,
+        }, ensure_ascii=False).encode('utf-8')
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(TU_INDEX_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for values in blocks:
+                _to_disk(values).tofile(f)
+        os.replace(tmp_path, path)
+        # Tablice są już w pamięci - dalsze odczyty nie sięgają do pliku
+        self.path = path
+        self.layout = {}
@@ -0,0 +1,277 @@
+"""
+Silnik usuwania wpisów z pamięci TM przez MemoQ Resource API.
+
+- Jedna sesja requests.Session z pulą połączeń (keep-alive) zamiast nowego połączenia TLS na każde żądanie.
+- Ponawianie z wykładniczym odstępem (backoff) przy 429 / 5xx, z uwzględnieniem nagłówka Retry-After.
+- Ogranicznik tempa (token bucket) wspólny dla wszystkich wątków.
+- Ograniczona współbieżność - ale tylko wtedy, gdy ID wpisów na serwerze są stałe.
+
+BEZPIECZEŃSTWO INDEKSÓW: ID wpisu w tym narzędziu to numer kolejny <tu> (0, 1, 2...).
+Jeśli serwer przesuwa numery po usunięciu, usunięcie ID 5 zmienia ID 6 na 5. Dlatego przy
+stable_ids=False żądania idą po jednym, w kolejności malejącej, a ponawiamy tylko odpowiedzi,
+które na pewno nie usunęły wpisu (429, 503, brak połączenia) - ponowienie po cichym sukcesie
+usunęłoby kolejny, niewłaściwy segment. Współbieżność i ponawianie wszystkich 5xx są włączane
+dopiero po potwierdzeniu, że ID na serwerze są stałe (stable_ids=True).
+Wynik, po którym serwer mógł jednak usunąć wpis (inny 5xx, zerwane połączenie, brak odpowiedzi
+w czasie), ma osobny status UNCERTAIN - FAILED oznacza, że wpis na pewno nie został usunięty.
+Odrzucony token (401 / 403) nie jest wynikiem wpisu: przerywa całe usuwanie wyjątkiem AuthError.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from loc_common import metrics
+
+# Statusy zwracane dla pojedynczego wpisu
+DELETED = "deleted"
+MISSING = "missing"
+FAILED = "failed"
+# Serwer mógł usunąć wpis, ale tego nie potwierdził (np. 500 albo przekroczony czas odpowiedzi)
+UNCERTAIN = "uncertain"
+
+# Odpowiedzi, po których serwer na pewno nie wykonał operacji - bezpieczne do ponowienia zawsze
+SAFE_RETRY_STATUSES = (429, 503)
+# Token wygasł lub został odrzucony - kolejne żądania z tym tokenem też nie przejdą
+AUTH_STATUSES = (401, 403)
+# Maksymalny odstęp między próbami (sekundy)
+MAX_BACKOFF = 60.0
+
+
+def _request_not_sent(exc):
+    """Czy wyjątek oznacza, że żądanie na pewno nie dotarło do serwera (brak nawiązanego połączenia)."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+
+
+class AuthError(Exception):
+    """
+    Serwer odrzucił token (401 / 403) - usuwanie jest przerywane, zamiast zapisywać błąd dla każdego wpisu.
+    uncertain  - wcześniejsza próba dla tego wpisu mogła go usunąć (ustawiane w _delete_entry),
+    unsent_ids - ID przekazane do on_send, dla których żądanie nie zostało wykonane (ustawiane w delete_many).
+    """
+
+    def __init__(self, detail, uncertain=False, unsent_ids=()):
+        super().__init__(f"Serwer odrzucił token ({detail})")
+        self.detail = detail
+        self.uncertain = uncertain
+        self.unsent_ids = list(unsent_ids)
+
+
+class RateLimiter:
+    """
+    Ogranicznik tempa typu token bucket: średnio `rate` żądań na sekundę, chwilowo do `burst`.
+    rate <= 0 oznacza brak limitu. Bezpieczny dla wielu wątków.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class DeletionEngine:
+    """
+    Usuwa wpisy POST {base_url}/tms/{guid}/entries/{id}/delete?authToken=...
+
+    max_workers - liczba równoległych żądań (używana tylko przy stable_ids=True),
+    rate_limit  - maks. liczba żądań na sekundę (0 = bez limitu),
+    max_retries - liczba ponowień jednego żądania,
+    backoff     - pierwszy odstęp przed ponowieniem (sekundy), potem podwajany.
+    """
+
+    def __init__(self, base_url, token, max_workers=1, stable_ids=False, rate_limit=0,
+                 max_retries=5, backoff=0.5, timeout=60, verify=False, session=None):
+        self.base_url = base_url
+        self.token = token
+        self.stable_ids = stable_ids
+        self.max_workers = max(1, max_workers) if stable_ids else 1
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.verify = verify
+        self.limiter = RateLimiter(rate_limit)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def close(self):
+        self.session.close()
+
+    def _entry_url(self, tm_guid, entry_id):
+        return f"{self.base_url}/tms/{tm_guid}/entries/{entry_id}/delete"
+
+    def _should_retry(self, status_code):
+        if status_code in SAFE_RETRY_STATUSES:
+            return True
+        # Inne 5xx: serwer mógł jednak usunąć wpis - ponawiamy tylko przy stałych ID
+        return self.stable_ids and status_code >= 500
+
+    def _retry_delay(self, attempt, resp=None):
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(MAX_BACKOFF, float(retry_after))
+                except ValueError:
+                    pass
+        return min(MAX_BACKOFF, self.backoff * (2 ** attempt))
+
+    def delete_entry(self, tm_guid, entry_id):
+        """
+        Usuwa jeden wpis (z ponowieniami). Zwraca (status, opis):
+        DELETED, MISSING (404), FAILED (wpis na pewno nie usunięty) albo UNCERTAIN (któraś próba mogła
+        usunąć wpis) - z kodem HTTP / treścią wyjątku. Przy 401 / 403 zgłasza AuthError.
+        """
+        status, detail = self._delete_entry(tm_guid, entry_id)
+        metrics.inc("rapi_entries_total", labels={"result": status})
+        return status, detail
+
+    def _post(self, url, params, entry_id):
+        """Jedno żądanie POST z pomiarem czasu (loc_common.metrics, etykieta status: kod HTTP albo "error")."""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            resp = self.session.post(url, params=params, verify=self.verify, timeout=self.timeout)
+            status = resp.status_code
+            return resp
+        finally:
+            metrics.observe("rapi_request_seconds", time.perf_counter() - start,
+                            {"endpoint": "delete", "status": status}, entry=entry_id)
+
+    def _delete_entry(self, tm_guid, entry_id):
+        url = self._entry_url(tm_guid, entry_id)
+        params = {"authToken": self.token}
+        detail = ""
+        # Czy któraś próba mogła usunąć wpis mimo braku potwierdzenia
+        uncertain = False
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            if attempt:
+                metrics.inc("rapi_retries_total", labels={"endpoint": "delete"})
+            try:
+                # POST bez body, token w URL
+                resp = self._post(url, params, entry_id)
+            except requests.exceptions.RequestException as e:
+                # Brak połączenia - żądanie nie dotarło do serwera, można ponowić zawsze.
+                # Zerwane połączenie lub przekroczony czas odpowiedzi - nie wiemy, czy serwer usunął wpis,
+                # więc ponawiamy tylko przy stałych ID.
+                detail = str(e)
+                not_sent = _request_not_sent(e)
+                uncertain = uncertain or not not_sent
+                if (self.stable_ids or not_sent) and attempt < self.max_retries:
+                    time.sleep(self._retry_delay(attempt))
+                    continue
+                return (UNCERTAIN if uncertain else FAILED), detail
+
+            if resp.status_code in (200, 204):
+                return DELETED, ""
+            if resp.status_code == 404:
+                return MISSING, "404"
+
+            detail = str(resp.status_code)
+            if resp.status_code in AUTH_STATUSES:
+                raise AuthError(detail, uncertain=uncertain)
+            if resp.status_code >= 500 and resp.status_code not in SAFE_RETRY_STATUSES:
+                uncertain = True
+            if self._should_retry(resp.status_code) and attempt < self.max_retries:
+                time.sleep(self._retry_delay(attempt, resp))
+                continue
+            return (UNCERTAIN if uncertain else FAILED), detail
+
+        return (UNCERTAIN if uncertain else FAILED), detail
+
+    def delete_many(self, tm_guid, ids_list, on_send=None):
+        """
+        Generator (entry_id, status, opis) dla wszystkich ID z listy.
+        Przy zmiennych ID - jedno żądanie naraz, ściśle malejąco.
+        Przy stałych ID - do max_workers żądań jednocześnie; wyniki w kolejności ukończenia.
+        on_send(entry_id) - wywoływane (w wątku wywołującym) tuż przed wysłaniem żądania dla danego ID.
+        Przy odrzuconym tokenie nowe żądania nie są wysyłane, zadania jeszcze nierozpoczęte są anulowane,
+        a po wynikach żądań już wysłanych generator zgłasza AuthError z listą ID bez wykonanego żądania.
+        """
+        ordered = sorted(ids_list, reverse=True)
+
+        if self.max_workers == 1:
+            for entry_id in ordered:
+                if on_send:
+                    on_send(entry_id)
+                try:
+                    status, detail = self.delete_entry(tm_guid, entry_id)
+                except AuthError as e:
+                    if not e.uncertain:
+                        raise AuthError(e.detail, unsent_ids=[entry_id])
+                    yield entry_id, UNCERTAIN, e.detail
+                    raise AuthError(e.detail)
+                yield entry_id, status, detail
+            return
+
+        auth_error = None
+        unsent_ids = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            ids_iter = iter(ordered)
+            # W obiegu trzymamy najwyżej 2 * max_workers zadań, żeby nie tworzyć setek tysięcy obiektów Future
+            window = 2 * self.max_workers
+
+            while True:
+                while auth_error is None and len(pending) < window:
+                    entry_id = next(ids_iter, None)
+                    if entry_id is None:
+                        break
+                    if on_send:
+                        on_send(entry_id)
+                    pending[executor.submit(self.delete_entry, tm_guid, entry_id)] = entry_id
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry_id = pending.pop(future)
+                    if future.cancelled():
+                        unsent_ids.append(entry_id)
+                        continue
+                    try:
+                        status, detail = future.result()
+                    except AuthError as e:
+                        if auth_error is None:
+                            auth_error = e
+                            for other in pending:
+                                other.cancel()
+                        if not e.uncertain:
+                            unsent_ids.append(entry_id)
+                            continue
+                        status, detail = UNCERTAIN, e.detail
+                    except Exception as e:
+                        # Nie wiadomo, na którym etapie żądania wystąpił błąd
+                        status, detail = UNCERTAIN, str(e)
+                    yield entry_id, status, detail
+
+        if auth_error is not None:
+            raise AuthError(auth_error.detail, unsent_ids=sorted(unsent_ids, reverse=True))
@@ -0,0 +1,199 @@
+"""
+Dziennik usuwania (append-only, JSON Lines) - jeden plik na pamięć TM: {JOURNAL_DIR}/{TMGuid}.jsonl
+
+Rekordy:
+  {"type": "plan", "file": ..., "size": ..., "mtime": ..., "users": [...], "ids": [...], "dry_run": ...}
+      - plan: ID do usunięcia (malejąco) wyznaczone z lokalnego TMX + odcisk pliku (rozmiar, mtime),
+  {"id": 123, "s": "sent"}
+      - żądanie usunięcia zaraz zostanie wysłane,
+  {"id": 123, "s": "unsent"}
+      - żądanie nie zostało wykonane (np. serwer odrzucił token) - ID wraca do oczekujących,
+  {"id": 123, "s": "deleted" | "missing" | "failed" | "uncertain", "d": "..."}
+      - wynik żądania.
+
+Każdy rekord trafia od razu do systemu (flush), a fsync wykonywany jest co `fsync_every` rekordów
+i przy zamknięciu - po awarii procesu dziennik jest kompletny, po awarii systemu może brakować
+najwyżej ostatniej paczki. Urwana ostatnia linia jest przy odczycie pomijana.
+
+Po restarcie ID z wynikiem nie są wysyłane ponownie - poza "failed" (wpis na pewno nie usunięty), które
+trafiają do nowego planu razem z ID bez wyniku (retry_ids). ID "sent" bez wyniku (awaria w trakcie żądania)
+są niepewne: przy zmiennych ID ponowienie mogłoby usunąć inny segment, więc są tylko zgłaszane.
+"""
+import hashlib
+import json
+import os
+from bisect import bisect_left
+
+from loc_common.compressed_io import input_stat
+from deletion_engine import DELETED, FAILED
+
+PLAN = "plan"
+SENT = "sent"
+UNSENT = "unsent"
+
+
+class JournalState:
+    """Stan odczytany z dziennika: plan (słownik lub None), wyniki {id: status}, ID wysłane bez wyniku."""
+
+    def __init__(self):
+        self.plan = None
+        self.results = {}
+        self.in_flight = set()
+
+    @property
+    def started(self):
+        """Czy wysłano już jakiekolwiek żądanie (od tej chwili planu nie wolno wyznaczać od nowa)."""
+        return bool(self.results or self.in_flight)
+
+    def pending_ids(self, include_in_flight=False):
+        """
+        ID z planu bez wyniku - w kolejności planu (malejąco).
+        ID wysłane bez wyniku są dołączane tylko na życzenie (bezpieczne wyłącznie przy stałych ID).
+        """
+        if not self.plan:
+            return []
+        skip = self.results if include_in_flight else self.results.keys() | self.in_flight
+        return [i for i in self.plan["ids"] if i not in skip]
+
+    def retry_ids(self, shift, include_in_flight=False):
+        """
+        ID do nowego planu po nieudanych żądaniach: FAILED i ID bez wyniku, w numeracji serwera po wykonanych
+        usunięciach. Przy shift=True (zmienne ID) każde ID maleje o liczbę usuniętych ID poniżej niego; ID, poniżej
+        którego jest wynik niepewny (inny niż DELETED / FAILED albo wysłane bez wyniku), nie da się przeliczyć.
+        Zwraca (ID malejąco, pominięte ID z planu).
+        """
+        candidates = self.ids_with_status(FAILED) + self.pending_ids(include_in_flight)
+        if not shift:
+            return sorted(candidates, reverse=True), []
+
+        deleted = sorted(self.ids_with_status(DELETED))
+        unknown = [i for i, s in self.results.items() if s not in (DELETED, FAILED)]
+        if not include_in_flight:
+            unknown.extend(self.in_flight)
+        lowest_unknown = min(unknown) if unknown else None
+        ids, skipped = [], []
+        for entry_id in sorted(candidates, reverse=True):
+            if lowest_unknown is not None and lowest_unknown < entry_id:
+                skipped.append(entry_id)
+            else:
+                ids.append(entry_id - bisect_left(deleted, entry_id))
+        return ids, skipped
+
+    def count(self, status):
+        return sum(1 for s in self.results.values() if s == status)
+
+    def ids_with_status(self, status):
+        return [i for i, s in self.results.items() if s == status]
+
+    def signature(self):
+        """Krótki podpis planu (eksport + użytkownicy + ID) - np. znacznik w indeksie numerów <tu>."""
+        if not self.plan:
+            return None
+        data = json.dumps([self.plan.get("size"), self.plan.get("mtime"), self.plan.get("users"), self.plan.get("ids")])
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def file_fingerprint(file_path):
+    """Odcisk lokalnego pliku TMX: (rozmiar, mtime w ns) - zmiana oznacza nowy eksport pamięci (dla pliku z .zip - archiwum)."""
+    st = input_stat(file_path)
+    return st.st_size, st.st_mtime_ns
+
+
+class DeletionJournal:
+
+    def __init__(self, path, fsync_every=100):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.handle = None
+        self.unsynced = 0
+
+    def load(self):
+        """Odczytuje dziennik (jeśli istnieje) i zwraca JournalState."""
+        state = JournalState()
+        if not os.path.exists(self.path):
+            return state
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Urwana linia po awarii - pomijamy
+                    continue
+                if record.get("type") == PLAN:
+                    # Nowy plan zastępuje wszystko, co było przed nim
+                    state = JournalState()
+                    state.plan = record
+                elif record.get("s") == SENT:
+                    state.in_flight.add(record["id"])
+                elif record.get("s") == UNSENT:
+                    state.in_flight.discard(record["id"])
+                elif "id" in record:
+                    state.in_flight.discard(record["id"])
+                    state.results[record["id"]] = record["s"]
+        return state
+
+    def plan_matches(self, state, file_path, users):
+        """Czy plan w dzienniku dotyczy tego samego eksportu TMX i tych samych użytkowników."""
+        return (self.same_export(state, file_path)
+                and state.plan.get("users") == sorted({u.lower() for u in users}))
+
+    def same_export(self, state, file_path):
+        """Czy plan w dzienniku wyznaczono z tego samego eksportu TMX (rozmiar i mtime bez zmian)."""
+        if not state.plan:
+            return False
+        size, mtime = file_fingerprint(file_path)
+        return state.plan.get("size") == size and state.plan.get("mtime") == mtime
+
+    def write_plan(self, file_path, users, ids, dry_run=False):
+        """
+        Dopisuje nowy plan (ID malejąco) i od razu go utrwala (fsync).
+        Przy odczycie nowy plan zastępuje wszystkie wcześniejsze rekordy - plik pozostaje append-only.
+        """
+        size, mtime = file_fingerprint(file_path)
+        self._append({
+            "type": PLAN,
+            "file": os.path.basename(file_path),
+            "size": size,
+            "mtime": mtime,
+            "users": sorted({u.lower() for u in users}),
+            "dry_run": dry_run,
+            "ids": sorted(ids, reverse=True),
+        })
+        self.sync()
+
+    def mark_sent(self, entry_id):
+        self._append({"id": entry_id, "s": SENT})
+
+    def mark_unsent(self, entry_id):
+        """Cofa mark_sent: żądanie na pewno nie zostało wykonane, ID zostaje w planie do wysłania."""
+        self._append({"id": entry_id, "s": UNSENT})
+
+    def record(self, entry_id, status, detail=""):
+        record = {"id": entry_id, "s": status}
+        if detail:
+            record["d"] = detail
+        self._append(record)
+
+    def _append(self, record):
+        if self.handle is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self.handle = open(self.path, "a", encoding="utf-8")
+        self.handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.handle.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self.handle is not None and self.unsynced:
+            os.fsync(self.handle.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if self.handle is not None:
+            self.sync()
+            self.handle.close()
+            self.handle = None
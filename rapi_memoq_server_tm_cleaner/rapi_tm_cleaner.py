@@ -2,7 +2,19 @@ import requests
 import csv
 import urllib3
 import os
-import xml.etree.ElementTree as ET
+import sys
+import time
+
+# Wspólny moduł strumieniowy TMX (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common.tmx_stream import iter_tu_records, scan_tu_attribute
+from loc_common.tu_index import TuOrdinalIndex, index_path_for
+from loc_common.compressed_io import COMPRESSION_OPENERS, input_base_name, input_exists
+from loc_common import metrics
+from deletion_engine import AuthError, DeletionEngine, DELETED, MISSING, FAILED, UNCERTAIN
+from deletion_journal import DeletionJournal
+from tm_catalogue import fetch_tm_catalogue
+from tmx_filter import MANIFEST_SUFFIX, filter_tmx, write_manifest
 
 # ==========================================
 # KONFIGURACJA
@@ -13,8 +25,51 @@ PASSWORD = "TWOJE_HASLO"
 
 # Plik sterujący
 RAPORT_FILE = "raport.csv"
-# Folder gdzie leżą pliki .tmx
+# Folder gdzie leżą pliki .tmx (mogą być skompresowane: .tmx.gz/.tmx.xz/.tmx.bz2 lub w archiwum .zip)
 TMX_DIR = "." 
+# Lokalna kopia listy pamięci z serwera (GUID, NumEntries, języki) i czas jej ważności w sekundach.
+# Po upływie czasu lista jest odświeżana warunkowo (ETag). TM_CATALOGUE_TTL = 0 - zawsze pytaj serwer.
+TM_CATALOGUE_FILE = "tm_catalogue.json"
+TM_CATALOGUE_TTL = 3600
+# Parser TMX: 'auto' (lxml, jeśli zainstalowany, w przeciwnym razie expat), 'lxml', 'expat' lub 'etree'
+TMX_BACKEND = "auto"
+# Szybka ścieżka: skanowanie bajtów przez mmap (tylko tagi <tu ...>), bez parsera XML.
+# Pliki z CDATA/komentarzami/innym kodowaniem niż UTF-8 i tak idą przez parser.
+FAST_SCAN = True
+# Indeks numerów <tu> (plik {nazwa}.tmx.tuidx obok TMX): budowany raz na eksport, potem ID do usunięcia
+# są odczytywane bez parsowania TMX. Po usuwaniu indeks jest przesuwany zgodnie ze stanem serwera.
+TU_INDEX = True
+
+# Usuwanie na serwerze (wspólna sesja HTTP z pulą połączeń, ponawianie przy 429/503)
+# Czy ID wpisów na serwerze są stałe (nie przesuwają się po usunięciu)? Ustaw True dopiero
+# po sprawdzeniu na kopii TM - tylko wtedy żądania mogą iść równolegle (DELETE_WORKERS).
+ENTRY_IDS_STABLE = False
+DELETE_WORKERS = 8
+# Maksymalna liczba żądań na sekundę (0 = bez limitu)
+RATE_LIMIT = 0
+# Liczba ponowień jednego żądania
+MAX_RETRIES = 5
+
+# Dziennik usuwania (jeden plik .jsonl na pamięć TM) - pozwala wznowić przerwany przebieg
+JOURNAL_DIR = "journal"
+# Co ile rekordów dziennik jest utrwalany na dysku (fsync)
+JOURNAL_FSYNC_EVERY = 100
+# Tryb próbny: wyznacza i zapisuje plan w dzienniku, ale nie wysyła żądań usunięcia
+DRY_RUN = False
+
+# Sposób czyszczenia: "api" - usuwanie wpisów przez API (jedno żądanie na wpis), "filter" - przefiltrowana
+# kopia TMX (bez <tu> zbanowanych użytkowników) do ponownego importu, "auto" - filtr, gdy usuwamy co najmniej
+# FILTER_THRESHOLD wszystkich wpisów pamięci (przy setkach tysięcy wpisów import jest dużo szybszy).
+# Filtr niczego nie usuwa na serwerze - dlatego domyślnie "api", a "filter" / "auto" trzeba włączyć.
+CLEAN_MODE = "api"
+FILTER_THRESHOLD = 0.2
+# Folder na przefiltrowane pliki TMX i ich manifesty (liczby i numery usuniętych <tu>)
+FILTER_DIR = "filtered"
+
+# Pomiary wydajności (loc_common/metrics.py): ślad JSON Lines i snapshot w formacie textfile Prometheusa
+# (czas każdego żądania API, ponowienia, czas wyznaczania planu i filtrowania). None = wyłączone.
+METRICS_TRACE_FILE = None
+METRICS_PROM_FILE = None
 
 # Wyłączamy ostrzeżenia SSL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -40,8 +95,11 @@ def api_login():
     headers = {"Content-Type": "application/json"}
     
     log(f"Logowanie do: {url}")
+    start = time.perf_counter()
     try:
         resp = requests.post(url, json=payload, headers=headers, verify=False)
+        metrics.observe("rapi_request_seconds", time.perf_counter() - start,
+                        {"endpoint": "login", "status": resp.status_code})
         if resp.status_code == 200:
             token = resp.json().get("AccessToken")
             log("Zalogowano pomyślnie.")
@@ -53,72 +111,329 @@ def api_login():
         error(f"Wyjątek połączenia: {e}")
         return None
 
-def get_server_tms_map(token):
-    """Pobiera listę TM i mapuje FriendlyName -> TMGuid"""
-    url = f"{SERVER_URL}/tms?authToken={token}"
+def get_server_tm_catalogue(token):
+    """Katalog pamięci TM (FriendlyName -> GUID, NumEntries, języki) - z pliku lub z serwera."""
     log("Pobieranie listy pamięci z serwera...")
     
     try:
-        resp = requests.get(url, verify=False)
-        if resp.status_code == 200:
-            data = resp.json()
-            mapping = {}
-            for tm in data:
-                # Szukamy FriendlyName, jeśli brak to Name
-                name = tm.get("FriendlyName") or tm.get("Name")
-                guid = tm.get("TMGuid") or tm.get("TmGuid")
-                if name and guid:
-                    mapping[name] = guid
-            log(f"Pobrano {len(mapping)} pamięci.")
-            return mapping
-        else:
-            error(f"Błąd pobierania listy TM: {resp.status_code}")
-            return {}
+        catalogue = fetch_tm_catalogue(SERVER_URL, token, TM_CATALOGUE_FILE, TM_CATALOGUE_TTL, log=log)
     except Exception as e:
         error(f"Błąd pobierania listy: {e}")
-        return {}
+        return None
+    
+    if catalogue is None:
+        error("Błąd pobierania listy TM.")
+        return None
+    log(f"Pobrano {len(catalogue)} pamięci.")
+    return catalogue
 
-def get_ids_to_delete_from_tmx(file_path, banned_user):
+def get_server_tms_map(token):
+    """Pobiera listę TM i mapuje FriendlyName -> TMGuid"""
+    catalogue = get_server_tm_catalogue(token)
+    return catalogue.name_map() if catalogue else {}
+
+def iter_creation_ids(file_path):
+    """
+    Zwraca creationid (lub None) kolejnych bloków <tu> - pozycja na liście to nasze ID segmentu.
+    Najpierw próbuje szybkiego skanera bajtowego, a gdy plik się do niego nie nadaje - parsera XML.
     """
-    Parsuje plik TMX w trybie strumieniowym (oszczędność RAM).
-    Zwraca listę indeksów (int), w których creationid == banned_user.
+    if FAST_SCAN:
+        values = scan_tu_attribute(file_path, "creationid")
+        if values is not None:
+            return values
+
+    # iter_tu_records czyta plik kawałek po kawałku i zwraca tylko atrybuty tagów <tu> (Translation Unit).
+    # Potrzebujemy wyłącznie creationid, więc nie prosimy o tekst (want_text=False) -
+    # backend expat w ogóle nie buduje wtedy elementów XML.
+    return (tu.get("creationid") for tu in iter_tu_records(file_path, backend=TMX_BACKEND))
+
+def load_tu_index(file_path, build=True):
+    """
+    Indeks numerów <tu> dla pliku TMX: z pliku {file_path}.tuidx, jeśli pasuje do eksportu (rozmiar, mtime),
+    w przeciwnym razie (przy build=True) budowany jednym przebiegiem przez TMX i zapisywany. Bez build - None.
+    Indeks może już zbudować translator_id_tmx_analysis (BUILD_TU_INDEX) przy analizie tych samych plików.
+    """
+    index_path = index_path_for(file_path)
+    index = TuOrdinalIndex.load(index_path)
+    if index is not None and index.matches(file_path):
+        return index
+    if not build:
+        return None
+
+    log(f"Buduję indeks segmentów: {index_path}")
+    index = TuOrdinalIndex.build(file_path, iter_creation_ids(file_path))
+    try:
+        index.save(index_path)
+    except OSError as e:
+        error(f"Nie udało się zapisać indeksu {index_path}: {e}")
+    return index
+
+def update_tu_index(local_path, journal):
+    """
+    Po wykonaniu planu z dziennika przenosi usunięcia do indeksu: usunięte numery znikają, a przy zmiennych ID
+    pozostałe są przesuwane. Indeks odpowiada wtedy stanowi serwera i kolejny plan dla tego eksportu
+    (np. dla innych użytkowników) nie wymaga nowego eksportu TMX.
+    Gdy wynik części żądań jest niepewny (przerwane w trakcie, 404, UNCERTAIN - np. 500 lub brak odpowiedzi
+    w czasie), indeks jest usuwany. Tylko FAILED oznacza wpis na pewno nieusunięty.
+    """
+    if not TU_INDEX:
+        return
+    index = load_tu_index(local_path, build=False)
+    state = journal.load()
+    if index is None or not state.plan or index.has_applied(state.signature()):
+        return
+
+    index_path = index_path_for(local_path)
+    if state.pending_ids() or state.in_flight or state.count(MISSING) or state.count(UNCERTAIN):
+        try:
+            os.remove(index_path)
+        except OSError as e:
+            error(f"Niepewny stan serwera po usuwaniu, ale nie udało się usunąć indeksu {index_path}: {e}. "
+                  f"Usuń go ręcznie i zrób nowy eksport TMX.")
+            return
+        log(f"Niepewny stan serwera po usuwaniu - usunięto indeks {index_path} (potrzebny nowy eksport TMX).")
+        return
+
+    index.apply_deletions(state.ids_with_status(DELETED), shift=not ENTRY_IDS_STABLE, tag=state.signature())
+    index.save(index_path)
+    log(f"Indeks {index_path} zaktualizowany ({state.count(DELETED)} usuniętych wpisów).")
+
+def get_ids_to_delete_per_user(file_path, banned_users):
+    """
+    Jeden przebieg strumieniowy przez plik TMX dla wielu użytkowników naraz
+    (albo odczyt z indeksu numerów <tu>, gdy TU_INDEX jest włączony).
+    Zwraca słownik {user_id (małe litery): lista indeksów (int)}, w których creationid == user_id.
     Indeksy liczone są od 0 (kolejność występowania <tu>).
+    Przy błędzie odczytu zwraca None - pusta lista znaczyłaby "nic do usunięcia" i trafiłaby do planu.
     """
-    ids_list = []
+    # Porównujemy bez względu na wielkość liter - zbiór pozwala na sprawdzenie O(1) dla każdego <tu>
+    banned = {user.lower() for user in banned_users}
+    ids_by_user = {user: [] for user in banned}
     
     # Licznik segmentów (nasze ID)
     current_index = 0
     
     try:
-        # iterparse pozwala czytać plik kawałek po kawałku
-        context = ET.iterparse(file_path, events=("end",))
-        
-        for event, elem in context:
-            # Interesują nas tylko tagi <tu> (Translation Unit)
-            if elem.tag == "tu":
-                # Sprawdzamy atrybut creationid
-                # Uwaga: atrybuty w XML bywają case-sensitive, zazwyczaj jest to 'creationid'
-                c_id = elem.get("creationid")
-                
-                # Czasem memoQ używa 'changeid' jeśli to była edycja, 
-                # ale instrukcja mówi o creationid. Sprawdzamy match.
-                if c_id and c_id.lower() == banned_user.lower():
-                    ids_list.append(current_index)
-                
-                # WAŻNE: Czyścimy element z RAMu po przetworzeniu!
-                elem.clear()
-                current_index += 1
+        if TU_INDEX:
+            # Odczyt tylko tablic zbanowanych użytkowników - O(k), bez parsowania TMX
+            index = load_tu_index(file_path)
+            return {user: index.lookup(user) for user in banned}
+
+        for c_id in iter_creation_ids(file_path):
+            # Sprawdzamy atrybut creationid
+            # Uwaga: atrybuty w XML bywają case-sensitive, zazwyczaj jest to 'creationid'
+            
+            # Czasem memoQ używa 'changeid' jeśli to była edycja, 
+            # ale instrukcja mówi o creationid. Sprawdzamy match.
+            if c_id:
+                c_id = c_id.lower()
+                if c_id in banned:
+                    ids_by_user[c_id].append(current_index)
+            
+            current_index += 1
                 
-        return ids_list
+        return ids_by_user
         
     except Exception as e:
         error(f"Błąd parsowania pliku {file_path}: {e}")
-        return []
+        return None
+
+def get_ids_to_delete_from_tmx(file_path, banned_user):
+    """
+    Zwraca listę indeksów (int) segmentów jednego użytkownika (creationid == banned_user) albo None przy błędzie.
+    """
+    ids_by_user = get_ids_to_delete_per_user(file_path, [banned_user])
+    return ids_by_user[banned_user.lower()] if ids_by_user is not None else None
+
+def read_report_grouped(report_path):
+    """
+    Czyta raport CSV (NazwaPliku.tmx ; Liczba ; UserID) i grupuje go po plikach.
+    Zwraca słownik {nazwa pliku: lista użytkowników} w kolejności z raportu, bez powtórzeń
+    (użytkowników porównujemy bez względu na wielkość liter).
+    """
+    grouped = {}
+    with open(report_path, "r", encoding="utf-8") as f:
+        # Zakładam separator średnik ; (typowy dla CSV w PL)
+        reader = csv.reader(f, delimiter=";")
+        
+        for row in reader:
+            # Format: NazwaPliku.tmx ; Liczba ; UserID
+            if len(row) < 3: continue
+            
+            filename = row[0].strip()
+            banned_user = row[2].strip()
+            if not banned_user: continue
+            
+            users = grouped.setdefault(filename, [])
+            if banned_user.lower() not in (u.lower() for u in users):
+                users.append(banned_user)
+    return grouped
+
+def create_deletion_engine(token):
+    """Silnik usuwania (wspólna sesja HTTP z pulą połączeń) skonfigurowany stałymi z góry pliku."""
+    return DeletionEngine(SERVER_URL, token,
+                          max_workers=DELETE_WORKERS,
+                          stable_ids=ENTRY_IDS_STABLE,
+                          rate_limit=RATE_LIMIT,
+                          max_retries=MAX_RETRIES,
+                          verify=False)
+
+def tm_name_for(filename):
+    """FriendlyName pamięci z nazwy pliku z raportu (bez .tmx, archiwum i końcówki kompresji)."""
+    return input_base_name(filename.strip()).replace(".tmx", "").strip()
+
+def find_local_tmx(filename):
+    """
+    Lokalny plik dla nazwy z raportu: {TMX_DIR}/{nazwa} albo jego skompresowana wersja ({nazwa}.gz/.xz/.bz2).
+    Nazwa może też wskazywać plik w archiwum (archiwum.zip/plik.tmx - jak w raporcie analizy). Brak pliku - None.
+    """
+    for candidate in [filename] + [filename + suffix for suffix in COMPRESSION_OPENERS]:
+        path = os.path.join(TMX_DIR, candidate)
+        if input_exists(path):
+            return path
+    return None
+
+def validate_report(report, catalogue):
+    """Sprawdza wszystkie pliki z raportu w katalogu pamięci (bez zapytań do serwera), zanim cokolwiek usuniemy."""
+    missing = [f for f in report if catalogue.lookup(tm_name_for(f)) is None]
+    log(f"Raport: {len(report)} plików TMX, {len(report) - len(missing)} z nich ma pamięć na serwerze.")
+    if missing:
+        error(f"Brak na serwerze pamięci dla: {', '.join(missing)}")
+
+def check_entry_count(tm, ids_to_delete):
+    """
+    Przy zmiennych ID najwyższe ID musi być mniejsze niż liczba wpisów w pamięci na serwerze -
+    w przeciwnym razie eksport TMX nie odpowiada pamięci i indeksy wskazywałyby złe segmenty.
+    """
+    num_entries = tm.get("NumEntries")
+    if ENTRY_IDS_STABLE or num_entries is None or not ids_to_delete:
+        return True
+    return max(ids_to_delete) < num_entries
 
-def delete_entries_on_server(token, tm_guid, ids_list):
+def prepare_deletion_plan(journal, local_path, banned_users):
+    """
+    Zwraca listę ID do usunięcia (malejąco) dla jednego pliku TMX.
+    Jeśli dziennik zawiera plan dla tego samego eksportu i tych samych użytkowników - wznawia go
+    bez ponownego parsowania pliku (po nieudanych żądaniach - nowym planem z ID przeliczonymi na stan serwera).
+    W przeciwnym razie parsuje plik i dopisuje nowy plan.
+    Zwraca None, gdy kontynuacja byłaby niebezpieczna.
+    """
+    state = journal.load()
+
+    if journal.plan_matches(state, local_path, banned_users):
+        if state.started:
+            log(f"Wznawiam z dziennika {journal.path}: usunięto {state.count(DELETED)}, "
+                f"brak na serwerze {state.count(MISSING)}, błędy {state.count(FAILED)}, "
+                f"niepewne {state.count(UNCERTAIN)}.")
+        if state.in_flight:
+            if ENTRY_IDS_STABLE:
+                log(f"Ponawiam {len(state.in_flight)} żądań przerwanych w trakcie (stałe ID).")
+            else:
+                # Nie wiemy, czy serwer usunął te wpisy - ponowienie mogłoby usunąć inny segment
+                error(f"Niepewny wynik dla ID {sorted(state.in_flight, reverse=True)} (przerwane w trakcie żądania). "
+                      f"Pomijam je - sprawdź je ręcznie lub zrób nowy eksport TMX.")
+        if not state.count(FAILED):
+            return state.pending_ids(include_in_flight=ENTRY_IDS_STABLE)
+
+        # Wpisy z wynikiem FAILED na pewno zostały na serwerze - ponawiamy je w nowym planie. Przy zmiennych ID
+        # ich numery przesunęły się o usunięte niżej wpisy.
+        ids_to_delete, skipped = state.retry_ids(shift=not ENTRY_IDS_STABLE, include_in_flight=ENTRY_IDS_STABLE)
+        if skipped:
+            error(f"Nie ponawiam ID {skipped}: poniżej nich jest wynik niepewny, więc nie da się wyznaczyć "
+                  f"ich obecnych numerów na serwerze. Zrób nowy eksport TMX.")
+        log(f"Ponawiam {state.count(FAILED) - len(skipped)} nieudanych usunięć - nowy plan: "
+            f"{len(ids_to_delete)} ID.")
+        # Indeks przejmuje wykonany plan przed jego zastąpieniem - nowe ID są już w numeracji po usunięciach
+        update_tu_index(local_path, journal)
+        journal.write_plan(local_path, banned_users, ids_to_delete, dry_run=DRY_RUN)
+        return ids_to_delete
+
+    if state.started and journal.same_export(state, local_path):
+        # Część segmentów z tego eksportu już usunięto - indeksy na serwerze się przesunęły.
+        # Nowy plan można wyznaczyć tylko z indeksu, który uwzględnia wykonany plan.
+        index = load_tu_index(local_path, build=False) if TU_INDEX else None
+        if index is None or not index.has_applied(state.signature()):
+            error(f"Dziennik {journal.path} zawiera rozpoczęte usuwanie dla innej listy użytkowników. "
+                  f"Zrób nowy eksport TMX tej pamięci. Pomijam.")
+            return None
+        log("Poprzedni plan dla tego eksportu jest już uwzględniony w indeksie - wyznaczam nowy plan z indeksu.")
+
+    with metrics.timer("tmx_plan_seconds", {"source": "index" if TU_INDEX else "scan"}, file=local_path):
+        ids_by_user = get_ids_to_delete_per_user(local_path, banned_users)
+    if ids_by_user is None:
+        # Bez zapisu planu - kolejne uruchomienie spróbuje ponownie odczytać plik
+        error(f"Nie udało się wyznaczyć ID z pliku {local_path}. Pomijam.")
+        return None
+    for banned_user in banned_users:
+        log(f"Użytkownik {banned_user}: {len(ids_by_user[banned_user.lower()])} segmentów w pliku lokalnym.")
+
+    # Łączymy indeksy wszystkich użytkowników (bez powtórzeń) w jedną listę
+    ids_to_delete = sorted(set().union(*ids_by_user.values()), reverse=True)
+    journal.write_plan(local_path, banned_users, ids_to_delete, dry_run=DRY_RUN)
+    return ids_to_delete
+
+def choose_clean_mode(remove_count, tm, local_path):
+    """
+    "api" albo "filter" wg CLEAN_MODE. W trybie "auto" filtr wybieramy, gdy usuwane wpisy to co najmniej
+    FILTER_THRESHOLD wszystkich wpisów pamięci na serwerze.
+    """
+    mode = CLEAN_MODE
+    if mode == "auto":
+        num_entries = tm.get("NumEntries")
+        mode = "filter" if num_entries and remove_count / num_entries >= FILTER_THRESHOLD else "api"
+
+    if mode == "filter" and TU_INDEX:
+        # Po wcześniejszym planie (inna lista użytkowników) część wpisów z tego eksportu zniknęła już z serwera -
+        # przefiltrowany eksport by je przywrócił
+        index = load_tu_index(local_path, build=False)
+        if index is not None and index.applied:
+            log("Z tego eksportu usunięto już wpisy przez API - filtr przywróciłby je po imporcie. Używam API.")
+            return "api"
+    return mode
+
+def write_filtered_tmx(local_path, banned_users, tm):
+    """
+    Tryb filtrowania: zapisuje {FILTER_DIR}/{plik}.tmx bez <tu> zbanowanych użytkowników (jeden przebieg,
+    stała pamięć) i manifest obok. Zwraca FilterResult albo None przy błędzie.
+    """
+    os.makedirs(FILTER_DIR, exist_ok=True)
+    out_path = os.path.join(FILTER_DIR, input_base_name(local_path))
+    log(f"Filtruję {local_path} -> {out_path}")
+    try:
+        with metrics.timer("tmx_filter_seconds", file=local_path) as filter_timer:
+            result = filter_tmx(local_path, out_path, banned_users)
+            filter_timer.set(total=result.total, removed=result.removed)
+    except Exception as e:
+        error(f"Filtrowanie pliku {local_path} nie powiodło się: {e}. Na serwerze nic nie usunięto.")
+        return None
+
+    manifest_path = out_path + MANIFEST_SUFFIX
+    write_manifest(manifest_path, result, local_path, out_path, banned_users)
+    fraction = result.removed / result.total if result.total else 0
+    log(f"Usunięto {result.removed} z {result.total} segmentów ({fraction:.1%}), zostało {result.kept}. "
+        f"Manifest: {manifest_path}")
+
+    num_entries = tm.get("NumEntries")
+    if num_entries is not None and num_entries != result.total:
+        error(f"Pamięć na serwerze ma {num_entries} wpisów, a eksport {result.total} - import tego pliku "
+              f"zgubiłby zmiany spoza eksportu. Zrób nowy eksport TMX przed importem.")
+    else:
+        log(f"Zaimportuj {out_path} do pamięci {tm.get('FriendlyName', '')} w miejsce obecnej zawartości.")
+    if num_entries is not None:
+        log(f"Na serwerze nic nie usunięto - pamięć {tm.get('FriendlyName', '')} ma nadal {num_entries} wpisów "
+            f"do czasu importu.")
+    else:
+        log(f"Na serwerze nic nie usunięto - pamięć {tm.get('FriendlyName', '')} zmieni się dopiero po imporcie.")
+    return result
+
+def delete_entries_on_server(token, tm_guid, ids_list, engine=None, journal=None):
     """
     Wysyła żądania usunięcia dla listy ID.
     Sortuje ID malejąco, aby uniknąć problemu przesuwania indeksów.
+    engine: współdzielony DeletionEngine (jeśli brak - tworzony na czas tego wywołania).
+    journal: DeletionJournal - każde wysłanie i wynik trafia do dziennika.
+    Odrzucony token (401 / 403) przerywa usuwanie: ID bez wykonanego żądania wracają w dzienniku
+    do oczekujących, a AuthError (z liczbą usuniętych wpisów w atrybucie deleted) trafia do wywołującego.
     """
     # SORTOWANIE MALEJĄCE (Reverse) - Kluczowe dla bezpieczeństwa indeksów
     ids_list.sort(reverse=True)
@@ -126,30 +441,46 @@ def delete_entries_on_server(token, tm_guid, ids_list):
     deleted_count = 0
     total = len(ids_list)
     
-    log(f"Rozpoczynam usuwanie {total} segmentów (kolejność malejąca)...")
+    own_engine = engine is None
+    if own_engine:
+        engine = create_deletion_engine(token)
     
-    for i, entry_id in enumerate(ids_list, 1):
-        # URL do usuwania
-        url = f"{SERVER_URL}/tms/{tm_guid}/entries/{entry_id}/delete?authToken={token}"
-        
-        try:
-            # POST bez body, token w URL
-            resp = requests.post(url, verify=False)
+    if engine.max_workers > 1:
+        log(f"Rozpoczynam usuwanie {total} segmentów ({engine.max_workers} równoległych żądań, stałe ID)...")
+    else:
+        log(f"Rozpoczynam usuwanie {total} segmentów (kolejność malejąca)...")
+    
+    on_send = journal.mark_sent if journal else None
+    
+    try:
+        for i, (entry_id, status, detail) in enumerate(engine.delete_many(tm_guid, ids_list, on_send), 1):
+            if journal:
+                journal.record(entry_id, status, detail)
             
-            if resp.status_code in [200, 204]:
+            if status == DELETED:
                 # Sukces
                 deleted_count += 1
-            elif resp.status_code == 404:
+            elif status == MISSING:
                 error(f"Segment ID {entry_id} nie istnieje na serwerze (już usunięty?).")
+            elif status == UNCERTAIN:
+                error(f"Niepewny wynik dla ID {entry_id} (serwer mógł usunąć wpis): {detail}")
             else:
-                error(f"Błąd usuwania ID {entry_id}: {resp.status_code}")
+                error(f"Błąd usuwania ID {entry_id}: {detail}")
                 
-        except Exception as e:
-            error(f"Wyjątek przy ID {entry_id}: {e}")
-            
-        # Logowanie postępu co 100 sztuk
-        if i % 100 == 0:
-            print(f"   Postęp: {i}/{total} usunięto...")
+            # Logowanie postępu co 100 sztuk
+            if i % 100 == 0:
+                print(f"   Postęp: {i}/{total} usunięto...")
+    except AuthError as e:
+        if journal:
+            for entry_id in e.unsent_ids:
+                journal.mark_unsent(entry_id)
+        e.deleted = deleted_count
+        raise
+    finally:
+        if journal:
+            journal.close()
+        if own_engine:
+            engine.close()
             
     return deleted_count
 
@@ -162,65 +493,112 @@ def main():
     token = api_login()
     if not token: return
     
-    # 2. Mapa pamięci z serwera
-    server_map = get_server_tms_map(token)
-    if not server_map: return
+    # 2. Katalog pamięci z serwera (lub z lokalnej kopii)
+    catalogue = get_server_tm_catalogue(token)
+    if not catalogue: return
 
     # 3. Przetwarzanie raportu
     if not os.path.exists(RAPORT_FILE):
         error(f"Brak pliku raportu: {RAPORT_FILE}")
         return
 
-    with open(RAPORT_FILE, "r", encoding="utf-8") as f:
-        # Zakładam separator średnik ; (typowy dla CSV w PL)
-        reader = csv.reader(f, delimiter=";")
+    # Grupujemy raport po plikach: każdy TMX czytamy raz, niezależnie od liczby użytkowników
+    report = read_report_grouped(RAPORT_FILE)
+    validate_report(report, catalogue)
+
+    # Jeden silnik (jedna sesja HTTP) na cały przebieg
+    engine = create_deletion_engine(token)
+
+    for filename, banned_users in report.items():
+        # 3a. Znalezienie FriendlyName (usuwamy .tmx)
+        friendly_name_search = tm_name_for(filename)
         
-        for row in reader:
-            # Format: NazwaPliku.tmx ; Liczba ; UserID
-            if len(row) < 3: continue
-            
-            filename = row[0].strip()
-            banned_user = row[2].strip()
-            
-            # 3a. Znalezienie FriendlyName (usuwamy .tmx)
-            friendly_name_search = filename.replace(".tmx", "").strip()
-            
-            print(f"\n--- Przetwarzanie: {filename} (User: {banned_user}) ---")
-            
-            # 3b. Pobranie GUID z mapy serwera
-            # Szukamy dokładnego dopasowania lub ignorując wielkość liter
-            tm_guid = server_map.get(friendly_name_search)
-            
-            if not tm_guid:
-                # Próba case-insensitive
-                for s_name, s_guid in server_map.items():
-                    if s_name.lower() == friendly_name_search.lower():
-                        tm_guid = s_guid
-                        break
-            
-            if not tm_guid:
-                error(f"Nie znaleziono pamięci '{friendly_name_search}' na serwerze. Pomijam.")
-                continue
-                
-            log(f"Znaleziono GUID: {tm_guid}")
-            
-            # 3c. Analiza lokalnego pliku TMX (wyznaczanie ID do usunięcia)
-            local_path = os.path.join(TMX_DIR, filename)
-            if not os.path.exists(local_path):
-                error(f"Nie znaleziono pliku lokalnego: {local_path}. Nie mogę wyznaczyć ID.")
-                continue
-                
-            ids_to_delete = get_ids_to_delete_from_tmx(local_path, banned_user)
+        print(f"\n--- Przetwarzanie: {filename} (Użytkownicy: {', '.join(banned_users)}) ---")
+        
+        # 3b. Pobranie GUID z katalogu
+        # Szukamy dokładnego dopasowania lub ignorując wielkość liter (gotowy indeks, bez przeglądania listy)
+        tm = catalogue.lookup(friendly_name_search)
+        
+        if not tm:
+            error(f"Nie znaleziono pamięci '{friendly_name_search}' na serwerze. Pomijam.")
+            continue
+        
+        tm_guid = tm["TMGuid"]
+        log(f"Znaleziono GUID: {tm_guid} ({tm.get('SourceLangCode')} -> {tm.get('TargetLangCode')}, "
+            f"wpisów: {tm.get('NumEntries')})")
+        
+        # 3c. Plan usuwania: z dziennika (wznowienie) albo z analizy lokalnego pliku TMX -
+        # jeden przebieg dla wszystkich użytkowników
+        # Plik skompresowany (lub z archiwum .zip) jest czytany strumieniowo, bez rozpakowywania
+        local_path = find_local_tmx(filename)
+        if local_path is None:
+            error(f"Nie znaleziono pliku lokalnego: {os.path.join(TMX_DIR, filename)}. Nie mogę wyznaczyć ID.")
+            continue
+        
+        journal = DeletionJournal(os.path.join(JOURNAL_DIR, f"{tm_guid}.jsonl"), JOURNAL_FSYNC_EVERY)
+        ids_to_delete = prepare_deletion_plan(journal, local_path, banned_users)
+        
+        if ids_to_delete is None:
+            continue
+        if not ids_to_delete:
+            log("Brak segmentów do usunięcia (lub plan z dziennika jest już wykonany).")
+            continue
             
+        log(f"Do usunięcia: {len(ids_to_delete)} segmentów.")
+        
+        if not check_entry_count(tm, ids_to_delete):
+            error(f"Najwyższe ID ({max(ids_to_delete)}) nie mieści się w pamięci na serwerze "
+                  f"({tm['NumEntries']} wpisów). Eksport TMX nie pasuje do pamięci "
+                  f"(albo lokalna lista pamięci jest nieaktualna - usuń {TM_CATALOGUE_FILE}). Pomijam.")
+            continue
+        
+        mode = choose_clean_mode(len(ids_to_delete), tm, local_path)
+        if DRY_RUN:
+            log(f"DRY_RUN: plan zapisany w {journal.path}, nic nie usuwam (tryb: {mode}).")
+            continue
+        
+        if mode == "filter":
+            # 3d. Zamiast żądania na każdy wpis - przefiltrowana kopia TMX do ponownego importu
+            write_filtered_tmx(local_path, banned_users, tm)
+            continue
+        
+        # 3d. Wykonanie usuwania na serwerze - jeden przebieg malejący po wszystkich indeksach
+        planned = len(ids_to_delete)
+        deleted = 0
+        relogged = False
+        while True:
+            try:
+                deleted += delete_entries_on_server(token, tm_guid, ids_to_delete, engine, journal)
+                break
+            except AuthError as e:
+                deleted += e.deleted
+                error(f"{e} - przerywam usuwanie. Niewykonane ID zostają w dzienniku {journal.path}.")
+            # Jedno ponowne logowanie na plik; potem wznowienie planu z dziennika
+            token = api_login() if not relogged else None
+            if not token:
+                break
+            relogged = True
+            engine.close()
+            engine = create_deletion_engine(token)
+            ids_to_delete = prepare_deletion_plan(journal, local_path, banned_users)
             if not ids_to_delete:
-                log("Brak segmentów tego użytkownika w pliku lokalnym.")
-                continue
-                
-            log(f"Znaleziono {len(ids_to_delete)} segmentów do usunięcia w pliku lokalnym.")
-            
-            # 3d. Wykonanie usuwania na serwerze
-            deleted = delete_entries_on_server(token, tm_guid, ids_to_delete)
-            log(f"Zakończono dla {filename}. Pomyślnie usunięto: {deleted}/{len(ids_to_delete)}")
+                break
+        log(f"Zakończono dla {filename}. Pomyślnie usunięto: {deleted}/{planned}")
+        
+        # Aktualizujemy liczbę wpisów w lokalnym katalogu, żeby kolejne sprawdzenia były poprawne
+        if tm.get("NumEntries") is not None:
+            tm["NumEntries"] -= deleted
+            catalogue.save(TM_CATALOGUE_FILE)
+        
+        if not token:
+            error("Nie można kontynuować bez ważnego tokenu. Uruchom skrypt ponownie - usuwanie zostanie "
+                  "wznowione z dziennika.")
+            break
+        
+        # Indeks numerów <tu> idzie za stanem serwera (przesunięcie ID po usunięciu)
+        update_tu_index(local_path, journal)
+
+    engine.close()
 
     # 4. Wylogowanie
     try:
@@ -228,5 +606,22 @@ def main():
         log("Wylogowano.")
     except: pass
 
+def report_metrics():
+    """Podsumowanie pomiarów w logu i zapis śladu / snapshotu (loc_common.metrics)."""
+    if not metrics.enabled():
+        return
+    log("Pomiary wydajności:")
+    for line in metrics.summary_lines():
+        print(f"   {line}")
+    try:
+        metrics.finish()
+    except OSError as e:
+        error(f"Nie udało się zapisać pomiarów: {e}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if metrics.configure("rapi_tm_cleaner", METRICS_TRACE_FILE, METRICS_PROM_FILE):
+        log("Pomiary wydajności: włączone (loc_common/metrics.py)")
+    try:
+        main()
+    finally:
+        report_metrics()
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Lokalny katalog pamięci TM z serwera (GET /tms) z pamięcią podręczną na dysku.
+
+- Plik JSON z listą TM, nagłówkiem ETag i czasem pobrania; ważny przez `ttl` sekund.
+- Po upływie TTL odświeżanie warunkowe (If-None-Match) - przy 304 serwer nie wysyła całej listy ponownie.
+- Słownik po FriendlyName i gotowy indeks casefold - wyszukiwanie O(1) zamiast przeglądania całej listy.
+- Zachowuje NumEntries i kody języków, żeby sprawdzać wiersze raportu bez pytania serwera.
+"""
+import json
+import os
+import time
+
+import requests
+
+from loc_common import metrics
+
+# Pola zachowywane dla każdej pamięci
+CATALOGUE_FIELDS = ("FriendlyName", "TMGuid", "NumEntries", "SourceLangCode", "TargetLangCode")
+CATALOGUE_VERSION = 1
+
+
+def _normalize_tm(tm):
+    """Ujednolica wpis z /tms (FriendlyName/Name, TMGuid/TmGuid) - zwraca None, jeśli brak nazwy lub GUID."""
+    name = tm.get("FriendlyName") or tm.get("Name")
+    guid = tm.get("TMGuid") or tm.get("TmGuid")
+    if not name or not guid:
+        return None
+    return {
+        "FriendlyName": name,
+        "TMGuid": guid,
+        "NumEntries": tm.get("NumEntries"),
+        "SourceLangCode": tm.get("SourceLangCode"),
+        "TargetLangCode": tm.get("TargetLangCode"),
+    }
+
+
+class TmCatalogue:
+
+    def __init__(self, tms, etag=None, fetched_at=None):
+        self.tms = tms
+        self.etag = etag
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.by_name = {}
+        self.by_casefold = {}
+        for tm in tms:
+            self.by_name.setdefault(tm["FriendlyName"], tm)
+            # Przy nazwach różniących się tylko wielkością liter wygrywa pierwsza (jak w dawnym przeszukiwaniu listy)
+            self.by_casefold.setdefault(tm["FriendlyName"].casefold(), tm)
+
+    @classmethod
+    def from_response(cls, data, etag=None):
+        return cls([tm for tm in map(_normalize_tm, data) if tm], etag)
+
+    def __len__(self):
+        return len(self.tms)
+
+    def lookup(self, name):
+        """Wpis pamięci po nazwie: najpierw dokładne dopasowanie, potem bez względu na wielkość liter."""
+        return self.by_name.get(name) or self.by_casefold.get(name.casefold())
+
+    def name_map(self):
+        """Słownik FriendlyName -> TMGuid (format dawnej funkcji get_server_tms_map)."""
+        return {name: tm["TMGuid"] for name, tm in self.by_name.items()}
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    # --- pamięć podręczna na dysku ---
+
+    @classmethod
+    def load(cls, path):
+        """Wczytuje katalog z pliku JSON. Zwraca None, gdy pliku brak lub jest nieczytelny."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CATALOGUE_VERSION:
+                return None
+            return cls(data["tms"], data.get("etag"), data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path):
+        """Zapis atomowy: plik tymczasowy + os.replace, żeby przerwany zapis nie zostawił uszkodzonego katalogu."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CATALOGUE_VERSION,
+                "etag": self.etag,
+                "fetched_at": self.fetched_at,
+                "tms": self.tms,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def fetch_tm_catalogue(server_url, token, cache_path=None, ttl=3600, verify=False, log=print):
+    """
+    Zwraca TmCatalogue: z pliku, jeśli młodszy niż `ttl` sekund, w przeciwnym razie z serwera
+    (warunkowo, z If-None-Match). Przy błędzie serwera zwraca nieaktualny katalog z pliku (jeśli jest),
+    a gdy go brak - None.
+    """
+    cached = TmCatalogue.load(cache_path) if cache_path else None
+    if cached is not None and cached.age() < ttl:
+        log(f"Lista pamięci z pliku {cache_path} ({len(cached)} TM, wiek {cached.age() / 60:.0f} min).")
+        return cached
+
+    headers = {}
+    if cached is not None and cached.etag:
+        headers["If-None-Match"] = cached.etag
+
+    start = time.perf_counter()
+    try:
+        resp = requests.get(f"{server_url}/tms", params={"authToken": token}, headers=headers, verify=verify)
+    except requests.exceptions.RequestException as e:
+        resp = None
+        detail = str(e)
+    else:
+        detail = str(resp.status_code)
+    metrics.observe("rapi_request_seconds", time.perf_counter() - start,
+                    {"endpoint": "tms", "status": resp.status_code if resp is not None else "error"})
+
+    if resp is not None and resp.status_code == 304 and cached is not None:
+        # Lista bez zmian - odnawiamy tylko czas pobrania
+        cached.fetched_at = time.time()
+        catalogue = cached
+        log(f"Lista pamięci bez zmian (304), używam pliku {cache_path}.")
+    elif resp is not None and resp.status_code == 200:
+        catalogue = TmCatalogue.from_response(resp.json(), resp.headers.get("ETag"))
+    else:
+        if cached is not None:
+            log(f"Nie udało się odświeżyć listy pamięci ({detail}) - używam nieaktualnego pliku {cache_path}.")
+        return cached
+
+    if cache_path:
+        catalogue.save(cache_path)
+    return catalogue
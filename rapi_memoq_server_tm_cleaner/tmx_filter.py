@@ -0,0 +1,193 @@
+"""
+Lokalne filtrowanie TMX: kopia eksportu bez bloków <tu> wybranych autorów (creationid), do ponownego importu.
+
+Plik jest czytany strumieniowo (expat, porcjami), a do wyniku trafiają oryginalne bajty wejścia - z pominięciem
+zakresów usuwanych <tu> (pozycje bajtów z parser.CurrentByteIndex). Nagłówek, przestrzenie nazw, kodowanie
+i formatowanie zostają bez zmian. W pamięci są tylko bajty od początku bieżącego <tu>, więc zużycie pamięci
+nie zależy od wielkości pliku. Wejście może być skompresowane (patrz loc_common/compressed_io.py).
+
+Obok wyniku powstaje manifest JSON: liczba <tu> przed i po, usunięte numery <tu> (zakresy [od, do] w pliku
+źródłowym) i liczba usuniętych <tu> na autora.
+"""
+import json
+import os
+from xml.parsers import expat
+
+from loc_common.compressed_io import open_input
+
+READ_CHUNK_SIZE = 1024 * 1024
+MANIFEST_SUFFIX = ".manifest.json"
+WHITESPACE = b" \t\r\n"
+
+
+class FilterResult:
+    """
+    Wynik filtrowania: liczba <tu>, usunięte numery <tu> jako zakresy [od, do] (włącznie, rosnąco -
+    kolejne <tu> jednego autora często leżą obok siebie) i liczby usuniętych <tu> na autora.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.removed = 0
+        self.removed_ranges = []
+        self.removed_by_user = {}
+
+    @property
+    def kept(self):
+        return self.total - self.removed
+
+    def remove(self, ordinal, user):
+        ranges = self.removed_ranges
+        if ranges and ranges[-1][1] == ordinal - 1:
+            ranges[-1][1] = ordinal
+        else:
+            ranges.append([ordinal, ordinal])
+        self.removed += 1
+        self.removed_by_user[user] = self.removed_by_user.get(user, 0) + 1
+
+    def removed_ordinals(self):
+        for first, last in self.removed_ranges:
+            yield from range(first, last + 1)
+
+
+class _TuSpanFilter:
+    """
+    Handlery expat + bufor bajtów. copied = pozycja (bezwzględna), do której wejście jest już
+    zapisane albo pominięte; buffer zaczyna się od tej pozycji.
+    """
+
+    def __init__(self, out, banned):
+        self.out = out
+        self.banned = banned
+        self.result = FilterResult()
+        self.buffer = bytearray()
+        self.copied = 0
+        self.tu_start = None      # początek otwartego <tu> (bajty od niego trzymamy w buforze)
+        self.tu_drop = False
+        self.skip_space = False   # po usuniętym <tu> pomijamy białe znaki aż do następnego tagu
+        self.parser = expat.ParserCreate()
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+
+    def position(self):
+        """Pozycja bieżącego zdarzenia w bajtach wejścia."""
+        index = self.parser.CurrentByteIndex
+        # expat zbudowany bez XML_LARGE_SIZE podaje pozycję jako 32-bitową liczbę - za 2 GB korygujemy
+        # przepełnienie (pozycja zdarzenia zawsze leży w buforze, czyli nie przed self.copied)
+        while index < self.copied:
+            index += 1 << 32
+        return index
+
+    @staticmethod
+    def _is_tu(tag):
+        return tag == "tu" or tag.rsplit(":", 1)[-1] == "tu"
+
+    def start(self, tag, attrib):
+        if self.tu_start is not None or not self._is_tu(tag):
+            return
+        self.tu_start = self.position()
+        creation_id = attrib.get("creationid")
+        user = creation_id.lower() if creation_id else None
+        self.tu_drop = user in self.banned
+        if self.tu_drop:
+            self.result.remove(self.result.total, user)
+            self.write_until(self.tu_start)
+        self.result.total += 1
+
+    def end(self, tag):
+        if self.tu_start is None or not self._is_tu(tag):
+            return
+        if self.tu_drop:
+            # Bufor zaczyna się od początku tego <tu> - pomijamy go razem z </tu>
+            end = self.tag_end(self.position(), tag)
+            del self.buffer[:end - self.copied]
+            self.copied = end
+            self.skip_space = True
+        self.tu_start = None
+        self.tu_drop = False
+
+    def tag_end(self, offset, tag):
+        """Pozycja za </tu>. Dla pustego <tu/> expat podaje pozycję już za tagiem."""
+        pos = offset - self.copied
+        closing = b"</" + tag.encode("utf-8")
+        after = pos + len(closing)
+        if self.buffer.startswith(closing, pos) and self.buffer[after:after + 1] in (b">", b" ", b"\t", b"\r", b"\n"):
+            return self.copied + self.buffer.index(b">", after) + 1
+        return offset
+
+    def write_until(self, offset):
+        """Zapisuje bajty z bufora do pozycji offset (bezwzględnej) i usuwa je z bufora."""
+        count = offset - self.copied
+        if count <= 0:
+            return
+        start = 0
+        if self.skip_space:
+            while start < count and self.buffer[start] in WHITESPACE:
+                start += 1
+            if start < count:
+                self.skip_space = False
+        if start < count:
+            self.out.write(self.buffer[start:count])
+        del self.buffer[:count]
+        self.copied = offset
+
+    def feed(self, data, final=False):
+        self.buffer += data
+        self.parser.Parse(data, final)
+        if self.tu_start is not None:
+            # Otwarty <tu> zostaje w buforze do </tu> - dopiero wtedy znamy jego koniec
+            self.write_until(self.tu_start)
+        elif final:
+            self.write_until(self.copied + len(self.buffer))
+        else:
+            # Tag na końcu porcji mógł jeszcze nie dotrzeć do handlerów (niepełny) - zostawiamy go od ostatniego '<'
+            last = self.buffer.rfind(b"<")
+            self.write_until(self.copied + (last if last != -1 else len(self.buffer)))
+
+
+def filter_tmx(src_path, out_path, banned_users):
+    """
+    Zapisuje do out_path kopię src_path bez <tu>, których creationid (bez względu na wielkość liter)
+    jest w banned_users. Zapis przez plik tymczasowy - przy błędzie nie zostaje niepełny wynik.
+    Zwraca FilterResult. Pliki w kodowaniu UTF-16 nie są obsługiwane (ValueError).
+    """
+    banned = {user.lower() for user in banned_users}
+    tmp_path = out_path + ".tmp"
+    try:
+        with open_input(src_path) as src, open(tmp_path, "wb") as out:
+            span_filter = _TuSpanFilter(out, banned)
+            first = True
+            while True:
+                data = src.read(READ_CHUNK_SIZE)
+                if first:
+                    # Pozycje tagów wyznaczamy na bajtach - kodowanie musi być zgodne z ASCII
+                    if data[:2] in (b"\xff\xfe", b"\xfe\xff") or b"\x00" in data[:4]:
+                        raise ValueError(f"Plik {src_path} jest w kodowaniu UTF-16 - filtr obsługuje tylko UTF-8.")
+                    first = False
+                span_filter.feed(data, not data)
+                if not data:
+                    break
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return span_filter.result
+
+
+def write_manifest(path, result, src_path, out_path, users):
+    """Manifest filtrowania (JSON, zapis przez plik tymczasowy)."""
+    manifest = {
+        "source": os.path.abspath(src_path),
+        "output": os.path.abspath(out_path),
+        "users": sorted({user.lower() for user in users}),
+        "total": result.total,
+        "kept": result.kept,
+        "removed": result.removed,
+        "removed_by_user": result.removed_by_user,
+        "removed_ranges": result.removed_ranges,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
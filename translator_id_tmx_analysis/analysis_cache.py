@@ -0,0 +1,109 @@
+"""
+Pamięć podręczna wyników analizy TMX (plik JSON obok raportu).
+
+- Jeden wpis na plik TMX: odcisk pliku (rozmiar, mtime w ns, opcjonalnie skrót treści)
+  + wynik analizy (translators_stats, total_segments_count).
+- Plik bez zmian jest brany z pamięci podręcznej, analizujemy tylko nowe i zmienione pliki.
+- Ze skrótem treści (with_hash=True) liczy się rozmiar i skrót, a nie mtime - ponownie skopiowany,
+  ale identyczny eksport też jest trafieniem (kosztem odczytu pliku, wciąż dużo tańszego od parsowania).
+- Błędów analizy ("ERROR: ...") nie zapisujemy - taki plik jest analizowany przy każdym uruchomieniu.
+"""
+import hashlib
+import json
+import os
+import sys
+
+# Wspólny moduł (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common.compressed_io import input_stat, split_archive_path
+
+# Zmiana formatu wpisu lub logiki zliczania = nowa wersja (stara pamięć podręczna jest wtedy pomijana)
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_fingerprint(file_path, with_hash=False):
+    """
+    Odcisk pliku: {"size", "mtime_ns"} i przy with_hash także "hash" (blake2b z treści).
+    Dla pliku z archiwum .zip - odcisk archiwum.
+    """
+    st = input_stat(file_path)
+    fingerprint = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(split_archive_path(file_path)[0], "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        fingerprint["hash"] = digest.hexdigest()
+    return fingerprint
+
+
+class AnalysisCache:
+
+    def __init__(self, entries=None, with_hash=False, options=None):
+        self.entries = entries if entries is not None else {}
+        self.with_hash = with_hash
+        # Ustawienia analizy wpływające na wynik (np. przedziały czasu) - przy innych pamięć jest pomijana
+        self.options = options or {}
+        self.hits = 0
+        self.changed = False
+
+    def _matches(self, entry, fingerprint):
+        if entry["size"] != fingerprint["size"]:
+            return False
+        if self.with_hash:
+            return entry.get("hash") is not None and entry["hash"] == fingerprint.get("hash")
+        return entry["mtime_ns"] == fingerprint["mtime_ns"]
+
+    def get(self, key, fingerprint):
+        """Wynik (translators_stats, total_segments_count) dla niezmienionego pliku albo None."""
+        entry = self.entries.get(key)
+        if entry is None or not self._matches(entry, fingerprint):
+            return None
+        if entry["mtime_ns"] != fingerprint["mtime_ns"]:
+            # Trafienie po skrócie - zapamiętujemy nowy mtime
+            entry["mtime_ns"] = fingerprint["mtime_ns"]
+            self.changed = True
+        self.hits += 1
+        return entry["stats"], entry["total"]
+
+    def put(self, key, fingerprint, result):
+        """Zapisuje wynik analizy pliku. Wyniki z błędem ("ERROR: ...") są pomijane (i usuwają stary wpis)."""
+        if isinstance(result, str):
+            if self.entries.pop(key, None) is not None:
+                self.changed = True
+            return
+        stats, total = result
+        self.entries[key] = dict(fingerprint, stats=stats, total=total)
+        self.changed = True
+
+    def prune(self, keys):
+        """Usuwa wpisy plików, których już nie ma w folderze."""
+        keys = set(keys)
+        for key in [k for k in self.entries if k not in keys]:
+            del self.entries[key]
+            self.changed = True
+
+    @classmethod
+    def load(cls, path, with_hash=False, options=None):
+        """
+        Wczytuje pamięć podręczną z pliku JSON. Brak pliku, inna wersja, inne ustawienia analizy (options)
+        lub uszkodzony plik = pusta pamięć.
+        """
+        options = options or {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION and data.get("options", {}) == options:
+                return cls(data["files"], with_hash, options)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        return cls(with_hash=with_hash, options=options)
+
+    def save(self, path):
+        """Zapis atomowy: plik tymczasowy + os.replace, żeby przerwany zapis nie zostawił uszkodzonej pamięci."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "options": self.options, "files": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.changed = False
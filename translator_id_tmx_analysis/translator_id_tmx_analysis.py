@@ -1,8 +1,77 @@
 import os
 import csv
+import datetime
+from contextlib import ExitStack
 import xml.etree.ElementTree as ET
 import re
 import gc
+import mmap
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Wspólny moduł strumieniowy TMX (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common.tmx_stream import iter_tu_records, is_utf8_compatible, xml_declaration_end
+from loc_common.compressed_io import expand_inputs, input_stat, is_plain_file, sidecar_path
+from loc_common import metrics
+from loc_common.tu_index import TuIndexCollector, index_path_for, tu_index_is_current
+from analysis_cache import AnalysisCache, file_fingerprint
+from tu_columns import TuColumnsWriter, columns_up_to_date
+from tu_duplicates import TuFingerprintCollector, count_duplicates, fingerprints_up_to_date, np
+
+# --- KONFIGURACJA ---
+
+# Liczba procesów analizujących pliki równolegle.
+# 1 = tryb sekwencyjny (jak dotychczas), 0 lub None = tyle procesów, ile rdzeni CPU.
+WORKERS = 1
+
+# Tryb kawałkowy dla pojedynczych dużych plików: plik jest dzielony na zakresy bajtów
+# na granicach <tu>, a zakresy są analizowane równolegle w osobnych procesach.
+# 1 = wyłączony. Dotyczy tylko plików nie mniejszych niż CHUNK_MIN_SIZE (w bajtach).
+CHUNK_WORKERS = 1
+CHUNK_MIN_SIZE = 256 * 1024 * 1024
+
+# Parser TMX: 'auto' (lxml, jeśli zainstalowany, w przeciwnym razie expat), 'lxml', 'expat' lub 'etree'
+TMX_BACKEND = 'auto'
+
+# Pamięć podręczna wyników (plik JSON w folderze Raport): niezmienione pliki TMX nie są analizowane ponownie.
+# None = wyłączona (domyślnie), np. 'analiza_tm_cache.json' = włączona. CACHE_HASH = True porównuje skrót treści zamiast daty modyfikacji
+# (wolniej - każdy plik jest czytany w całości - ale ponownie skopiowany identyczny eksport też jest trafieniem).
+CACHE_FILE = None
+CACHE_HASH = False
+
+# Statystyki w przedziałach czasu, liczone w tym samym przebiegu po pliku:
+# None = wyłączone, 'day' (dzień), 'week' (tydzień ISO) lub 'month' (miesiąc).
+# Wynik trafia do osobnego pliku CSV w formacie długim (wiersz = plik x tłumacz x okres).
+TIME_BUCKETS = None
+PERIODS_CSV_FILE = 'analiza_tm_okresy.csv'
+
+# Raport zbiorczy: jeden wiersz na tłumacza, zsumowany ze wszystkich plików TMX w tym samym uruchomieniu.
+# None = wyłączony (domyślnie), np. 'analiza_tm_suma.csv' = włączony.
+ROLLUP_CSV_FILE = None
+
+# Eksport kolumnowy metadanych <tu> (pliki .npy, patrz tu_columns.py) do folderu Raport/{COLUMNS_DIR}/{plik TMX}/.
+# None = wyłączony. Przy eksporcie pliki nie są dzielone na zakresy (CHUNK_WORKERS nie działa).
+COLUMNS_DIR = None
+
+# Indeks numerów <tu> dla rapi_tm_cleaner (plik {plik TMX}.tuidx obok eksportu, patrz loc_common/tu_index.py),
+# budowany w tym samym przebiegu co statystyki - cleaner uruchomiony na tych samych plikach nie czyta ich ponownie.
+# Istniejący aktualny indeks (także już przesunięty przez cleaner po usunięciach) nie jest nadpisywany.
+# Przy budowie indeksu pliki nie są dzielone na zakresy (CHUNK_WORKERS nie działa).
+BUILD_TU_INDEX = False
+
+# Duplikaty segmentów w pamięci i między pamięciami (ten sam znormalizowany tekst źródła i targetu, patrz tu_duplicates.py).
+# 64-bitowe odciski <tu> są zapisywane w tym samym przebiegu do folderu Raport/{DUPLICATES_DIR}/{plik TMX}/,
+# a po analizie wszystkich plików powstają raporty na plik i na tłumacza. None = wyłączone.
+# Raport wymaga numpy. Przy zbieraniu odcisków pliki nie są dzielone na zakresy (CHUNK_WORKERS nie działa).
+DUPLICATES_DIR = None
+DUPLICATES_CSV_FILE = 'analiza_tm_duplikaty.csv'
+DUPLICATES_USERS_CSV_FILE = 'analiza_tm_duplikaty_tlumacze.csv'
+
+# Pomiary wydajności (loc_common/metrics.py) - pliki w folderze Raport: ślad JSON Lines i snapshot w formacie
+# textfile Prometheusa (czasy plików, bajty i segmenty na sekundę, czas zapisu CSV). None = wyłączone.
+METRICS_TRACE_FILE = None
+METRICS_PROM_FILE = None
 
 # --- FUNKCJE POMOCNICZE ---
 
@@ -23,137 +92,463 @@ def format_date(date_str):
     
     return f"{year}.{month}.{day}"
 
-def get_clean_text_length(segment_element):
+# Pozostałości tagów w tekście: znak '<', potem cokolwiek co NIE jest '>', i na końcu '>'
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def get_clean_text_length(raw_text):
 #Oblicza długość tekstu, agresywnie usuwając wszelkie tagi XML/HTML
     
-    if segment_element is None:
-        return 0
-    
-    # 1. Metoda .itertext() wyciąga tekst ze wszystkich zagnieżdżonych elementów
-    #    Dzięki temu, jeśli tekst jest pocięty przez tagi <bpt>, <ept>, dostaniemy całość
-    raw_text = "".join(segment_element.itertext())
-    
+    # 1. raw_text to cały tekst <seg> ze wszystkich zagnieżdżonych elementów (jak .itertext())
+    #    Dzięki temu, jeśli tekst jest pocięty przez tagi <bpt>, <ept>, dostajemy całość
     if not raw_text:
         return 0
 
-    # 2. Używamy Regex (re.sub), aby usunąć pozostałości tagów
-    #    r'<[^>]+> - znajdź znak '<', potem cokolwiek co NIE jest '>', i na końcu '>'
-    #    Zamieniamy to na pusty ciąg znaków ('')
-    clean_text = re.sub(r'<[^>]+>', '', raw_text)
-    
-    # Zwracamy długość wyczyszczonego tekstu (liczba znaków)
-    return len(clean_text)
+    # 2. Tekst z parsera nie zawiera już elementów XML - tag może się w nim pojawić tylko jako
+    #    zwykły tekst (np. &lt;b&gt; w <bpt>). Regex uruchamiamy więc tylko, gdy w tekście jest '<'.
+    if '<' not in raw_text:
+        return len(raw_text)
+
+    # Zamieniamy tagi na pusty ciąg znaków ('') i zwracamy długość wyczyszczonego tekstu (liczba znaków)
+    return len(TAG_PATTERN.sub('', raw_text))
+
+
+# --- PRZEDZIAŁY CZASU ---
+#
+# Okres zapisujemy jako liczbę całkowitą: dzień YYYYMMDD, miesiąc YYYYMM, tydzień ISO YYYYWW.
+# 0 = brak lub niepoprawna data.
+
+def _period_key(day, mode):
+    """Klucz okresu dla daty YYYYMMDD (pierwsze 8 znaków daty TMX)."""
+    if len(day) != 8 or not day.isdigit():
+        return 0
+    if mode == 'day':
+        return int(day)
+    if mode == 'month':
+        return int(day[:6])
+    try:
+        iso_year, iso_week, _ = datetime.date(int(day[:4]), int(day[4:6]), int(day[6:])).isocalendar()
+    except ValueError:
+        return 0
+    return iso_year * 100 + iso_week
+
+def make_period_resolver(mode):
+    """
+    Funkcja data TMX -> klucz okresu (z pamięcią dla już widzianych dni - w pliku jest ich
+    najwyżej kilka tysięcy, a segmentów miliony). None, gdy przedziały są wyłączone.
+    """
+    if not mode:
+        return None
+    if mode not in ('day', 'week', 'month'):
+        raise ValueError(f"Nieznany rodzaj przedziału czasu: {mode}")
+    known = {}
+
+    def period_of(date_str):
+        day = date_str[:8] if date_str else ''
+        key = known.get(day)
+        if key is None:
+            key = known[day] = _period_key(day, mode)
+        return key
+
+    return period_of
+
+def format_period(key, mode):
+    """Klucz okresu w czytelnej postaci: 2025.07.14, 2025-W29 lub 2025.07."""
+    if not key:
+        return "-"
+    if mode == 'week':
+        return f"{key // 100}-W{key % 100:02d}"
+    text = str(key)
+    if mode == 'day':
+        return f"{text[0:4]}.{text[4:6]}.{text[6:8]}"
+    return f"{text[0:4]}.{text[4:6]}"
+
+
+class TranslatorStats:
+    """
+    Liczniki jednego tłumacza w trakcie analizy pliku. Atrybuty (__slots__) zamiast słownika
+    z kluczami tekstowymi - szybszy dostęp w pętli po segmentach. Na końcu analizy zamieniane
+    na słownik (as_dict), który trafia do CSV, pamięci podręcznej i łączenia zakresów.
+    """
+    __slots__ = ('last_creation_date', 'last_change_date', 'created_segs_count', 'changed_segs_count',
+                 'created_chars_count', 'changed_chars_count', 'periods')
+
+    def __init__(self, with_periods=False):
+        self.last_creation_date = "-"
+        self.last_change_date = "-"
+        self.created_segs_count = 0
+        self.changed_segs_count = 0
+        self.created_chars_count = 0
+        self.changed_chars_count = 0
+        # Klucz okresu -> [stworzone segmenty, zmienione segmenty, stworzone znaki, zmienione znaki]
+        self.periods = {} if with_periods else None
+
+    def as_dict(self, user_id):
+        stats = {
+            'creation_id': user_id,
+            'last_creation_date': self.last_creation_date,
+            'last_change_date': self.last_change_date,
+            'created_segs_count': self.created_segs_count,
+            'changed_segs_count': self.changed_segs_count,
+            'created_chars_count': self.created_chars_count,
+            'changed_chars_count': self.changed_chars_count
+        }
+        if self.periods is not None:
+            # Lista wierszy [okres, 4 liczniki] posortowana po okresie - zwarta i zapisywalna w JSON
+            stats['periods'] = [[key] + counters for key, counters in sorted(self.periods.items())]
+        return stats
+
+
+def _analyze_tmx_source(source, target_lang=None, backend=None, time_buckets=None, columns=None, consumers=()):
+    """
+    Właściwa pętla analizy. source to ścieżka albo obiekt plikowy (np. wycinek pliku w trybie kawałkowym).
+    target_lang można przekazać z góry, gdy nagłówka <header> nie ma w analizowanym strumieniu.
+    backend: parser z loc_common.tmx_stream (domyślnie TMX_BACKEND).
+    time_buckets: rodzaj przedziałów czasu (domyślnie TIME_BUCKETS).
+    columns: opcjonalny TuColumnsWriter - dostaje metadane każdego <tu> w tym samym przebiegu.
+    consumers: dodatkowi odbiorcy rekordów <tu> z tego samego przebiegu (np. TuIndexCollector):
+               obiekty z metodą consume(tu, header), wywoływaną dla każdego <tu> przed zliczaniem.
+               finish() wywołuje ten, kto ich przekazał - po udanej analizie całego pliku.
+    Wyjątki parsera przepuszczamy dalej - obsługuje je analyze_tmx_file_streaming.
+    """
+    stats_by_user = {} # ID tłumacza -> TranslatorStats
+    total_segments_count = 0 # Licznik wszystkich segmentów <tu> w pliku
+
+    # Przedziały czasu: utworzenie liczymy w okresie creationdate, zmianę w okresie changedate
+    period_of = make_period_resolver(time_buckets or TIME_BUCKETS)
+    with_periods = period_of is not None
+
+    # Wartości <prop> z nagłówka (m.in. targetlang) - wypełnia je iter_tu_records
+    header = {}
+
+    # Czy język <tuv> pasuje do języka docelowego - liczone raz na każdy kod języka w pliku
+    # (plik ma zwykle 2 kody, a <tuv> są setki tysięcy)
+    target_match = {}
+    target_lower = None
+    header_read = False
+
+    # Pętla idąca przez plik segment po segmencie.
+    # Dostajemy lekkie rekordy (atrybuty <tu> + języki i teksty <seg>), a nie drzewa elementów,
+    # więc pamięć nie rośnie niezależnie od backendu.
+    for tu in iter_tu_records(source, header, want_text=True, backend=backend or TMX_BACKEND):
+
+        if not header_read:
+            # Nagłówek <header> jest przed <body>, więc przy pierwszym <tu> jest już w całości wczytany.
+            # Język docelowy z nagłówka (tag <prop type="targetlang">), o ile plik go podaje
+            target_lang = header.get('targetlang', target_lang)
+            target_lower = target_lang.lower() if target_lang else None
+            header_read = True
+
+        total_segments_count += 1 # Dodajemy 1 do ogólnej liczby segmentów
+        
+        # Pobieramy atrybuty z nagłówka segmentu
+        attrib = tu.attrib
+        creation_date = attrib.get('creationdate')
+        creation_id = attrib.get('creationid')
+        change_date = attrib.get('changedate')
+        change_id = attrib.get('changeid')
+
+        # --- Szukanie tekstu targetu ---
+        target_text_len = 0
+        
+        # Przeszukujemy warianty tłumaczenia (<tuv>) wewnątrz tego <tu>.
+        # Język to xml:lang (albo samo lang, gdyby nie było namespace), tekst to treść <seg>.
+        for xml_lang, seg_text in tu.variants:
+            # Sprawdzamy, czy język tuv pasuje do języka docelowego pliku
+            is_target = target_match.get(xml_lang)
+            if is_target is None:
+                is_target = target_match[xml_lang] = bool(target_lower and xml_lang and target_lower in xml_lang.lower())
+            if is_target:
+                # Obliczamy długość czystego tekstu w targecie
+                target_text_len = get_clean_text_length(seg_text)
+                break # Przerywamy pętlę po tuv, bo znaleźliśmy target
+
+        if columns is not None:
+            columns.add(creation_id, change_id, creation_date, change_date, target_text_len)
+        for consumer in consumers:
+            consumer.consume(tu, header)
+
+        # --- LOGIKA ZLICZANIA STATYSTYK ---
+
+        # Jeśli jest creation_id, zawsze to zliczamy.
+        if creation_id:
+            stats = stats_by_user.get(creation_id)
+            if stats is None:
+                stats = stats_by_user[creation_id] = TranslatorStats(with_periods)
+            stats.created_segs_count += 1
+            stats.created_chars_count += target_text_len
+
+            if with_periods:
+                key = period_of(creation_date)
+                counters = stats.periods.get(key)
+                if counters is None:
+                    counters = stats.periods[key] = [0, 0, 0, 0]
+                counters[0] += 1
+                counters[2] += target_text_len
+            
+            # Aktualizacja daty (bierzemy "najnowszą" datę jaką znaleźliśmy dla tego usera)
+            if creation_date:
+                if stats.last_creation_date == "-" or creation_date > stats.last_creation_date:
+                    stats.last_creation_date = creation_date
+
+        # Zliczamy zmianę tylko, jeśli mamy change_id i nie jest to wykluczony przypadek.
+        # Zmiana jest fałszywa, gdy to ten sam moment co utworzenie: to samo ID oraz ten sam DZIEŃ
+        # (pierwsze 8 znaków daty - YYYYMMDD, ignorując godziny/minuty)
+        if change_id:
+            c_date_day = creation_date[:8] if creation_date else None
+            m_date_day = change_date[:8] if change_date else None
+            is_creation_only = (c_date_day == m_date_day) and (creation_id == change_id)
+
+            if not is_creation_only:
+                stats = stats_by_user.get(change_id)
+                if stats is None:
+                    stats = stats_by_user[change_id] = TranslatorStats(with_periods)
+                stats.changed_segs_count += 1
+                stats.changed_chars_count += target_text_len
+
+                if with_periods:
+                    key = period_of(change_date)
+                    counters = stats.periods.get(key)
+                    if counters is None:
+                        counters = stats.periods[key] = [0, 0, 0, 0]
+                    counters[1] += 1
+                    counters[3] += target_text_len
+
+                if change_date:
+                    if stats.last_change_date == "-" or change_date > stats.last_change_date:
+                        stats.last_change_date = change_date
+
+    # Gdy skończymy plik, zwracamy (statystyki, licznik) - statystyki jako słowniki, w kolejności pojawienia się tłumaczy
+    translators_stats = {user_id: stats.as_dict(user_id) for user_id, stats in stats_by_user.items()}
+    return translators_stats, total_segments_count
+
+
+# --- TRYB KAWAŁKOWY (JEDEN DUŻY PLIK) ---
+
+# Początek tagu <tu (ale nie <tuv) - spacja, '>' lub '/' po nazwie
+TU_START_PATTERN = re.compile(rb'<tu[\s>/]')
+ROOT_TAG_PATTERN = re.compile(rb'<((?:[\w.-]+:)?tmx)\b[^>]*>')
+BODY_TAG_PATTERN = re.compile(rb'<(?:[\w.-]+:)?body\b[^>]*>')
+
+class _ByteRangeReader:
+    """
+    Obiekt plikowy dla iterparse: prefix + bajty [start, end) pliku + suffix.
+    Dzięki temu wycinek pliku z samymi <tu> staje się poprawnym dokumentem XML.
+    Używany w bloku with - plik jest zamykany także przy błędzie parsowania.
+    """
+    def __init__(self, file_path, start, end, prefix, suffix):
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+        self._prefix = prefix
+        self._suffix = suffix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = 1 << 20
+        if self._prefix:
+            data, self._prefix = self._prefix, b''
+            return data
+        if self._remaining > 0:
+            data = self._file.read(min(size, self._remaining))
+            self._remaining -= len(data)
+            if data:
+                return data
+            self._remaining = 0
+        data, self._suffix = self._suffix, b''
+        if not data:
+            self.close()
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _read_header_target_lang(header_bytes):
+    """
+    Parsuje sam nagłówek pliku (wszystko przed pierwszym <tu>) i zwraca targetlang z <prop>.
+    """
+    target_lang = None
+    parser = ET.XMLPullParser(events=('end',))
+    parser.feed(header_bytes)
+    for event, elem in parser.read_events():
+        tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
+        if tag_name == 'prop' and elem.get('type') == 'targetlang':
+            target_lang = elem.text
+    # Nie wywołujemy close() - dokument jest celowo niedomknięty
+    return target_lang
+
+def _plan_tmx_chunks(file_path, parts):
+    """
+    Wstępne skanowanie pliku (mmap): szuka granic <tu> i dzieli ciało pliku na zakresy bajtów.
+    Zwraca (zakresy, tag korzenia, nazwa korzenia, targetlang) albo None,
+    gdy pliku nie da się bezpiecznie pociąć (kodowanie inne niż UTF-8, CDATA, komentarze,
+    instrukcje przetwarzania, DOCTYPE).
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Wycinki sklejamy na poziomie bajtów, więc obsługujemy tylko UTF-8 / ASCII
+        if not is_utf8_compatible(mm[:1024]):
+            return None
+        # Tekst "<tu" lub "<body" wewnątrz CDATA, komentarza lub instrukcji przetwarzania (<?...?> po deklaracji XML)
+        # dałby fałszywą granicę - taki plik analizujemy w całości
+        if (mm.find(b'<![CDATA[') != -1 or mm.find(b'<!--') != -1
+                or mm.find(b'<?', xml_declaration_end(mm[:1024])) != -1):
+            return None
+
+        body_match = BODY_TAG_PATTERN.search(mm)
+        if not body_match:
+            return None
+        first_tu = TU_START_PATTERN.search(mm, body_match.end())
+        body_end = mm.rfind(b'</body>')
+        if not first_tu or body_end == -1 or first_tu.start() > body_end:
+            return None
+        body_start = first_tu.start()
+
+        header_bytes = mm[:body_start]
+        # Encje z DTD w nagłówku byłyby niezdefiniowane w wycinkach (prefiks to tylko korzeń i <body>)
+        if header_bytes.find(b'<!DOCTYPE') != -1:
+            return None
+        root_match = ROOT_TAG_PATTERN.search(header_bytes)
+        if not root_match:
+            return None
+
+        # Dzielimy ciało na mniej więcej równe części i przesuwamy każdą granicę do najbliższego <tu
+        span = (body_end - body_start) // parts
+        bounds = [body_start]
+        for k in range(1, parts):
+            match = TU_START_PATTERN.search(mm, body_start + k * span, body_end)
+            if match and match.start() > bounds[-1]:
+                bounds.append(match.start())
+        bounds.append(body_end)
+
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+    return ranges, root_match.group(0), root_match.group(1), _read_header_target_lang(header_bytes)
+
+def _analyze_tmx_range(file_path, start, end, root_tag, root_name, target_lang):
+    """
+    Analiza jednego zakresu bajtów w procesie roboczym.
+    Zakres zawiera same bloki <tu>, więc opakowujemy go tagiem korzenia i <body>.
+    """
+    with _ByteRangeReader(file_path, start, end,
+                          prefix=root_tag + b'<body>',
+                          suffix=b'</body></' + root_name + b'>') as reader:
+        return _analyze_tmx_source(reader, target_lang)
+
+def merge_translator_stats(into_stats, other_stats):
+    """
+    Dołącza statystyki other_stats do into_stats (sumy liczników, najnowsze daty).
+    Nowi tłumacze trafiają na koniec słownika, więc łączenie w kolejności zakresów
+    zachowuje kolejność z analizy sekwencyjnej.
+    """
+    for user_id, other in other_stats.items():
+        stats = into_stats.get(user_id)
+        if stats is None:
+            into_stats[user_id] = dict(other)
+            if 'periods' in other:
+                into_stats[user_id]['periods'] = [list(row) for row in other['periods']]
+            continue
+
+        for key in ('created_segs_count', 'changed_segs_count', 'created_chars_count', 'changed_chars_count'):
+            stats[key] += other[key]
+
+        for key in ('last_creation_date', 'last_change_date'):
+            if other[key] != "-" and (stats[key] == "-" or other[key] > stats[key]):
+                stats[key] = other[key]
+
+        if 'periods' in other:
+            stats['periods'] = merge_periods(stats.get('periods', []), other['periods'])
+    return into_stats
 
-def analyze_tmx_file_streaming(file_path):   
+def merge_periods(rows, other_rows):
+    """Łączy dwie listy wierszy [okres, 4 liczniki] (sumy liczników w tym samym okresie), wynik posortowany po okresie."""
+    merged = {row[0]: list(row[1:]) for row in rows}
+    for key, *counters in other_rows:
+        current = merged.get(key)
+        if current is None:
+            merged[key] = list(counters)
+        else:
+            for i, value in enumerate(counters):
+                current[i] += value
+    return [[key] + counters for key, counters in sorted(merged.items())]
+
+def _analyze_tmx_file_chunked(file_path, chunk_workers):
+    """
+    Analiza jednego pliku w trybie kawałkowym. Zwraca None, jeśli pliku nie da się pociąć -
+    wtedy analyze_tmx_file_streaming przechodzi na zwykły tryb sekwencyjny.
+    """
+    plan = _plan_tmx_chunks(file_path, chunk_workers)
+    if plan is None:
+        return None
+    ranges, root_tag, root_name, target_lang = plan
+
+    translators_stats = {}
+    total_segments_count = 0
+
+    with ProcessPoolExecutor(max_workers=min(chunk_workers, len(ranges))) as executor:
+        futures = [executor.submit(_analyze_tmx_range, file_path, start, end, root_tag, root_name, target_lang)
+                   for start, end in ranges]
+        # Łączymy w kolejności zakresów (a nie ukończenia), żeby wynik był identyczny z sekwencyjnym
+        for future in futures:
+            stats, count = future.result()
+            merge_translator_stats(translators_stats, stats)
+            total_segments_count += count
+
+    return translators_stats, total_segments_count
+
+
+def columns_path_for(columns_dir, file_path):
+    """Folder eksportu kolumnowego pliku (dla pliku z archiwum: {archiwum}.zip_{plik})."""
+    return os.path.join(columns_dir, os.path.basename(sidecar_path(file_path, '')))
+
+def _file_consumers(file_path, tu_index, duplicates_dir=None):
+    """Odbiorcy <tu> dla jednego pliku (wspólny przebieg z analizą). Pusta lista = sama analiza."""
+    consumers = []
+    if tu_index and not tu_index_is_current(file_path):
+        consumers.append(TuIndexCollector(file_path, index_path_for(file_path)))
+    if duplicates_dir:
+        consumers.append(TuFingerprintCollector(columns_path_for(duplicates_dir, file_path), file_path))
+    return consumers
+
+def _finish_consumers(consumers):
+    for consumer in consumers:
+        try:
+            consumer.finish()
+        except OSError as e:
+            # Statystyki są poprawne - brak indeksu nie jest błędem analizy pliku
+            print(f"BŁĄD zapisu wyniku dodatkowego ({type(consumer).__name__}): {e}")
+
+def analyze_tmx_file_streaming(file_path, chunk_workers=1, columns_dir=None, tu_index=False, duplicates_dir=None):
 #Główna funkcja analizująca. Używa trybu strumieniowego (iterparse),
  #co pozwala przetwarzać gigantyczne pliki bez ładowania ich w całości do RAM.
+#Przy chunk_workers > 1 duży plik jest dzielony na zakresy bajtów analizowane w osobnych procesach.
+#Przy columns_dir metadane <tu> są w tym samym przebiegu zapisywane do columns_dir/{nazwa pliku}/ (zawsze bez dzielenia).
+#Przy tu_index w tym samym przebiegu powstaje indeks {plik}.tuidx dla rapi_tm_cleaner (zawsze bez dzielenia).
+#Przy duplicates_dir odciski <tu> trafiają do duplicates_dir/{nazwa pliku}/ (zawsze bez dzielenia).
 #Zwraca: (słownik ze statystykami, całkowitą liczbę segmentów).
-    
-    translators_stats = {} # Słownik, gdzie będziemy zbierać dane dla każdego ID tłumacza
-    target_lang = None     # Zmienna na kod języka docelowego (np. "en-GB")
-    total_segments_count = 0 # Licznik wszystkich segmentów <tu> w pliku
 
     try:
-        # events=('end',) oznacza: "daj mi znać, gdy parser dojdzie do końca danego tagu".
-        context = ET.iterparse(file_path, events=('end',))
-        
-        # Pętla idąca przez plik element po elemencie
-        for event, elem in context:
-            
-            # Wyciągamy samą nazwę tagu, usuwając namespace (np. {xml...}tu -> tu)
-            tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-
-            # Szukamy informacji o języku w nagłówku (tag <prop type="targetlang">)
-            if tag_name == 'prop' and elem.get('type') == 'targetlang':
-                target_lang = elem.text
-
-            # Jeśli trafiliśmy na tag <tu>, zaczynamy analizę segmentu
-            if tag_name == 'tu':
-                total_segments_count += 1 # Dodajemy 1 do ogólnej liczby segmentów
-                
-                # Pobieramy atrybuty z nagłówka segmentu
-                creation_date = elem.get('creationdate')
-                creation_id = elem.get('creationid')
-                change_date = elem.get('changedate')
-                change_id = elem.get('changeid')
-
-                # --- Szukanie tekstu targetu ---
-                target_text_len = 0
-                
-                # Przeszukujemy warianty tłumaczenia (<tuv>) wewnątrz tego <tu>
-                for tuv in elem.findall('tuv'): 
-                    # Pobieramy język danego wariantu (uwzględniając namespace XML)
-                    xml_lang = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not xml_lang:
-                        xml_lang = tuv.get('lang') # Zabezpieczenie, gdyby nie było namespace
-
-                    # Sprawdzamy, czy język tuv pasuje do języka docelowego pliku
-                    if target_lang and xml_lang and target_lang.lower() in xml_lang.lower():
-                        # Szukamy treści w segmencie (<seg>)
-                        seg = tuv.find('seg')
-                        
-                        if seg is None:
-                            for child in tuv:
-                                if child.tag.endswith('seg'):
-                                    seg = child
-                                    break
-                        
-                        # Obliczamy długość czystego tekstu w targecie
-                        target_text_len = get_clean_text_length(seg)
-                        break # Przerywamy pętlę po tuv, bo znaleźliśmy target
-
-                # --- LOGIKA ZLICZANIA STATYSTYK ---
-                
-                # Funkcja wewnętrzna, żeby nie powtarzać kodu inicjalizacji słownika
-                def init_translator(user_id):
-                    if user_id not in translators_stats:
-                        translators_stats[user_id] = {
-                            'creation_id': user_id,
-                            'last_creation_date': "-",
-                            'last_change_date': "-",
-                            'created_segs_count': 0,
-                            'changed_segs_count': 0,
-                            'created_chars_count': 0,
-                            'changed_chars_count': 0
-                        }
-
-                # Jeśli jest creation_id, zawsze to zliczamy.
-                if creation_id:
-                    init_translator(creation_id)
-                    translators_stats[creation_id]['created_segs_count'] += 1
-                    translators_stats[creation_id]['created_chars_count'] += target_text_len
-                    
-                    # Aktualizacja daty (bierzemy "najnowszą" datę jaką znaleźliśmy dla tego usera)
-                    current_c_date = translators_stats[creation_id]['last_creation_date']
-                    if creation_date:
-                        if current_c_date == "-" or creation_date > current_c_date:
-                            translators_stats[creation_id]['last_creation_date'] = creation_date
-
-                # Tutaj musimy sprawdzić, czy zmiana nie jest fałszywa (czyli czy to nie jest ten sam moment co utworzenie)
-                # Bierzemy tylko pierwsze 8 znaków (YYYYMMDD), ignorując godziny/minuty
-                c_date_day = creation_date[:8] if creation_date else None
-                m_date_day = change_date[:8] if change_date else None
-                
-                # Warunek wykluczenia: To samo ID oraz ten sam DZIEŃ
-                is_creation_only = (c_date_day == m_date_day) and (creation_id == change_id)
-
-                # Zliczamy zmianę tylko, jeśli mamy change_id i nie jest to wykluczony przypadek
-                if change_id and not is_creation_only:
-                    init_translator(change_id)
-                    translators_stats[change_id]['changed_segs_count'] += 1
-                    translators_stats[change_id]['changed_chars_count'] += target_text_len
-
-                    current_m_date = translators_stats[change_id]['last_change_date']
-                    if change_date:
-                        if current_m_date == "-" or change_date > current_m_date:
-                            translators_stats[change_id]['last_change_date'] = change_date
-
-                # --- CZYSZCZENIE PAMIĘCI ---
-                # Po przetworzeniu tagu <tu>, usuwamy go z pamięci RAM.
-                elem.clear()
-            
-        # Gdy skończymy plik, zwracamy (statystyki, licznik)
-        return translators_stats, total_segments_count
+        consumers = _file_consumers(file_path, tu_index, duplicates_dir)
+        if columns_dir or consumers:
+            # Jeden przebieg po pliku: statystyki + eksport kolumnowy + pozostali odbiorcy <tu>
+            with ExitStack() as stack:
+                columns = None
+                if columns_dir:
+                    columns = stack.enter_context(
+                        TuColumnsWriter(columns_path_for(columns_dir, file_path), file_path))
+                result = _analyze_tmx_source(file_path, columns=columns, consumers=consumers)
+            _finish_consumers(consumers)
+            return result
+
+        if _is_chunked(file_path, chunk_workers):
+            result = _analyze_tmx_file_chunked(file_path, chunk_workers)
+            if result is not None:
+                return result
+
+        return _analyze_tmx_source(file_path)
 
     except Exception as e:
         # W razie błędu zwracamy komunikat o błędzie jako string
@@ -163,111 +558,452 @@ def analyze_tmx_file_streaming(file_path):
         gc.collect()
 
 
+# --- ZAPIS WYNIKÓW ---
+
+CSV_HEADERS = [
+    'Nazwa pliku', 
+    'Calkowita ilosc segmentow',
+    'ID Tlumacza', 
+    'Data ost. segmentu', 
+    'Data ost. zmiany', 
+    'Ilosc stworzonych segmentow', 
+    'Ilosc zmienionych segmentow', 
+    'Ilosc stworzonych znakow', 
+    'Ilosc zmienionych znakow', 
+    'Status'
+]
+
+def build_csv_rows(filename, result):
+    """
+    Zamienia wynik analizy jednego pliku na listę wierszy CSV.
+    """
+    # Sprawdzamy, czy funkcja zwróciła błąd (string) czy dane
+    if isinstance(result, str) and result.startswith("ERROR"):
+        # Wiersz z informacją o błędzie
+        return [[filename, "-", "-", "-", "-", "-", "-", "-", "-", result]]
+
+    # Rozpakowujemy wynik na dwie zmienne
+    stats_dict, total_count = result
+
+    if not stats_dict:
+        # Przypadek pustego pliku lub braku ID
+        return [[filename, total_count, "BRAK DANYCH", "-", "-", "-", "-", "-", "-", "BRAK ID"]]
+
+    rows = []
+    # Iterujemy po każdym tłumaczu znalezionym w pliku
+    for user_id, stats in stats_dict.items():
+        rows.append([
+            filename,
+            total_count, # Wspólna wartość dla wszystkich tłumaczy w tym pliku
+            stats['creation_id'],
+            format_date(stats['last_creation_date']),
+            format_date(stats['last_change_date']),
+            stats['created_segs_count'],
+            stats['changed_segs_count'],
+            stats['created_chars_count'],
+            stats['changed_chars_count'],
+            "OK"
+        ])
+    return rows
+
+PERIODS_CSV_HEADERS = [
+    'Nazwa pliku',
+    'ID Tlumacza',
+    'Okres',
+    'Ilosc stworzonych segmentow',
+    'Ilosc zmienionych segmentow',
+    'Ilosc stworzonych znakow',
+    'Ilosc zmienionych znakow'
+]
+
+def build_period_rows(filename, result, mode):
+    """
+    Wiersze CSV w formacie długim (plik x tłumacz x okres) dla przedziałów czasu.
+    Pliki z błędem pomijamy - błąd jest już w głównym raporcie.
+    """
+    if isinstance(result, str):
+        return []
+
+    stats_dict, _ = result
+    rows = []
+    for user_id, stats in stats_dict.items():
+        for key, created_segs, changed_segs, created_chars, changed_chars in stats.get('periods', ()):
+            rows.append([filename, user_id, format_period(key, mode),
+                         created_segs, changed_segs, created_chars, changed_chars])
+    return rows
+
+# --- SUMA ZE WSZYSTKICH PLIKÓW ---
+
+class StatsRollup:
+    """
+    Statystyki tłumaczy zsumowane ze wszystkich plików. Wyniki plików dokładamy po kolei (add)
+    tym samym łączeniem co zakresy trybu kawałkowego (merge_translator_stats: sumy liczników,
+    najnowsze daty) - kolejność i źródło wyniku (analiza, proces roboczy, pamięć podręczna) nie mają znaczenia.
+    """
+
+    def __init__(self):
+        self.stats = {}           # ID tłumacza -> słownik statystyk (jak w wyniku pliku)
+        self.file_counts = {}     # ID tłumacza -> liczba plików, w których występuje
+        self.total_segments = 0
+        self.files = 0
+        self.errors = 0
+
+    def add(self, result):
+        """Dokłada wynik jednego pliku. Pliki z błędem są tylko liczone."""
+        if isinstance(result, str):
+            self.errors += 1
+            return
+        stats_dict, total_count = result
+        merge_translator_stats(self.stats, stats_dict)
+        for user_id in stats_dict:
+            self.file_counts[user_id] = self.file_counts.get(user_id, 0) + 1
+        self.total_segments += total_count
+        self.files += 1
+
+ROLLUP_CSV_HEADERS = [
+    'ID Tlumacza',
+    'Ilosc plikow',
+    'Data ost. segmentu',
+    'Data ost. zmiany',
+    'Ilosc stworzonych segmentow',
+    'Ilosc zmienionych segmentow',
+    'Ilosc stworzonych znakow',
+    'Ilosc zmienionych znakow'
+]
+
+def build_rollup_rows(rollup):
+    """Wiersze raportu zbiorczego - jeden na tłumacza, alfabetycznie po ID."""
+    rows = []
+    for user_id in sorted(rollup.stats, key=lambda u: (u.casefold(), u)):
+        stats = rollup.stats[user_id]
+        rows.append([
+            user_id,
+            rollup.file_counts[user_id],
+            format_date(stats['last_creation_date']),
+            format_date(stats['last_change_date']),
+            stats['created_segs_count'],
+            stats['changed_segs_count'],
+            stats['created_chars_count'],
+            stats['changed_chars_count']
+        ])
+    return rows
+
+DUPLICATES_CSV_HEADERS = [
+    'Nazwa pliku',
+    'Calkowita ilosc segmentow',
+    'Duplikaty w pliku',
+    'Duplikaty z innych plikow',
+    'Unikalne segmenty'
+]
+
+DUPLICATES_USERS_CSV_HEADERS = ['ID Tlumacza'] + DUPLICATES_CSV_HEADERS[1:]
+
+def write_duplicate_reports(output_dir, duplicate_files):
+    """
+    Raporty duplikatów z odcisków zebranych w przebiegu analizy. duplicate_files: pary (nazwa pliku, folder odcisków)
+    w kolejności raportu. Liczby w wierszu sumują się do liczby segmentów (patrz tu_duplicates.py).
+    """
+    report = count_duplicates([folder for _, folder in duplicate_files])
+    files_path = os.path.join(output_dir, DUPLICATES_CSV_FILE)
+    users_path = os.path.join(output_dir, DUPLICATES_USERS_CSV_FILE)
+    with metrics.timer('csv_write_seconds', {'report': 'duplicates'}):
+        with open(files_path, mode='w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(DUPLICATES_CSV_HEADERS)
+            writer.writerows([filename] + counts for (filename, _), counts in zip(duplicate_files, report.files))
+        with open(users_path, mode='w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(DUPLICATES_USERS_CSV_HEADERS)
+            for user_id in sorted(report.users, key=lambda u: (u.casefold(), u)):
+                writer.writerow([user_id or '-'] + report.users[user_id])
+    repeated = report.total - report.distinct
+    share = repeated / report.total * 100 if report.total else 0
+    print(f"Raport duplikatów: {files_path}, {users_path} "
+          f"({report.total} segmentów, powtórzone: {repeated} = {share:.1f}%)")
+
+# --- PRZETWARZANIE RÓWNOLEGŁE ---
+
+def _is_chunked(full_path, chunk_workers):
+    """Czy plik kwalifikuje się do trybu kawałkowego (CHUNK_WORKERS / CHUNK_MIN_SIZE)."""
+    try:
+        # Plików skompresowanych nie da się ciąć na zakresy bajtów - czytamy je jednym strumieniem
+        return chunk_workers > 1 and is_plain_file(full_path) and os.path.getsize(full_path) >= CHUNK_MIN_SIZE
+    except OSError:
+        return False
+
+def _cached_results(paths, tmx_files, cache, columns_dir=None, tu_index=False, duplicates_dir=None):
+    """
+    Sprawdza pamięć podręczną dla każdego pliku. Zwraca (wyniki, odciski):
+    wynik z pamięci albo None (plik do analizy) oraz odcisk pliku (None, gdy nie da się go odczytać).
+    Przy eksporcie kolumnowym (budowie indeksu <tu>, zbieraniu odcisków) plik bez aktualnego eksportu (indeksu, odcisków)
+    jest analizowany mimo wyniku w pamięci.
+    """
+    results = [None] * len(paths)
+    fingerprints = [None] * len(paths)
+    if cache is None:
+        return results, fingerprints
+
+    for i, (filename, full_path) in enumerate(zip(tmx_files, paths)):
+        try:
+            fingerprints[i] = file_fingerprint(full_path, cache.with_hash)
+        except OSError:
+            # Błąd odczytu zgłosi sama analiza
+            continue
+        if columns_dir and not columns_up_to_date(columns_path_for(columns_dir, full_path), fingerprints[i]):
+            continue
+        if tu_index and not tu_index_is_current(full_path):
+            continue
+        if duplicates_dir and not fingerprints_up_to_date(columns_path_for(duplicates_dir, full_path), fingerprints[i]):
+            continue
+        results[i] = cache.get(filename, fingerprints[i])
+    return results, fingerprints
+
+def record_file_metrics(full_path, result):
+    """Liczniki przeanalizowanego pliku (loc_common.metrics): plik (ok / błąd), segmenty, bajty wejścia."""
+    if not metrics.enabled():
+        return
+    if isinstance(result, str):
+        metrics.inc('tmx_files_total', labels={'source': 'analysis', 'status': 'error'})
+        return
+    metrics.inc('tmx_files_total', labels={'source': 'analysis', 'status': 'ok'})
+    metrics.inc('tmx_segments_total', result[1])
+    try:
+        metrics.inc('tmx_input_bytes_total', input_stat(full_path).st_size)
+    except OSError:
+        pass
+
+def _analyze_in_main(filename, full_path, chunk_workers, columns_dir, tu_index, duplicates_dir):
+    """Analiza pliku w procesie głównym z pomiarem czasu (w procesach roboczych pomiary są wyłączone)."""
+    with metrics.timer('tmx_file_seconds', file=filename) as file_timer:
+        result = analyze_tmx_file_streaming(full_path, chunk_workers, columns_dir, tu_index, duplicates_dir)
+        if not isinstance(result, str):
+            file_timer.set(segments=result[1])
+    return result
+
+def iter_analysis_results(input_path, tmx_files, workers, chunk_workers=1, cache=None, columns_dir=None, tu_index=False,
+                          duplicates_dir=None):
+    """
+    Generator zwracający pary (nazwa pliku, wynik analizy) zawsze w kolejności listy tmx_files.
+    Przy workers > 1 pliki są analizowane jednocześnie w puli procesów,
+    ale wyniki oddajemy po kolei, żeby CSV był deterministyczny.
+    Duże pliki (tryb kawałkowy) analizujemy w procesie głównym, gdy przyjdzie ich kolej -
+    mają własną pulę procesów dla zakresów bajtów.
+    cache (AnalysisCache): niezmienione pliki są brane z pamięci podręcznej, nowe wyniki są do niej dopisywane.
+    columns_dir: folder eksportu kolumnowego (patrz analyze_tmx_file_streaming) - wyłącza tryb kawałkowy.
+    tu_index: budowa indeksu <tu> dla rapi_tm_cleaner w tym samym przebiegu - wyłącza tryb kawałkowy.
+    duplicates_dir: folder odcisków <tu> do raportu duplikatów (patrz tu_duplicates.py) - wyłącza tryb kawałkowy.
+    """
+    if columns_dir or tu_index or duplicates_dir:
+        chunk_workers = 1
+    paths = [os.path.join(input_path, filename) for filename in tmx_files]
+    cached, fingerprints = _cached_results(paths, tmx_files, cache, columns_dir, tu_index, duplicates_dir)
+
+    def remember(filename, full_path, fingerprint, result):
+        record_file_metrics(full_path, result)
+        if cache is not None and fingerprint is not None:
+            cache.put(filename, fingerprint, result)
+        return result
+
+    def from_cache(result):
+        metrics.inc('tmx_files_total', labels={'source': 'cache', 'status': 'ok'})
+        return result
+
+    if workers == 1:
+        for filename, full_path, result, fingerprint in zip(tmx_files, paths, cached, fingerprints):
+            if result is None:
+                result = remember(filename, full_path, fingerprint,
+                                  _analyze_in_main(filename, full_path, chunk_workers, columns_dir, tu_index,
+                                                   duplicates_dir))
+            else:
+                from_cache(result)
+            yield filename, result
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Zlecamy wszystkie pliki od razu, a odbieramy wyniki w kolejności zleceń
+        futures = [None if result is not None or _is_chunked(full_path, chunk_workers)
+                   else executor.submit(analyze_tmx_file_streaming, full_path, 1, columns_dir, tu_index, duplicates_dir)
+                   for full_path, result in zip(paths, cached)]
+
+        for filename, full_path, future, result, fingerprint in zip(tmx_files, paths, futures, cached, fingerprints):
+            if result is not None:
+                yield filename, from_cache(result)
+                continue
+            if future is None:
+                yield filename, remember(filename, full_path, fingerprint,
+                                         _analyze_in_main(filename, full_path, chunk_workers, columns_dir, tu_index,
+                                                          duplicates_dir))
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                # Np. proces roboczy padł (brak pamięci) - raportujemy jak każdy inny błąd pliku
+                result = f"ERROR: {str(e)}"
+            yield filename, remember(filename, full_path, fingerprint, result)
+
+
 # --- GŁÓWNA CZĘŚĆ SKRYPTU ---
 
-# Pobieramy ścieżkę do folderu, w którym znajduje się plik skryptu (.py)
-input_path = os.path.dirname(os.path.abspath(__file__))
-
-print("========================================")
-print(f"Folder roboczy: {input_path}")
-print("========================================")
-
-#Szukanie plików
-try:
-    # Pobieramy listę wszystkich plików w folderze
-    all_files = os.listdir(input_path)
-    # Filtrujemy listę, zostawiając tylko te z końcówką .tmx
-    tmx_files = [f for f in all_files if f.lower().endswith('.tmx')]
-    total_files = len(tmx_files)
-    print(f"Znaleziono pliki .tmx: {total_files}")
-except Exception as e:
-    print(f"Błąd krytyczny przy czytaniu folderu: {e}")
-    tmx_files = []
-
-#Przetwarzanie
-if tmx_files:
+def main():
+    # Pobieramy ścieżkę do folderu, w którym znajduje się plik skryptu (.py)
+    input_path = os.path.dirname(os.path.abspath(__file__))
+
+    print("========================================")
+    print(f"Folder roboczy: {input_path}")
+    print("========================================")
+
+    #Szukanie plików
+    try:
+        # Pobieramy listę wszystkich plików w folderze
+        all_files = os.listdir(input_path)
+        # Filtrujemy listę, zostawiając tylko te z końcówką .tmx (posortowane - stała kolejność w raporcie).
+        # Pliki .tmx.gz/.tmx.xz/.tmx.bz2 i pliki .tmx z archiwów .zip (nazwa: archiwum.zip/plik.tmx)
+        # są czytane strumieniowo, bez rozpakowywania na dysk.
+        tmx_files = expand_inputs(input_path, sorted(all_files), '.tmx')
+        total_files = len(tmx_files)
+        print(f"Znaleziono pliki .tmx: {total_files}")
+    except Exception as e:
+        print(f"Błąd krytyczny przy czytaniu folderu: {e}")
+        tmx_files = []
+
+    if not tmx_files:
+        print("Nie mam czego przetwarzać. Brak plików .tmx w folderze.")
+        return
+
+    workers = WORKERS or os.cpu_count() or 1
+    workers = min(workers, total_files)
+
     # Tworzymy folder na wyniki
     output_dir = os.path.join(input_path, "Raport")
     os.makedirs(output_dir, exist_ok=True)
     csv_path = os.path.join(output_dir, "analiza_tm_wyniki.csv")
-    
+
     print(f"Tworzę plik csv: {csv_path}")
-    
+    if workers > 1:
+        print(f"Tryb równoległy: {workers} procesów")
+
+    columns_dir = None
+    if COLUMNS_DIR:
+        columns_dir = os.path.join(output_dir, COLUMNS_DIR)
+        os.makedirs(columns_dir, exist_ok=True)
+        print(f"Eksport kolumnowy: {columns_dir}")
+    if BUILD_TU_INDEX:
+        print("Indeks <tu> dla rapi_tm_cleaner: pliki .tuidx obok plików TMX")
+    duplicates_dir = None
+    if DUPLICATES_DIR:
+        if np is None:
+            print("BŁĄD: raport duplikatów wymaga pakietu numpy (pip install numpy) - pomijam.")
+        else:
+            duplicates_dir = os.path.join(output_dir, DUPLICATES_DIR)
+            os.makedirs(duplicates_dir, exist_ok=True)
+            print(f"Odciski segmentów (duplikaty): {duplicates_dir}")
+    if metrics.configure('translator_id_tmx_analysis',
+                         os.path.join(output_dir, METRICS_TRACE_FILE) if METRICS_TRACE_FILE else None,
+                         os.path.join(output_dir, METRICS_PROM_FILE) if METRICS_PROM_FILE else None):
+        print("Pomiary wydajności: włączone (loc_common/metrics.py)")
+        metrics.event('start', files=total_files, workers=workers, chunk_workers=CHUNK_WORKERS, backend=TMX_BACKEND)
+
+    cache = None
+    if CACHE_FILE:
+        cache_path = os.path.join(output_dir, CACHE_FILE)
+        # Wyniki z przedziałami czasu i bez nich nie są wymienne - ustawienie jest częścią pamięci podręcznej
+        cache = AnalysisCache.load(cache_path, CACHE_HASH, {'time_buckets': TIME_BUCKETS})
+        # Pliki usunięte z folderu nie są już potrzebne w pamięci podręcznej
+        cache.prune(tmx_files)
+
     try:
         # Otwieramy plik CSV do zapisu.
         # 'utf-8-sig'
         # newline='' zapobiega pustym liniom w Windows.
-        with open(csv_path, mode='w', newline='', encoding='utf-8-sig') as f_out:
+        with ExitStack() as files:
+            f_out = files.enter_context(open(csv_path, mode='w', newline='', encoding='utf-8-sig'))
             writer = csv.writer(f_out, delimiter=';')
-            
-            # Definiujemy i zapisujemy nagłówki kolumn
-            headers = [
-                'Nazwa pliku', 
-                'Calkowita ilosc segmentow',
-                'ID Tlumacza', 
-                'Data ost. segmentu', 
-                'Data ost. zmiany', 
-                'Ilosc stworzonych segmentow', 
-                'Ilosc zmienionych segmentow', 
-                'Ilosc stworzonych znakow', 
-                'Ilosc zmienionych znakow', 
-                'Status'
-            ]
-            writer.writerow(headers)
-            
+
+            # Zapisujemy nagłówki kolumn
+            writer.writerow(CSV_HEADERS)
+
+            # Drugi plik CSV ze statystykami w przedziałach czasu (tylko przy TIME_BUCKETS)
+            periods_writer = None
+            if TIME_BUCKETS:
+                periods_path = os.path.join(output_dir, PERIODS_CSV_FILE)
+                f_periods = files.enter_context(open(periods_path, mode='w', newline='', encoding='utf-8-sig'))
+                periods_writer = csv.writer(f_periods, delimiter=';')
+                periods_writer.writerow(PERIODS_CSV_HEADERS)
+                print(f"Statystyki w okresach ({TIME_BUCKETS}): {periods_path}")
+
             count = 0
-            
-            # Pętla po każdym znalezionym pliku TMX
-            for filename in tmx_files:
+            # Suma ze wszystkich plików liczona w locie - bez ponownego czytania CSV
+            rollup = StatsRollup() if ROLLUP_CSV_FILE else None
+            # Pliki z aktualnymi odciskami do raportu duplikatów (bez plików z błędem)
+            duplicate_files = []
+
+            # Pętla po wynikach kolejnych plików TMX (w kolejności listy plików)
+            for filename, result in iter_analysis_results(input_path, tmx_files, workers, CHUNK_WORKERS, cache,
+                                                          columns_dir, BUILD_TU_INDEX, duplicates_dir):
                 count += 1
-                full_path = os.path.join(input_path, filename)
-                
-                # Wywołujemy funkcję analizującą dla pojedynczego pliku
-                result = analyze_tmx_file_streaming(full_path)
-                
-                status_msg = "OK"
-
-                # Sprawdzamy, czy funkcja zwróciła błąd (string) czy dane
-                if isinstance(result, str) and result.startswith("ERROR"):
-                    status_msg = result
-                    # Zapisujemy wiersz z informacją o błędzie
-                    writer.writerow([filename, "-", "-", "-", "-", "-", "-", "-", "-", status_msg])
-                
-                else:
-                    # Rozpakowujemy wynik na dwie zmienne
-                    stats_dict, total_count = result
-                    
-                    if stats_dict:
-                        # Iterujemy po każdym tłumaczu znalezionym w pliku i zapisujemy wiersz
-                        for user_id, stats in stats_dict.items():
-                            writer.writerow([
-                                filename,
-                                total_count, # Wspólna wartość dla wszystkich tłumaczy w tym pliku
-                                stats['creation_id'],
-                                format_date(stats['last_creation_date']),
-                                format_date(stats['last_change_date']),
-                                stats['created_segs_count'],
-                                stats['changed_segs_count'],
-                                stats['created_chars_count'],
-                                stats['changed_chars_count'],
-                                status_msg
-                            ])
-                    else:
-                        # Przypadek pustego pliku lub braku ID
-                        writer.writerow([filename, total_count, "BRAK DANYCH", "-", "-", "-", "-", "-", "-", "BRAK ID"])
+                rows = build_csv_rows(filename, result)
+                with metrics.timer('csv_write_seconds', {'report': 'files'}):
+                    writer.writerows(rows)
+                metrics.inc('csv_rows_total', len(rows), {'report': 'files'})
+                if periods_writer is not None:
+                    rows = build_period_rows(filename, result, TIME_BUCKETS)
+                    with metrics.timer('csv_write_seconds', {'report': 'periods'}):
+                        periods_writer.writerows(rows)
+                    metrics.inc('csv_rows_total', len(rows), {'report': 'periods'})
+                if rollup is not None:
+                    rollup.add(result)
+                if duplicates_dir and not isinstance(result, str):
+                    folder = columns_path_for(duplicates_dir, os.path.join(input_path, filename))
+                    if os.path.exists(os.path.join(folder, 'meta.json')):
+                        duplicate_files.append((filename, folder))
 
                 # Wypisujemy postęp w konsoli
                 print(f"[{count}/{total_files}] Analiza: {filename}")
 
+            if rollup is not None:
+                rollup_path = os.path.join(output_dir, ROLLUP_CSV_FILE)
+                with metrics.timer('csv_write_seconds', {'report': 'rollup'}), \
+                        open(rollup_path, mode='w', newline='', encoding='utf-8-sig') as f_rollup:
+                    rollup_writer = csv.writer(f_rollup, delimiter=';')
+                    rollup_writer.writerow(ROLLUP_CSV_HEADERS)
+                    rollup_writer.writerows(build_rollup_rows(rollup))
+                print(f"Raport zbiorczy: {rollup_path} ({len(rollup.stats)} tłumaczy, "
+                      f"{rollup.total_segments} segmentów w {rollup.files} plikach, błędy: {rollup.errors})")
+
+            if duplicates_dir:
+                try:
+                    write_duplicate_reports(output_dir, duplicate_files)
+                except (OSError, ValueError) as e:
+                    print(f"BŁĄD raportu duplikatów: {e}")
+
             print("========================================")
             print(f"SUKCES! Przetworzono {count} plików.")
-            
+            if cache is not None:
+                print(f"Z pamięci podręcznej: {cache.hits}, przeanalizowane: {count - cache.hits}")
+
     except Exception as e:
         print(f"BŁĄD zapisu pliku CSV (zamknij Excela!): {e}")
+    finally:
+        # Zapisujemy także po przerwaniu - wyniki już przeanalizowanych plików nie przepadają
+        if cache is not None and cache.changed:
+            try:
+                cache.save(cache_path)
+            except OSError as e:
+                print(f"BŁĄD zapisu pamięci podręcznej: {e}")
+        if metrics.enabled():
+            print("Pomiary wydajności:")
+            for line in metrics.summary_lines():
+                print(f"  {line}")
+            try:
+                metrics.finish()
+            except OSError as e:
+                print(f"BŁĄD zapisu pomiarów: {e}")
+
 
-else:
-    print("Nie mam czego przetwarzać. Brak plików .tmx w folderze.")
+if __name__ == "__main__":
+    # Ochrona __main__ jest wymagana przez pulę procesów (Windows uruchamia moduł od nowa w każdym procesie)
+    main()
 
-# Zatrzymanie okna konsoli po zakończeniu
-print("========================================")
-input("Naciśnij ENTER, aby zakończyć")
+    # Zatrzymanie okna konsoli po zakończeniu
+    print("========================================")
+    input("Naciśnij ENTER, aby zakończyć")
@@ -0,0 +1,338 @@
+"""
+Kolumnowy eksport metadanych <tu> (pliki .npy) i zapytania wektorowe w NumPy.
+
+Eksport (TuColumnsWriter) działa w tym samym przebiegu co analiza i używa tylko biblioteki standardowej
+(moduł array + ręcznie zapisany nagłówek .npy) - analiza nadal nie wymaga NumPy.
+Jeden folder na plik TMX, wiersz = <tu> w kolejności z pliku (numer wiersza = numer <tu>, ID wpisu w cleanerze):
+
+  creation_user.npy  int32  - indeks ID tłumacza (creationid) w users.json, -1 = brak
+  change_user.npy    int32  - indeks changeid w users.json, -1 = brak
+  creation_date.npy  int64  - creationdate w sekundach od 1970-01-01 UTC, -1 = brak lub niepoprawna data
+  change_date.npy    int64  - changedate, jak wyżej
+  target_chars.npy   int32  - długość czystego tekstu targetu (jak w raporcie)
+  users.json                - słownik: lista ID tłumaczy (indeks = wartość w kolumnach *_user)
+  meta.json                 - plik źródłowy, odcisk (rozmiar, mtime), liczba wierszy
+
+Zapytania (TuColumns) wymagają NumPy; kolumny są otwierane jako mapowane w pamięci (mmap_mode='r').
+"""
+import calendar
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+from array import array
+
+# Wspólny moduł (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common.compressed_io import input_stat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COLUMNS_VERSION = 1
+NO_USER = -1
+NO_DATE = -1
+# Wiersze buforowane w pamięci przed dopisaniem do pliku .npy
+BUFFER_ROWS = 65536
+
+# Nazwa kolumny -> (kod typu modułu array, typ NumPy w nagłówku .npy)
+COLUMNS = {
+    'creation_user': ('i', '<i4'),
+    'change_user': ('i', '<i4'),
+    'creation_date': ('q', '<i8'),
+    'change_date': ('q', '<i8'),
+    'target_chars': ('i', '<i4'),
+}
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Stała długość nagłówka .npy (wielokrotność 64) - liczba wierszy jest wpisywana dopiero przy zamknięciu
+NPY_HEADER_SIZE = 128
+
+
+def _npy_header(descr, rows):
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({rows},), }}"
+    header = header.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class NpyColumnWriter:
+    """Jednowymiarowa kolumna zapisywana strumieniowo do pliku .npy (bez NumPy)."""
+
+    def __init__(self, path, typecode, descr):
+        self.descr = descr
+        self.buffer = array(typecode)
+        self.rows = 0
+        self.file = open(path, 'wb')
+        self.file.write(_npy_header(descr, 0))
+
+    def flush(self):
+        if self.buffer:
+            if sys.byteorder != 'little':
+                self.buffer.byteswap()
+            self.buffer.tofile(self.file)
+            self.rows += len(self.buffer)
+            del self.buffer[:]
+
+    def close(self):
+        self.flush()
+        # Nagłówek z ostateczną liczbą wierszy (ta sama długość, więc nadpisujemy go w miejscu)
+        self.file.seek(0)
+        self.file.write(_npy_header(self.descr, self.rows))
+        self.file.close()
+
+
+def _day_epoch(day):
+    """Data YYYYMMDD -> sekundy od 1970-01-01 UTC (północ) albo NO_DATE."""
+    if len(day) != 8 or not day.isdigit():
+        return NO_DATE
+    try:
+        return calendar.timegm((int(day[:4]), int(day[4:6]), int(day[6:]), 0, 0, 0))
+    except (ValueError, OverflowError):
+        return NO_DATE
+
+
+def epoch_to_tmx_date(value):
+    """Sekundy UTC -> data w formacie TMX (20250714T160952Z); NO_DATE -> "-" (jak w statystykach analizy)."""
+    if value < 0:
+        return "-"
+    return time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(int(value)))
+
+
+class TuColumnsWriter:
+    """
+    Zbiera kolumny dla kolejnych <tu> (add) i zapisuje je do folderu out_dir.
+    Pliki powstają w folderze tymczasowym; przy udanym zakończeniu (close) zastępuje on poprzedni eksport,
+    przy błędzie (abort / wyjątek w bloku with) jest usuwany.
+    """
+
+    def __init__(self, out_dir, source_path):
+        self.out_dir = out_dir
+        self.tmp_dir = out_dir + '.tmp'
+        self.source_path = source_path
+        st = input_stat(source_path)
+        self.fingerprint = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.columns = {name: NpyColumnWriter(os.path.join(self.tmp_dir, name + '.npy'), typecode, descr)
+                        for name, (typecode, descr) in COLUMNS.items()}
+        # Bufory kolumn trzymamy pod ręką - add() jest wołane dla każdego <tu>
+        self._creation_user = self.columns['creation_user'].buffer
+        self._change_user = self.columns['change_user'].buffer
+        self._creation_date = self.columns['creation_date'].buffer
+        self._change_date = self.columns['change_date'].buffer
+        self._target_chars = self.columns['target_chars'].buffer
+        self.users = []
+        self.user_index = {}
+        self.days = {}
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _user(self, user_id):
+        if not user_id:
+            return NO_USER
+        index = self.user_index.get(user_id)
+        if index is None:
+            index = self.user_index[user_id] = len(self.users)
+            self.users.append(user_id)
+        return index
+
+    def _epoch(self, date_str):
+        """Data TMX (YYYYMMDDThhmmssZ) -> sekundy UTC. Część dzienna liczona raz na każdy dzień w pliku."""
+        if not date_str:
+            return NO_DATE
+        day = date_str[:8]
+        base = self.days.get(day)
+        if base is None:
+            base = self.days[day] = _day_epoch(day)
+        if base == NO_DATE:
+            return NO_DATE
+        clock = date_str[9:15]
+        if len(clock) == 6 and clock.isdigit():
+            return base + int(clock[:2]) * 3600 + int(clock[2:4]) * 60 + int(clock[4:])
+        return base
+
+    def add(self, creation_id, change_id, creation_date, change_date, target_chars):
+        self._creation_user.append(self._user(creation_id))
+        self._change_user.append(self._user(change_id))
+        self._creation_date.append(self._epoch(creation_date))
+        self._change_date.append(self._epoch(change_date))
+        self._target_chars.append(target_chars)
+        self.pending += 1
+        if self.pending >= BUFFER_ROWS:
+            for column in self.columns.values():
+                column.flush()
+            self.pending = 0
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+        rows = self.columns['target_chars'].rows
+        with open(os.path.join(self.tmp_dir, 'users.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.users, f, ensure_ascii=False)
+        with open(os.path.join(self.tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(self.fingerprint, version=COLUMNS_VERSION, source=os.path.basename(self.source_path),
+                           rows=rows), f, ensure_ascii=False)
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.out_dir)
+
+    def abort(self):
+        for column in self.columns.values():
+            column.file.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def columns_up_to_date(out_dir, fingerprint):
+    """Czy folder eksportu istnieje i powstał z pliku o podanym odcisku ({"size", "mtime_ns"})."""
+    try:
+        with open(os.path.join(out_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (meta.get('version') == COLUMNS_VERSION and meta.get('size') == fingerprint['size']
+            and meta.get('mtime_ns') == fingerprint['mtime_ns'])
+
+
+# --- ZAPYTANIA (NumPy) ---
+
+class TuColumns:
+    """
+    Kolumny jednego pliku TMX wczytane z folderu eksportu (mapowane w pamięci).
+
+    Przykład:
+        cols = TuColumns.load('Raport/kolumny/pamiec.tmx')
+        cols.changed_chars('anna', after='20250101')     # znaki zmienione przez anna od 2025-01-01
+        cols.translator_stats()                          # statystyki jak w raporcie, bez parsowania TMX
+    """
+
+    def __init__(self, columns, users, meta):
+        self.columns = columns
+        self.users = users
+        self.meta = meta
+        self.user_index = {user_id: i for i, user_id in enumerate(users)}
+        self._changed_mask = None
+
+    @classmethod
+    def load(cls, folder, mmap=True):
+        if np is None:
+            raise ImportError("Zapytania na kolumnach wymagają pakietu numpy (pip install numpy)")
+        with open(os.path.join(folder, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != COLUMNS_VERSION:
+            raise ValueError(f"Nieobsługiwana wersja eksportu kolumn: {meta.get('version')}")
+        with open(os.path.join(folder, 'users.json'), encoding='utf-8') as f:
+            users = json.load(f)
+        columns = {name: np.load(os.path.join(folder, name + '.npy'), mmap_mode='r' if mmap else None)
+                   for name in COLUMNS}
+        return cls(columns, users, meta)
+
+    def __len__(self):
+        return len(self.columns['target_chars'])
+
+    def __getattr__(self, name):
+        # cols.creation_user, cols.change_date... - bezpośredni dostęp do kolumn
+        columns = self.__dict__.get('columns')
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def is_stale(self, tmx_path):
+        """Czy plik TMX zmienił się od eksportu (rozmiar lub mtime)."""
+        st = input_stat(tmx_path)
+        return st.st_size != self.meta['size'] or st.st_mtime_ns != self.meta['mtime_ns']
+
+    @staticmethod
+    def to_epoch(date):
+        """Data jako liczba (sekundy UTC) albo tekst YYYYMMDD / YYYYMMDDThhmmssZ."""
+        if isinstance(date, str):
+            base = _day_epoch(date[:8])
+            clock = date[9:15]
+            if base != NO_DATE and len(clock) == 6 and clock.isdigit():
+                base += int(clock[:2]) * 3600 + int(clock[2:4]) * 60 + int(clock[4:])
+            return base
+        return int(date)
+
+    def changed_mask(self):
+        """
+        Maska <tu> liczonych jako zmiana (jak w analizie): jest changeid i nie jest to
+        "fałszywa zmiana" - ten sam użytkownik co przy utworzeniu tego samego dnia.
+        """
+        if self._changed_mask is None:
+            creation_user = self.columns['creation_user']
+            change_user = self.columns['change_user']
+            same_day = (self.columns['creation_date'] // 86400) == (self.columns['change_date'] // 86400)
+            self._changed_mask = (change_user != NO_USER) & ~(same_day & (creation_user == change_user))
+        return self._changed_mask
+
+    def _select(self, user_column, date_column, user_id, after, before, base_mask=None):
+        index = self.user_index.get(user_id)
+        if index is None:
+            return None
+        mask = self.columns[user_column] == index
+        if base_mask is not None:
+            mask &= base_mask
+        if after is not None:
+            mask &= self.columns[date_column] >= self.to_epoch(after)
+        if before is not None:
+            mask &= self.columns[date_column] < self.to_epoch(before)
+        return mask
+
+    def created_chars(self, user_id, after=None, before=None):
+        """Znaki w segmentach utworzonych przez user_id (opcjonalnie creationdate w [after, before))."""
+        mask = self._select('creation_user', 'creation_date', user_id, after, before)
+        return 0 if mask is None else int(self.columns['target_chars'][mask].sum())
+
+    def changed_chars(self, user_id, after=None, before=None):
+        """Znaki w segmentach zmienionych przez user_id (opcjonalnie changedate w [after, before))."""
+        mask = self._select('change_user', 'change_date', user_id, after, before, self.changed_mask())
+        return 0 if mask is None else int(self.columns['target_chars'][mask].sum())
+
+    def translator_stats(self):
+        """
+        Statystyki tłumaczy w formacie wyniku analizy (translators_stats) - redukcje wektorowe
+        (bincount, maximum.at) zamiast parsowania TMX. Niepoprawne daty w eksporcie są traktowane jak brak daty.
+        """
+        users_count = len(self.users)
+        chars = self.columns['target_chars']
+        results = {}
+
+        for prefix, user_column, date_column, mask in (
+                ('created', 'creation_user', 'creation_date', self.columns['creation_user'] != NO_USER),
+                ('changed', 'change_user', 'change_date', self.changed_mask())):
+            users = np.asarray(self.columns[user_column][mask], dtype=np.intp)
+            segs = np.bincount(users, minlength=users_count)
+            char_sums = np.bincount(users, weights=chars[mask], minlength=users_count)
+            last_dates = np.full(users_count, NO_DATE, dtype=np.int64)
+            np.maximum.at(last_dates, users, self.columns[date_column][mask])
+            results[prefix] = (segs, char_sums, last_dates)
+
+        created_segs, created_chars, last_created = results['created']
+        changed_segs, changed_chars, last_changed = results['changed']
+
+        # Kolejność tłumaczy jak w analizie (pierwsze wystąpienie); pomijamy ID bez żadnego liczonego segmentu
+        stats = {}
+        for index, user_id in enumerate(self.users):
+            if not created_segs[index] and not changed_segs[index]:
+                continue
+            stats[user_id] = {
+                'creation_id': user_id,
+                'last_creation_date': epoch_to_tmx_date(last_created[index]),
+                'last_change_date': epoch_to_tmx_date(last_changed[index]),
+                'created_segs_count': int(created_segs[index]),
+                'changed_segs_count': int(changed_segs[index]),
+                'created_chars_count': int(created_chars[index]),
+                'changed_chars_count': int(changed_chars[index])
+            }
+        return stats
@@ -0,0 +1,271 @@
+"""
+Wykrywanie zduplikowanych segmentów w pamięci TM i między pamięciami na podstawie 64-bitowych odcisków <tu>.
+
+Odcisk <tu> to blake2b (8 bajtów) z języków i znormalizowanych tekstów źródła i targetu. Normalizacja: bez
+pozostałości tagów (jak przy liczeniu znaków w analizie), Unicode NFC, białe znaki zwinięte do jednej spacji,
+wielkość liter bez zmian. Źródło i target rozpoznajemy po języku docelowym z nagłówka (targetlang), a bez niego
+po kolejności <tuv> (pierwszy - źródło, drugi - target).
+
+Zbieranie (TuFingerprintCollector) działa w przebiegu analizy jako odbiorca <tu> i używa tylko biblioteki
+standardowej: 12 bajtów na <tu> (odcisk uint64 + indeks tłumacza int32) w pamięci do końca pliku.
+Wynik - folder na plik TMX:
+
+  fingerprint.npy    uint64 - odciski kolejnych <tu>
+  creation_user.npy  int32  - indeks creationid w users.json, -1 = brak
+  users.json                - lista ID tłumaczy
+  meta.json                 - plik źródłowy, odcisk pliku (rozmiar, mtime), liczba wierszy
+
+Raport (count_duplicates) wymaga NumPy: odciski wszystkich plików są łączone i sortowane (argsort),
+więc przy 100 mln segmentów szczytowe zużycie pamięci to ok. 4 GB (ok. 37 bajtów na segment).
+Każdy <tu> trafia do dokładnie jednej grupy:
+  intra  - powtarza wcześniejszy <tu> tego samego pliku,
+  cross  - pierwsze wystąpienie w pliku, ale ten sam odcisk jest też w innym pliku,
+  unique - odcisk występuje tylko w tym pliku (raz).
+"""
+import json
+import os
+import re
+import shutil
+import sys
+import unicodedata
+from array import array
+from hashlib import blake2b
+
+from tu_columns import NO_USER, NpyColumnWriter, np
+
+# Wspólny moduł (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common.compressed_io import input_stat
+
+FINGERPRINTS_VERSION = 1
+FINGERPRINT_BYTES = 8
+# Ten sam wzorzec co przy liczeniu znaków w analizie (translator_id_tmx_analysis.py)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def normalize_text(text):
+    """Tekst <seg> do odcisku: bez tagów, NFC, zwinięte białe znaki."""
+    if not text:
+        return ''
+    if '<' in text:
+        text = TAG_PATTERN.sub('', text)
+    # Tekst ASCII jest już w NFC (str.isascii jest dopiero od Pythona 3.7)
+    try:
+        text.encode('ascii')
+    except UnicodeEncodeError:
+        text = unicodedata.normalize('NFC', text)
+    return ' '.join(text.split())
+
+
+def tu_fingerprint(source_lang, source_text, target_lang, target_text):
+    """64-bitowy odcisk pary (źródło, target) razem z językami (małe litery)."""
+    key = '\x1f'.join((
+        (source_lang or '').lower(), normalize_text(source_text),
+        (target_lang or '').lower(), normalize_text(target_text)))
+    return _hash_key(key)
+
+
+def _hash_key(key):
+    return int.from_bytes(blake2b(key.encode('utf-8'), digest_size=FINGERPRINT_BYTES).digest(), 'little')
+
+
+class TuFingerprintCollector:
+    """
+    Odbiorca rekordów <tu> we wspólnym przebiegu analizy (consume / finish, jak TuIndexCollector):
+    zbiera odciski i creationid, a finish() zapisuje folder out_dir (przez folder tymczasowy).
+    """
+
+    def __init__(self, out_dir, source_path):
+        self.out_dir = out_dir
+        self.source_path = source_path
+        st = input_stat(source_path)
+        self.fingerprint = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        self.fingerprints = array('Q')
+        self.creation_users = array('i')
+        self.users = []
+        self.user_index = {}
+        self.target_lower = None
+        self.header_read = False
+        self.target_match = {}
+        self.lang_lower = {None: ''}
+
+    def _user(self, user_id):
+        if not user_id:
+            return NO_USER
+        index = self.user_index.get(user_id)
+        if index is None:
+            index = self.user_index[user_id] = len(self.users)
+            self.users.append(user_id)
+        return index
+
+    def _is_target(self, xml_lang):
+        # Ta sama reguła co w analizie: kod z nagłówka zawarty w xml:lang, liczone raz na kod języka
+        is_target = self.target_match.get(xml_lang)
+        if is_target is None:
+            is_target = self.target_match[xml_lang] = bool(
+                self.target_lower and xml_lang and self.target_lower in xml_lang.lower())
+        return is_target
+
+    def consume(self, tu, header):
+        if not self.header_read:
+            target_lang = header.get('targetlang')
+            self.target_lower = target_lang.lower() if target_lang else None
+            self.header_read = True
+
+        source = target = None
+        variants = tu.variants or ()
+        if self.target_lower:
+            for variant in variants:
+                if self._is_target(variant[0]):
+                    if target is None:
+                        target = variant
+                elif source is None:
+                    source = variant
+        else:
+            source = variants[0] if len(variants) > 0 else None
+            target = variants[1] if len(variants) > 1 else None
+
+        # Jak tu_fingerprint, ale z kodami języków zamienianymi na małe litery raz na plik
+        source_lang, source_text = source if source is not None else (None, None)
+        target_lang, target_text = target if target is not None else (None, None)
+        lang_lower = self.lang_lower
+        if source_lang not in lang_lower:
+            lang_lower[source_lang] = source_lang.lower()
+        if target_lang not in lang_lower:
+            lang_lower[target_lang] = target_lang.lower()
+        key = '\x1f'.join((lang_lower[source_lang], normalize_text(source_text),
+                           lang_lower[target_lang], normalize_text(target_text)))
+        self.fingerprints.append(_hash_key(key))
+        self.creation_users.append(self._user(tu.get('creationid')))
+
+    def finish(self):
+        tmp_dir = self.out_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, values, descr in (('fingerprint', self.fingerprints, '<u8'),
+                                    ('creation_user', self.creation_users, '<i4')):
+            column = NpyColumnWriter(os.path.join(tmp_dir, name + '.npy'), values.typecode, descr)
+            column.buffer = values
+            column.close()
+        with open(os.path.join(tmp_dir, 'users.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.users, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(self.fingerprint, version=FINGERPRINTS_VERSION,
+                           source=os.path.basename(self.source_path), rows=len(self.fingerprints)),
+                      f, ensure_ascii=False)
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        os.replace(tmp_dir, self.out_dir)
+
+
+def fingerprints_up_to_date(out_dir, fingerprint):
+    """Czy folder odcisków istnieje i powstał z pliku o podanym odcisku ({"size", "mtime_ns"})."""
+    try:
+        with open(os.path.join(out_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (meta.get('version') == FINGERPRINTS_VERSION and meta.get('size') == fingerprint['size']
+            and meta.get('mtime_ns') == fingerprint['mtime_ns'])
+
+
+# --- RAPORT (NumPy) ---
+
+class DuplicateReport:
+    """
+    Wynik count_duplicates. files i users: [segmenty, intra, cross, unique] na plik (w kolejności folderów)
+    i na tłumacza (creationid; '' = <tu> bez creationid). total - wszystkie segmenty, distinct - różne odciski.
+    """
+
+    def __init__(self, files, users, total, distinct):
+        self.files = files
+        self.users = users
+        self.total = total
+        self.distinct = distinct
+
+
+def _load_folder(folder):
+    with open(os.path.join(folder, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != FINGERPRINTS_VERSION:
+        raise ValueError(f"Nieobsługiwana wersja odcisków: {meta.get('version')}")
+    with open(os.path.join(folder, 'users.json'), encoding='utf-8') as f:
+        users = json.load(f)
+    fingerprints = np.load(os.path.join(folder, 'fingerprint.npy'), mmap_mode='r')
+    creation_users = np.load(os.path.join(folder, 'creation_user.npy'), mmap_mode='r')
+    return fingerprints, creation_users, users
+
+
+def count_duplicates(folders):
+    """
+    Duplikaty w plikach i między plikami dla listy folderów odcisków (kolejność = kolejność plików).
+    Jedno sortowanie wszystkich odcisków (stabilne - w grupie równych odcisków <tu> zostają w kolejności
+    plików i numerów <tu>), potem same operacje wektorowe.
+    """
+    if np is None:
+        raise ImportError("Raport duplikatów wymaga pakietu numpy (pip install numpy)")
+
+    all_users = []
+    user_index = {}
+    fingerprint_parts = []
+    user_parts = []
+    for folder in folders:
+        fingerprints, creation_users, users = _load_folder(folder)
+        # Indeks lokalny -> globalny; ostatni element tablicy obsługuje NO_USER (-1)
+        mapping = np.empty(len(users) + 1, dtype=np.int32)
+        for i, user_id in enumerate(users):
+            if user_id not in user_index:
+                user_index[user_id] = len(all_users)
+                all_users.append(user_id)
+            mapping[i] = user_index[user_id]
+        mapping[-1] = NO_USER
+        fingerprint_parts.append(fingerprints)
+        user_parts.append(mapping[np.asarray(creation_users)])
+
+    lengths = np.array([len(part) for part in fingerprint_parts], dtype=np.int64)
+    total = int(lengths.sum())
+    file_count = len(folders)
+    if not total:
+        return DuplicateReport([[0, 0, 0, 0] for _ in folders], {}, 0, 0)
+
+    fingerprints = np.concatenate(fingerprint_parts)
+    order = np.argsort(fingerprints, kind='stable')
+    fingerprints = fingerprints[order]
+    creation_users = np.concatenate(user_parts)[order]
+    # Numer pliku z pozycji w połączonej tablicy - bez osobnej kolumny na cały zbiór
+    file_ids = (np.searchsorted(np.cumsum(lengths), order, side='right')).astype(np.int32)
+    del order, fingerprint_parts, user_parts
+
+    new_group = np.empty(total, dtype=bool)
+    new_group[0] = True
+    np.not_equal(fingerprints[1:], fingerprints[:-1], out=new_group[1:])
+    distinct = int(new_group.sum())
+    del fingerprints
+    first_in_file = new_group.copy()
+    first_in_file[1:] |= file_ids[1:] != file_ids[:-1]
+
+    # Liczba różnych plików w każdej grupie równych odcisków
+    group_starts = np.flatnonzero(new_group)
+    files_in_group = np.add.reduceat(first_in_file.astype(np.int32), group_starts)
+    group_ids = np.cumsum(new_group, dtype=np.int32 if total < 2 ** 31 else np.int64) - 1
+    del new_group, group_starts
+    in_other_files = files_in_group[group_ids] > 1
+    del group_ids, files_in_group
+
+    intra = ~first_in_file
+    cross = first_in_file & in_other_files
+    unique = first_in_file & ~in_other_files
+    del in_other_files, first_in_file
+
+    counts = [np.bincount(file_ids, weights=mask, minlength=file_count) for mask in (intra, cross, unique)]
+    files = [[int(lengths[i])] + [int(c[i]) for c in counts] for i in range(file_count)]
+
+    # Tłumacze: indeks + 1, żeby <tu> bez creationid (-1) trafiły do pozycji 0
+    user_slots = creation_users.astype(np.int64) + 1
+    user_total = np.bincount(user_slots, minlength=len(all_users) + 1)
+    user_counts = [np.bincount(user_slots, weights=mask, minlength=len(all_users) + 1)
+                   for mask in (intra, cross, unique)]
+    users = {}
+    for slot, user_id in enumerate([''] + all_users):
+        if user_total[slot]:
+            users[user_id] = [int(user_total[slot])] + [int(c[slot]) for c in user_counts]
+    return DuplicateReport(files, users, total, distinct)
@@ -1,26 +1,574 @@
 import os
+import sys
 import copy
+import json
+import time
+import shutil
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+# Wspólny moduł (folder loc_common w głównym katalogu repozytorium)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loc_common.compressed_io import expand_inputs, input_stat, is_plain_file, open_input, plain_output_name
+from loc_common import metrics
 
 # Konfiguracja
+# Pliki wejściowe mogą być skompresowane ({nazwa}.xml.gz / .xz / .bz2) albo leżeć w archiwum .zip -
+# są czytane strumieniowo, bez rozpakowywania. Wynik jest zapisywany bez kompresji
+# (plik.xml.gz -> output/plik.xml, paczka.zip/a/plik.xml -> output/paczka/a/plik.xml).
 INPUT_EXT = '.xml'
 OUTPUT_FOLDER = 'output'
+# Tryb strumieniowy: plik jest czytany i zapisywany kawałkami, w pamięci trzymany jest tylko bieżący <segment>.
+# Wynik jest bajtowo identyczny z trybem DOM (ET.parse + tree.write). False = zawsze tryb DOM.
+STREAMING_MODE = True
+# Rozmiar kawałka czytanego z pliku w trybie strumieniowym (bajty)
+READ_CHUNK_SIZE = 1024 * 1024
+# Szukanie plików także w podfolderach (struktura folderów jest odtwarzana w OUTPUT_FOLDER)
+RECURSIVE = False
+# Liczba procesów przetwarzających pliki jednocześnie (1 = po kolei, 0 = wszystkie rdzenie)
+WORKERS = 1
+# Pliki, w których niczego nie trzeba uzupełniać, kopiujemy bajt w bajt (bez ponownej serializacji)
+COPY_UNCHANGED = True
+# Zamiast kopii - twarde dowiązanie (hardlink). Uwaga: edycja pliku wynikowego zmieni też oryginał.
+LINK_UNCHANGED = False
+# Podsumowanie przebiegu w OUTPUT_FOLDER (czas i status każdego pliku); None = bez podsumowania
+SUMMARY_FILE = 'summary.json'
+# Pomiary wydajności (loc_common/metrics.py) w OUTPUT_FOLDER: ślad JSON Lines i snapshot w formacie textfile
+# Prometheusa (czas pliku wg sposobu zapisu, MB/s wejścia i wyjścia). None = wyłączone.
+METRICS_TRACE_FILE = None
+METRICS_PROM_FILE = None
+
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8'?>\n"
+
+# Tryb strumieniowy serializuje tak samo jak tree.write, korzystając z wewnętrznych funkcji ElementTree.
+# Jeśli w tej wersji Pythona którejś brakuje, wszystkie pliki idą trybem DOM.
+ET_INTERNALS = ('_serialize_xml', '_escape_cdata', '_escape_attrib', '_namespace_map')
+STREAMING_SUPPORTED = all(hasattr(ET, name) for name in ET_INTERNALS)
+STREAMING_MODE = STREAMING_MODE and STREAMING_SUPPORTED
+
+def _namespace_registry():
+    """Kopia rejestru przestrzeni nazw ElementTree (pusty słownik, gdy rejestr nie jest dostępny)."""
+    return dict(getattr(ET, '_namespace_map', {}))
+
+def _restore_namespace_registry(namespaces):
+    """Ustawia rejestr przestrzeni nazw ElementTree na namespaces (kopię z _namespace_registry)."""
+    registry = getattr(ET, '_namespace_map', None)
+    if registry is not None:
+        registry.clear()
+        registry.update(namespaces)
+
+# Domyślny rejestr przestrzeni nazw ElementTree - przywracany przed każdym plikiem, żeby wynik
+# nie zależał od kolejności plików ani od tego, który proces roboczy przetwarzał wcześniejsze pliki
+DEFAULT_NAMESPACES = _namespace_registry()
 
 def register_all_namespaces(filename):
     """
     Funkcja pomocnicza do skanowania pliku i rejestrowania prefixów.
     Zapobiega pojawianiu się ns0: w pliku wynikowym.
     """
-    namespaces = dict([node for _, node in ET.iterparse(filename, events=['start-ns'])])
+    with open_input(filename) as f:
+        namespaces = dict([node for _, node in ET.iterparse(f, events=['start-ns'])])
     for ns, url in namespaces.items():
         ET.register_namespace(ns, url)
 
+def copy_inline_tag(elem):
+    """
+    Kopia tagu wewnętrznego (ph, pc, bpt...) do target.
+    Płytka kopia elementu dzieli z oryginałem tag, tekst i ogon - to niezmienne napisy, więc jest to
+    bezpieczne. Wspólne byłyby też słownik atrybutów i lista dzieci, dlatego te podmieniamy na kopie
+    (dzieci rekurencyjnie). Wynik jak z copy.deepcopy, ale kilka razy szybciej.
+    """
+    if not isinstance(elem.tag, str):
+        # Komentarz / instrukcja przetwarzania / QName - zostawiamy ogólną kopię
+        return copy.deepcopy(elem)
+    new_elem = elem.__copy__()
+    new_elem.attrib = elem.attrib.copy()
+    if len(elem):
+        new_elem[:] = [copy_inline_tag(child) for child in elem]
+    return new_elem
+
+def add_missing_target(elem):
+    """
+    Jeśli segment ma source, a nie ma target - wstawia za source kopię source jako target.
+    Zwraca True, jeśli segment został zmieniony.
+    """
+    source_node = None
+    source_index = -1
+    
+    # Jedno przejście po dzieciach: zapamiętujemy pozycję (ostatniego) source
+    for index, child in enumerate(elem):
+        if child.tag.endswith('source'):
+            source_node = child
+            source_index = index
+        elif child.tag.endswith('target'):
+            # Segment ma już target - nic nie robimy
+            return False
+    
+    # Jeśli jest source, a nie ma target -> kopiujemy
+    if source_node is None:
+        return False
+
+    # Tworzymy tag target używając tej samej pełnej nazwy co source
+    # (dzięki temu dziedziczy namespace {url}source -> {url}target)
+    new_tag_name = source_node.tag.replace('source', 'target')
+    target_node = elem.makeelement(new_tag_name, {})
+    
+    target_node.text = source_node.text
+    target_node.extend([copy_inline_tag(internal_tag) for internal_tag in source_node])
+        
+    # Wstawiamy target po source
+    elem.insert(source_index + 1, target_node)
+    
+    if source_node.tail:
+        target_node.tail = source_node.tail
+
+    return True
+
+def add_missing_targets(root):
+    """Uzupełnia target we wszystkich segmentach drzewa. Zwraca True, jeśli coś zmieniono."""
+    modified = False
+    # Iterujemy po elementach
+    for elem in root.iter():
+        # Sprawdzamy czy to segment
+        if elem.tag.endswith('segment'):
+            if add_missing_target(elem):
+                modified = True
+    return modified
+
+def process_file_dom(filename, output_path):
+    """Dawny tryb: całe drzewo XML w pamięci. Zwraca True, jeśli plik został zmieniony."""
+    # 1. Najpierw rejestrujemy przestrzenie nazw z pliku, żeby nie było ns0:
+    register_all_namespaces(filename)
+
+    # 2. Parsowanie pliku
+    with open_input(filename) as f:
+        tree = ET.parse(f)
+    modified = add_missing_targets(tree.getroot())
+
+    # Zapisywanie (plik tymczasowy + zmiana nazwy, żeby nie zostawić niepełnego pliku)
+    tmp_path = output_path + '.tmp'
+    try:
+        tree.write(tmp_path, encoding='UTF-8', xml_declaration=True)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return modified
+
+# ==========================================
+# TRYB STRUMIENIOWY
+# ==========================================
+
+class _DomFallback(Exception):
+    """Plik wymaga trybu DOM (np. ten sam prefix przypisany w pliku do różnych przestrzeni nazw)."""
+
+class _StreamingRewriter:
+    """
+    Przepisuje zdarzenia XMLPullParser (start-ns / start / end) na wyjście dokładnie tak,
+    jak zrobiłby to tree.write: te same reguły prefixów co ET (rejestr przestrzeni nazw, ns0...),
+    te same funkcje escapowania, '<x />' dla pustych elementów.
+
+    - Tag otwierający zapisujemy dopiero, gdy wiadomo, czy element ma treść (pierwsze dziecko lub koniec).
+    - Ogon (tail) elementu jest znany dopiero przy następnym zdarzeniu, więc zapisujemy go wtedy,
+      razem z odpięciem elementu od rodzica (stała pamięć).
+    - Elementy *segment buforujemy w całości; po uzupełnieniu target zapisuje je serializer ET.
+    - tree.write deklaruje na korzeniu wszystkie użyte przestrzenie nazw. Zakładamy te zadeklarowane
+      na korzeniu pliku; jeśli na końcu okaże się inaczej, podmieniamy sam tag korzenia w pliku wynikowym.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.write = out.write
+        self.qnames = {None: None}
+        # uri -> prefix użytych przestrzeni nazw (jak w ET._namespaces)
+        self.namespaces = {}
+        # Deklaracje z tego pliku (prefix -> uri i odwrotnie)
+        self.file_prefixes = {}
+        self.file_uris = {}
+        self.root = None
+        self.root_uris = []
+        self.declared = None
+        self.root_span = None
+        # [element, czy tag otwierający już zapisany]
+        self.stack = []
+        self.segment = None
+        self.segment_depth = 0
+        # (element, czy to buforowany segment) - czeka na zapis ogona
+        self.last_closed = None
+        self.modified = False
+
+    def qname(self, name):
+        """Nazwa z prefixem dla {uri}tag - ta sama logika co add_qname w ET._namespaces."""
+        qname = self.qnames.get(name)
+        if qname is not None:
+            return qname
+        if name[:1] == "{":
+            uri, tag = name[1:].rsplit("}", 1)
+            prefix = self.namespaces.get(uri)
+            if prefix is None:
+                prefix = ET._namespace_map.get(uri)
+                if prefix is None:
+                    prefix = "ns%d" % len(self.namespaces)
+                if prefix != "xml":
+                    self.namespaces[uri] = prefix
+            qname = "%s:%s" % (prefix, tag) if prefix else tag
+        else:
+            qname = name
+        self.qnames[name] = qname
+        return qname
+
+    def handle(self, event, elem):
+        if event == 'start-ns':
+            self.start_ns(*elem)
+        elif event == 'start':
+            self.start(elem)
+        else:
+            self.end(elem)
+
+    def start_ns(self, prefix, uri):
+        # Tryb DOM rejestruje wszystkie deklaracje z pliku przed zapisem. Zmiana przypisania
+        # prefixu/uri w trakcie pliku zmieniłaby nazwy już zapisanych elementów - wtedy DOM.
+        if self.file_prefixes.get(prefix, uri) != uri or self.file_uris.get(uri, prefix) != prefix:
+            raise _DomFallback()
+        self.file_prefixes[prefix] = uri
+        self.file_uris[uri] = prefix
+        ET.register_namespace(prefix, uri)
+        if self.root is None:
+            self.root_uris.append(uri)
+
+    def start(self, elem):
+        if self.segment is not None:
+            self.segment_depth += 1
+            return
+        self.finish_last_closed()
+
+        if self.root is None:
+            self.root = elem
+            if elem.tag.endswith('segment'):
+                raise _DomFallback()
+        else:
+            self.open_parent()
+            if elem.tag.endswith('segment'):
+                self.segment = elem
+                self.segment_depth = 0
+                return
+        self.stack.append([elem, False])
+
+    def end(self, elem):
+        if self.segment is not None:
+            if self.segment_depth:
+                self.segment_depth -= 1
+                return
+            # Koniec segmentu - uzupełniamy target tak samo jak tryb DOM (łącznie z segmentami zagnieżdżonymi)
+            if add_missing_targets(elem):
+                self.modified = True
+            self.segment = None
+            self.last_closed = (elem, True)
+            return
+
+        self.finish_last_closed()
+        _, started = self.stack.pop()
+        tag = self.qname(elem.tag)
+        if started:
+            self.write("</" + tag + ">")
+        else:
+            self.write_start_tag(elem)
+            if elem.text:
+                self.write(">" + ET._escape_cdata(elem.text) + "</" + tag + ">")
+            else:
+                self.write(" />")
+        if self.stack:
+            self.last_closed = (elem, False)
+
+    def open_parent(self):
+        """Pierwsze dziecko rodzica - zapisujemy jego tag otwierający i tekst przed dzieckiem."""
+        entry = self.stack[-1]
+        if entry[1]:
+            return
+        elem = entry[0]
+        self.write_start_tag(elem)
+        self.write(">")
+        if elem.text:
+            self.write(ET._escape_cdata(elem.text))
+        entry[1] = True
+
+    def finish_last_closed(self):
+        if self.last_closed is None:
+            return
+        elem, buffered = self.last_closed
+        self.last_closed = None
+        if buffered:
+            # Nazwy w kolejności dokumentu (jak ET._namespaces), potem serializer ET (razem z ogonem)
+            for e in elem.iter():
+                self.qname(e.tag)
+                for key in e.keys():
+                    self.qname(key)
+            ET._serialize_xml(self.write, elem, self.qnames, None, short_empty_elements=True)
+        elif elem.tail:
+            self.write(ET._escape_cdata(elem.tail))
+        # Odpinamy zapisany element od rodzica - jest zawsze pierwszym dzieckiem
+        self.stack[-1][0].remove(elem)
+
+    def start_tag(self, elem, namespaces=None):
+        tag = self.qname(elem.tag)
+        attrs = "".join(' %s="%s"' % (self.qname(k), ET._escape_attrib(v)) for k, v in elem.items())
+        xmlns = ""
+        if namespaces:
+            xmlns = "".join(' xmlns%s="%s"' % (":" + k if k else "", ET._escape_attrib(v))
+                            for v, k in sorted(namespaces.items(), key=lambda x: x[1]))
+        return "<" + tag + xmlns + attrs
+
+    def write_start_tag(self, elem):
+        if elem is not self.root:
+            self.write(self.start_tag(elem))
+            return
+        # Korzeń: deklaracje przestrzeni nazw użytych przez korzeń + zadeklarowanych na nim w pliku
+        self.start_tag(elem)
+        self.declared = dict(self.namespaces)
+        for uri in self.root_uris:
+            prefix = ET._namespace_map.get(uri)
+            if uri not in self.declared and prefix is not None and prefix != "xml":
+                self.declared[uri] = prefix
+        start = self.out.tell()
+        self.write(self.start_tag(elem, self.declared))
+        self.root_span = (start, self.out.tell())
+
+    def fix_root_namespaces(self, path):
+        """Jeśli użyte przestrzenie nazw różnią się od zadeklarowanych na korzeniu - podmienia tag korzenia."""
+        if self.namespaces == self.declared:
+            return
+        start, end = self.root_span
+        new_tag = self.start_tag(self.root, self.namespaces).encode('UTF-8', 'xmlcharrefreplace')
+        fixed_path = path + '.fix'
+        with open(path, 'rb') as src, open(fixed_path, 'wb') as dst:
+            dst.write(src.read(start))
+            dst.write(new_tag)
+            src.seek(end)
+            shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+        os.replace(fixed_path, path)
+
+def process_file_streaming(filename, output_path):
+    """
+    Tryb strumieniowy (jeden przebieg, stała pamięć). Zwraca True, jeśli plik został zmieniony.
+    Zapis do pliku tymczasowego - przy błędzie nie zostaje niepełny plik wynikowy.
+    """
+    tmp_path = output_path + '.tmp'
+    # Przy błędzie przywracamy rejestr przestrzeni nazw - tryb DOM nie rejestruje nic z uszkodzonego pliku
+    saved_namespaces = _namespace_registry()
+    try:
+        # Plik wynikowy otwierany tak samo jak w tree.write
+        with open(tmp_path, 'w', encoding='UTF-8', errors='xmlcharrefreplace') as out:
+            out.write(XML_DECLARATION)
+            rewriter = _StreamingRewriter(out)
+            parser = ET.XMLPullParser(events=('start-ns', 'start', 'end'))
+            with open_input(filename) as f:
+                for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                    parser.feed(chunk)
+                    for event, elem in parser.read_events():
+                        rewriter.handle(event, elem)
+            parser.close()
+            for event, elem in parser.read_events():
+                rewriter.handle(event, elem)
+        rewriter.fix_root_namespaces(tmp_path)
+        os.replace(tmp_path, output_path)
+        return rewriter.modified
+    except BaseException:
+        _restore_namespace_registry(saved_namespaces)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def process_file(filename, output_path):
+    """Przetwarza jeden plik (strumieniowo lub w trybie DOM). Zwraca True, jeśli plik został zmieniony."""
+    _restore_namespace_registry(DEFAULT_NAMESPACES)
+    if STREAMING_MODE:
+        try:
+            return process_file_streaming(filename, output_path)
+        except _DomFallback:
+            pass
+    return process_file_dom(filename, output_path)
+
+# ==========================================
+# TRYB WSADOWY
+# ==========================================
+
+class _MissingTargetCheck:
+    """
+    Cel dla ET.XMLParser - sprawdza, czy któryś segment ma source bez target (tak jak add_missing_target),
+    bez budowania drzewa XML. Dla każdego otwartego elementu: [czy segment, ma source, ma target].
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.found = False
+
+    def start(self, tag, attrib):
+        self.stack.append([tag.endswith('segment'), False, False])
+
+    def end(self, tag):
+        is_segment, has_source, has_target = self.stack.pop()
+        if is_segment and has_source and not has_target:
+            self.found = True
+        if self.stack:
+            if tag.endswith('source'):
+                self.stack[-1][1] = True
+            elif tag.endswith('target'):
+                self.stack[-1][2] = True
+
+    def close(self):
+        return self.found
+
+def needs_target(filename):
+    """
+    Czy w pliku jest segment do uzupełnienia. Kończy czytanie przy pierwszym takim segmencie.
+    Uszkodzony plik zwraca True - zwykła ścieżka zgłosi błąd tak samo jak dotąd.
+    """
+    checker = _MissingTargetCheck()
+    parser = ET.XMLParser(target=checker)
+    try:
+        with open_input(filename) as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                parser.feed(chunk)
+                if checker.found:
+                    return True
+        return parser.close()
+    except ET.ParseError:
+        return True
+
+def copy_unchanged(filename, output_path):
+    """
+    Kopia bajt w bajt (lub hardlink) przez plik tymczasowy. Zwraca sposób zapisu: 'link' albo 'copy'.
+    Plik skompresowany jest kopiowany po rozpakowaniu w locie.
+    """
+    tmp_path = output_path + '.tmp'
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if not is_plain_file(filename):
+            with open_input(filename) as src, open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+            os.replace(tmp_path, output_path)
+            return 'copy'
+        if LINK_UNCHANGED:
+            try:
+                os.link(filename, tmp_path)
+                os.replace(tmp_path, output_path)
+                return 'link'
+            except OSError:
+                # Np. inny dysk - zwykła kopia
+                pass
+        shutil.copyfile(filename, tmp_path)
+        os.replace(tmp_path, output_path)
+        return 'copy'
+    finally:
+        # os.replace nic nie robi, gdy oba dowiązania wskazują ten sam plik - sprzątamy
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def process_one(filename, output_path):
+    """
+    Przetwarza jeden plik (także w procesie roboczym) i zwraca wpis do podsumowania:
+    plik, status ('modified' / 'unchanged' / 'error'), sposób zapisu, czas w sekundach, opis błędu.
+    """
+    start = time.perf_counter()
+    result = {"file": filename, "status": "error", "write": None}
+    try:
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        if COPY_UNCHANGED and not needs_target(filename):
+            result["write"] = copy_unchanged(filename, output_path)
+            result["status"] = "unchanged"
+        else:
+            modified = process_file(filename, output_path)
+            result["write"] = "xml"
+            result["status"] = "modified" if modified else "unchanged"
+    except ET.ParseError as e:
+        result["error"] = f"Plik {filename} jest uszkodzony: {e}"
+    except Exception as e:
+        result["error"] = f"{filename}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+def find_input_files():
+    """
+    Posortowana lista plików INPUT_EXT (ścieżki względne), także skompresowanych i z archiwów .zip
+    (archiwum.zip/plik.xml). Przy RECURSIVE także z podfolderów, bez OUTPUT_FOLDER.
+    """
+    if not RECURSIVE:
+        return expand_inputs('.', sorted(os.listdir('.')), INPUT_EXT)
+
+    output_dir = os.path.abspath(OUTPUT_FOLDER)
+    files = []
+    for dirpath, dirnames, filenames in os.walk('.'):
+        dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != output_dir)
+        for name in expand_inputs(dirpath, sorted(filenames), INPUT_EXT):
+            files.append(os.path.normpath(os.path.join(dirpath, name)))
+    return files
+
+def iter_results(files, workers):
+    """Wyniki process_one w kolejności listy plików; przy workers > 1 pliki idą do puli procesów."""
+    jobs = [(filename, os.path.join(OUTPUT_FOLDER, plain_output_name(filename))) for filename in files]
+
+    if workers == 1:
+        for filename, output_path in jobs:
+            yield process_one(filename, output_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_one, filename, output_path) for filename, output_path in jobs]
+        for (filename, _), future in zip(jobs, futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # Np. proces roboczy padł - raportujemy jak każdy inny błąd pliku
+                yield {"file": filename, "status": "error", "write": None, "error": f"{filename}: {e}", "seconds": 0}
+
+def write_summary(results, workers, seconds):
+    """Zapisuje podsumowanie JSON w OUTPUT_FOLDER (przez plik tymczasowy). Zwraca ścieżkę pliku."""
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    summary = {
+        "input": os.path.abspath('.'),
+        "output": os.path.abspath(OUTPUT_FOLDER),
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "counts": counts,
+        "files": results,
+    }
+    summary_path = os.path.join(OUTPUT_FOLDER, SUMMARY_FILE)
+    tmp_path = summary_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, summary_path)
+    return summary_path
+
+def record_file_metrics(result):
+    """
+    Pomiary pliku w procesie głównym (loc_common.metrics). Czas mierzy process_one - także w procesie roboczym.
+    Etykieta write: 'xml' (parsowanie i serializacja), 'copy' / 'link' (plik bez zmian) albo 'none' (błąd).
+    """
+    if not metrics.enabled():
+        return
+    labels = {"status": result["status"], "write": result["write"] or "none"}
+    metrics.observe("xliff_file_seconds", result["seconds"], labels, file=result["file"])
+    metrics.inc("xliff_files_total", labels=labels)
+    try:
+        metrics.inc("xliff_input_bytes_total", input_stat(result["file"]).st_size, {"write": labels["write"]})
+        if result["write"] == "xml":
+            output_path = os.path.join(OUTPUT_FOLDER, plain_output_name(result["file"]))
+            metrics.inc("xliff_output_bytes_total", os.path.getsize(output_path))
+    except OSError:
+        pass
+
 def process_xlf_files():
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
         print(f"Utworzono folder: {OUTPUT_FOLDER}")
 
-    files = [f for f in os.listdir('.') if f.endswith(INPUT_EXT)]
+    files = find_input_files()
 
     if not files:
         print(f"Nie znaleziono plików {INPUT_EXT} w tym folderze.")
@@ -28,65 +576,42 @@ def process_xlf_files():
 
     print(f"Znaleziono plików do przetworzenia: {len(files)}")
 
-    for filename in files:
-        try:
-            # 1. Najpierw rejestrujemy przestrzenie nazw z pliku, żeby nie było ns0:
-            register_all_namespaces(filename)
-
-            # 2. Parsowanie pliku
-            tree = ET.parse(filename)
-            root = tree.getroot()
-            
-            modified = False
-
-            # Iterujemy po elementach
-            for elem in root.iter():
-                # Sprawdzamy czy to segment
-                if elem.tag.endswith('segment'):
-                    source_node = None
-                    target_node = None
-                    
-                    for child in elem:
-                        if child.tag.endswith('source'):
-                            source_node = child
-                        elif child.tag.endswith('target'):
-                            target_node = child
-                    
-                    # Jeśli jest source, a nie ma target -> kopiujemy
-                    if source_node is not None and target_node is None:
-                        # Tworzymy tag target używając tej samej pełnej nazwy co source
-                        # (dzięki temu dziedziczy namespace {url}source -> {url}target)
-                        new_tag_name = source_node.tag.replace('source', 'target')
-                        target_node = ET.Element(new_tag_name)
-                        
-                        target_node.text = source_node.text
-                        
-                        for internal_tag in source_node:
-                            target_node.append(copy.deepcopy(internal_tag))
-                            
-                        # Wstawiamy target po source
-                        parent_list = list(elem)
-                        source_index = parent_list.index(source_node)
-                        elem.insert(source_index + 1, target_node)
-                        
-                        if source_node.tail:
-                            target_node.tail = source_node.tail
-
-                        modified = True
-
-            # Zapisywanie
-            output_path = os.path.join(OUTPUT_FOLDER, filename)
-            if modified:
-                tree.write(output_path, encoding='UTF-8', xml_declaration=True)
-                print(f"[OK] Przetworzono: {filename}")
-            else:
-                tree.write(output_path, encoding='UTF-8', xml_declaration=True)
-                print(f"[INFO] Bez zmian: {filename}")
+    workers = min(WORKERS or os.cpu_count() or 1, len(files))
+    if workers > 1:
+        print(f"Tryb równoległy: {workers} procesów")
+    if not STREAMING_SUPPORTED:
+        print("[INFO] Brak wewnętrznych funkcji ElementTree dla trybu strumieniowego - używam trybu DOM.")
 
-        except ET.ParseError as e:
-            print(f"[BŁĄD] Plik {filename} jest uszkodzony: {e}")
-        except Exception as e:
-            print(f"[BŁĄD] {filename}: {e}")
+    if metrics.configure('xliff_copy_src_to_trg',
+                         os.path.join(OUTPUT_FOLDER, METRICS_TRACE_FILE) if METRICS_TRACE_FILE else None,
+                         os.path.join(OUTPUT_FOLDER, METRICS_PROM_FILE) if METRICS_PROM_FILE else None):
+        print("Pomiary wydajności: włączone (loc_common/metrics.py)")
+        metrics.event('start', files=len(files), workers=workers, streaming=STREAMING_MODE)
+
+    start = time.perf_counter()
+    results = []
+    for result in iter_results(files, workers):
+        results.append(result)
+        record_file_metrics(result)
+        if result["status"] == "modified":
+            print(f"[OK] Przetworzono: {result['file']}")
+        elif result["status"] == "unchanged":
+            print(f"[INFO] Bez zmian: {result['file']}")
+        else:
+            print(f"[BŁĄD] {result['error']}")
+
+    if SUMMARY_FILE:
+        summary_path = write_summary(results, workers, time.perf_counter() - start)
+        print(f"Podsumowanie: {summary_path}")
+
+    if metrics.enabled():
+        print("Pomiary wydajności:")
+        for line in metrics.summary_lines():
+            print(f"  {line}")
+        try:
+            metrics.finish()
+        except OSError as e:
+            print(f"[BŁĄD] Zapis pomiarów: {e}")
 
 if __name__ == "__main__":
     process_xlf_files()